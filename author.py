@@ -1,7 +1,14 @@
+import sys
+
+
 class Author:
     """
-    Class that holds all the information related to an author
+    Class that holds all the information related to an author. The username
+    and the fields that many authors share are interned.
     """
+    __slots__ = ('username', 'name', 'member_since', 'location', 'occupation',
+                 'website')
+
     def __init__(self, username, name, member_since, location=None,
                  occupation=None, website=None):
         """
@@ -21,11 +28,13 @@ class Author:
         if member_since is None:
             raise ValueError('A member_since needs to be provided to an '
                              'Author.')
-        self.username = username
+        self.username = sys.intern(username)
         self.name = name.strip()
-        self.member_since = member_since.split('\n')[-2].strip()
-        self.location = location.strip() if location is not None else None
-        self.occupation = occupation.strip() if occupation is not None else None
+        self.member_since = sys.intern(member_since.split('\n')[-2].strip())
+        self.location = sys.intern(location.strip()) \
+            if location is not None else None
+        self.occupation = sys.intern(occupation.strip()) \
+            if occupation is not None else None
         self.website = website.strip() if website is not None else None
 
     def __str__(self):
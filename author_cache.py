@@ -0,0 +1,70 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from settings import AUTHOR_CACHE_TTL
+
+
+class AuthorCache:
+    """
+    Persistent store for the fields scraped from authors' profiles, so they
+    can be reused across runs without fetching the profiles again while they
+    are fresh. It's backed by a SQLite file.
+    """
+
+    def __init__(self, path, ttl=AUTHOR_CACHE_TTL):
+        """
+        Opens (or creates) the cache file
+        Args:
+            path: path to the SQLite file holding the cache
+            ttl: seconds a cached author is considered fresh
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS authors ('
+                         'username TEXT PRIMARY KEY, fields TEXT, '
+                         'fetched_at REAL)')
+        self._db.commit()
+
+    def get(self, username):
+        """
+        Returns the cached fields of an author if they are still fresh
+        Args:
+            username: username of the author
+
+        Returns:
+            fields: dictionary of scraped fields or None if the author isn't
+                cached or it expired
+        """
+        with self._lock:
+            row = self._db.execute('SELECT fields, fetched_at FROM authors '
+                                   'WHERE username = ?',
+                                   (username,)).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put(self, username, fields):
+        """
+        Stores the fields scraped for an author
+        Args:
+            username: username of the author
+            fields: dictionary of scraped fields
+        """
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO authors (username, '
+                             'fields, fetched_at) VALUES (?, ?, ?)',
+                             (username, json.dumps(fields), time.time()))
+            self._db.commit()
+
+    def close(self):
+        """
+        Closes the cache file
+        """
+        with self._lock:
+            self._db.close()
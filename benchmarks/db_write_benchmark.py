@@ -0,0 +1,91 @@
+"""
+Compares the throughput of the batched save_results path and the bulk load
+used by the backfill mode against the row-by-row path on a local MySQL or
+MariaDB instance. The bulk load needs local_infile enabled in the server.
+It writes synthetic stories to the database configured in settings.py, so
+point it to a scratch database created with database/data_mining.sql.
+
+Run from the project root with:
+    python -m benchmarks.db_write_benchmark [-s STORIES] [-b BATCH_SIZE]
+"""
+import argparse
+import tempfile
+import time
+import uuid
+from author import Author
+from database import MySqlConnection, BulkLoader
+from story import Story
+from tag import Tag
+
+MEMBER_SINCE = '\nMember since\nJune 1, 2010\n'
+DATE = 'June 24, 2021 5:00 a.m. PT'
+
+
+def build_stories(amount, authors_amount=30, tags_amount=100):
+    """
+    Creates synthetic stories sharing a pool of authors and tags, like the
+    ones coming from CNET
+    Args:
+        amount: amount of stories to create
+        authors_amount: amount of different authors
+        tags_amount: amount of different tags
+
+    Returns:
+        stories: list of Story objects
+        rows: amount of rows written when saving them
+    """
+    run = uuid.uuid4().hex[:8]
+    authors = [Author('bench-{}-{}'.format(run, i), 'Author {}'.format(i),
+                      MEMBER_SINCE, location='Tel Aviv')
+               for i in range(authors_amount)]
+    tags = [Tag('Bench {} {}'.format(run, i),
+                '/tags/bench-{}-{}/'.format(run, i))
+            for i in range(tags_amount)]
+    stories = []
+    for i in range(amount):
+        story_authors = [authors[i % authors_amount]]
+        story_tags = [tags[(i + j) % tags_amount] for j in range(4)]
+        stories.append(Story(i + 1, 'Story {} {}'.format(run, i),
+                             'Description of the story', DATE,
+                             story_authors, tags=story_tags,
+                             url='https://www.cnet.com/news/bench-{}-{}/'
+                             .format(run, i)))
+    rows = amount * 2 + amount * 4 + authors_amount + tags_amount
+    return stories, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Database write benchmark')
+    parser.add_argument('-s', '--stories', type=int, default=500)
+    parser.add_argument('-b', '--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    stories, rows = build_stories(args.stories)
+    start = time.perf_counter()
+    MySqlConnection.save_results(stories, args.batch_size)
+    batched = time.perf_counter() - start
+
+    stories, rows = build_stories(args.stories)
+    with tempfile.TemporaryDirectory() as directory:
+        loader = BulkLoader(directory)
+        start = time.perf_counter()
+        loader.add_stories(stories)
+        loader.load()
+        bulk = time.perf_counter() - start
+        loader.close()
+
+    stories, rows = build_stories(args.stories)
+    start = time.perf_counter()
+    MySqlConnection.save_results_row_by_row(stories)
+    row_by_row = time.perf_counter() - start
+
+    print('{:<12} {:>10} {:>12} {:>10}'.format('path', 'seconds', 'rows/s',
+                                               'speedup'))
+    for name, elapsed in [('batched', batched), ('bulk load', bulk),
+                          ('row by row', row_by_row)]:
+        print('{:<12} {:>10.3f} {:>12.1f} {:>9.1f}x'.format(
+            name, elapsed, rows / elapsed, row_by_row / elapsed))
+
+
+if __name__ == '__main__':
+    main()
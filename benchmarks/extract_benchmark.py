@@ -0,0 +1,99 @@
+"""
+Compares the per-story extraction time using the raw CSS selectors of the
+templates against the selectors precompiled by the Configuration, over a
+directory of saved story pages.
+
+Run from the project root with:
+    python -m benchmarks.extract_benchmark [PAGES_DIRECTORY] [-r REPEAT]
+"""
+import argparse
+import os
+import time
+from bs4 import BeautifulSoup
+from main import build_configuration
+from extraction import scrape_obj
+from settings import STORY_SCRAPE_FIELDS, STORY_TAG_SCRAPE_FIELDS, \
+    HTML_PARSER_LXML
+from benchmarks.site import FIXTURES_DIRECTORY
+
+
+def scrape_obj_raw(soup, template, fields):
+    """
+    Extraction as it was done before compiling the selectors: soup.select
+    with the raw CSS strings
+    """
+    s = {}
+    for f in fields:
+        element = soup.select(template[f['field']])
+        if len(element) > 0:
+            if 'attr' not in f:
+                if not f['multiple']:
+                    s[f['field']] = element[0].getText()
+                else:
+                    s[f['field']] = [el.getText() for el in element]
+            else:
+                if not f['multiple']:
+                    s[f['field']] = element[0].get(f['attr'], None)
+                else:
+                    s[f['field']] = [el.get(f['attr'], None)
+                                     for el in element]
+    return s
+
+
+def extract(soup, templates, tag_template, tag_topic_template, scrape_obj,
+            select):
+    """
+    Extracts the fields of a story the way the scraper does
+    """
+    for template in templates:
+        if len(select(soup, template['header'])) > 0:
+            return [scrape_obj(soup, template, STORY_SCRAPE_FIELDS),
+                    scrape_obj(soup, tag_template, STORY_TAG_SCRAPE_FIELDS),
+                    scrape_obj(soup, tag_topic_template,
+                               STORY_TAG_SCRAPE_FIELDS)]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Story extraction benchmark')
+    parser.add_argument('directory', nargs='?', default=FIXTURES_DIRECTORY,
+                        help='Directory of saved pages, holding the stories '
+                             'in its stories subdirectory. The fixture pages '
+                             'are used by default.')
+    parser.add_argument('-r', '--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    stories_dir = os.path.join(args.directory, 'stories')
+    config = build_configuration()
+    soups = []
+    for name in sorted(os.listdir(stories_dir)):
+        if name.endswith('.html'):
+            with open(os.path.join(stories_dir, name), 'rb') as f:
+                soups.append(BeautifulSoup(f.read(), HTML_PARSER_LXML,
+                                           parse_only=config.story_strainer))
+    if not soups:
+        parser.error('No saved stories were found in {}'.format(stories_dir))
+
+    variants = [
+        ('raw selectors', config.story_templates,
+         config.stories_tag_template, config.stories_tag_topic_template,
+         scrape_obj_raw, lambda soup, selector: soup.select(selector)),
+        ('compiled selectors', config.compiled_story_templates,
+         config.compiled_stories_tag_template,
+         config.compiled_stories_tag_topic_template, scrape_obj,
+         lambda soup, selector: selector.select(soup)),
+    ]
+    print('{} stories'.format(len(soups)))
+    print('{:<20} {:>12}'.format('variant', 'us/story'))
+    for name, *extract_args in variants:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for soup in soups:
+                extract(soup, *extract_args)
+        elapsed = time.perf_counter() - start
+        print('{:<20} {:>12.1f}'.format(
+            name, elapsed / (args.repeat * len(soups)) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
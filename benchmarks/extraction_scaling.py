@@ -0,0 +1,94 @@
+"""
+Measures how the story extraction throughput scales with the amount of
+processes of the extraction process pool, over a directory of saved story
+pages.
+
+Run from the project root with:
+    python -m benchmarks.extraction_scaling [PAGES_DIRECTORY] [-n PAGES]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import extraction
+from main import build_configuration
+from settings import HTML_PARSER_LXML
+from benchmarks.site import FIXTURES_DIRECTORY
+
+
+def load_stories(directory):
+    """
+    Reads the saved story pages
+    Args:
+        directory: directory holding the stories in its stories subdirectory
+
+    Returns:
+        stories: list of bytes
+    """
+    stories_dir = os.path.join(directory, 'stories')
+    stories = []
+    for name in sorted(os.listdir(stories_dir)):
+        if name.endswith('.html'):
+            with open(os.path.join(stories_dir, name), 'rb') as f:
+                stories.append(f.read())
+    return stories
+
+
+def run(config, pages, processes):
+    """
+    Extracts the fields of every page with a process pool
+    Args:
+        config: Configuration object
+        pages: list of bytes
+        processes: amount of processes of the pool
+
+    Returns:
+        elapsed: seconds it took to extract every page
+    """
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=extraction.process_pool_context(),
+                             initializer=extraction.init_worker,
+                             initargs=(config, HTML_PARSER_LXML)) as pool:
+        # Warm up every process before timing
+        list(pool.map(extraction.extract_story_fields_in_worker,
+                      pages[:processes], [[0, 1]] * processes))
+        start = time.perf_counter()
+        for fields, _ in pool.map(extraction.extract_story_fields_in_worker,
+                               pages, [[0, 1]] * len(pages), chunksize=8):
+            if fields is None:
+                raise RuntimeError('A story did not match any template')
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extraction scaling '
+                                                 'benchmark')
+    parser.add_argument('directory', nargs='?', default=FIXTURES_DIRECTORY,
+                        help='Directory of saved pages. The fixture pages '
+                             'are used by default.')
+    parser.add_argument('-n', '--pages', type=int, default=2000,
+                        help='Amount of pages to extract per run.')
+    parser.add_argument('-m', '--max-processes', type=int,
+                        default=os.cpu_count())
+    args = parser.parse_args()
+
+    stories = load_stories(args.directory)
+    if not stories:
+        parser.error('No saved stories were found in {}'
+                     .format(args.directory))
+    pages = [stories[i % len(stories)] for i in range(args.pages)]
+    config = build_configuration()
+
+    print('{:>10} {:>12} {:>10}'.format('processes', 'pages/s', 'speedup'))
+    baseline = None
+    processes = 1
+    while processes <= args.max_processes:
+        throughput = len(pages) / run(config, pages, processes)
+        baseline = baseline or throughput
+        print('{:>10} {:>12.1f} {:>10.2f}'.format(processes, throughput,
+                                                  throughput / baseline))
+        processes *= 2
+
+
+if __name__ == '__main__':
+    main()
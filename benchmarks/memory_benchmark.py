@@ -0,0 +1,165 @@
+"""
+Compares the memory held per scraped story by the slot-based Story, Author
+and Tag classes, with their interned strings and tuples, against the
+dict-backed classes they replaced, measured with tracemalloc.
+
+The stories are built the way the scraper builds them: every story gets
+fresh strings for its authors' usernames and its tags, as if they had just
+been parsed, and the authors and tags are shared through registries.
+
+Run from the project root with:
+    python -m benchmarks.memory_benchmark [-s STORIES] [-a AUTHORS] [-t TAGS]
+"""
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from author import Author
+from registry import Registry
+from settings import DOMAIN_URL
+from story import Story
+from tag import Tag
+
+MEMBER_SINCE = '\nMember since\nJune 1, 2010\n'
+DATE = 'Oct. 17, 2021 10:00 a.m. PT'
+AUTHORS_PER_STORY = 2
+TAGS_PER_STORY = 5
+
+
+class DictStory:
+    """
+    Story as it was before using slots: attributes in a dictionary and its
+    own lists of authors and tags
+    """
+
+    def __init__(self, index, title, description, date, authors=None,
+                 url=None, tags=None):
+        self.index = index
+        self.title = title.strip()
+        self.description = description.strip()
+        self.date = date.strip()
+        self.url = url
+        self.authors = authors
+        self.tags = tags
+
+
+class DictAuthor:
+    """
+    Author as it was before using slots and interning its fields
+    """
+
+    def __init__(self, username, name, member_since, location=None,
+                 occupation=None, website=None):
+        self.username = username
+        self.name = name.strip()
+        self.member_since = member_since.split('\n')[-2].strip()
+        self.location = location.strip() if location is not None else None
+        self.occupation = occupation.strip() if occupation is not None \
+            else None
+        self.website = website.strip() if website is not None else None
+
+
+class DictTag:
+    """
+    Tag as it was before using slots and interning its name and URL
+    """
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = DOMAIN_URL + url
+        self.is_topic = '/topics/' in self.url
+
+
+def fresh(string):
+    """
+    Returns a new string object equal to string, like the ones the parser
+    creates for every page
+    """
+    return ''.join(list(string))
+
+
+def build_stories(count, author_count, tag_count, story_cls, author_cls,
+                  tag_cls, intern, seed=0):
+    """
+    Builds stories with random authors and tags out of fixed pools, the way
+    the scraper does
+    Args:
+        count: amount of stories
+        author_count: amount of different authors
+        tag_count: amount of different tags
+        story_cls, author_cls, tag_cls: classes of the models
+        intern: function applied to the registry keys
+        seed: seed of the random choices
+
+    Returns:
+        stories, authors, tags: list of stories and the registries of the
+            authors and tags they share
+    """
+    rng = random.Random(seed)
+    stories = []
+    authors = Registry()
+    tags = Registry()
+    for i in range(count):
+        story_authors = []
+        for a in rng.sample(range(author_count), AUTHORS_PER_STORY):
+            username = intern(fresh('author{}'.format(a)))
+            story_authors.append(authors.get_or_create(
+                username, lambda: author_cls(
+                    username, fresh('Author {}'.format(a)),
+                    fresh(MEMBER_SINCE), location=fresh('San Francisco'),
+                    occupation=fresh('Senior Editor'))))
+        story_tags = []
+        for t in rng.sample(range(tag_count), TAGS_PER_STORY):
+            url = fresh('/tags/tag-{}/'.format(t))
+            name = fresh('Tag {}'.format(t))
+            story_tags.append(tags.get_or_create(
+                intern(DOMAIN_URL + url), lambda: tag_cls(name, url)))
+        stories.append(story_cls(
+            i + 1, 'Story {} title'.format(i),
+            'Description of the story {}'.format(i), fresh(DATE),
+            story_authors, url='{}news/story-{}/'.format(DOMAIN_URL, i),
+            tags=story_tags))
+    return stories, authors, tags
+
+
+def bytes_per_story(count, author_count, tag_count, *models):
+    """
+    Measures the memory held by the stories and their registries
+    Returns:
+        size: bytes per story
+    """
+    gc.collect()
+    tracemalloc.start()
+    built = build_stories(count, author_count, tag_count, *models)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Story memory benchmark')
+    parser.add_argument('-s', '--stories', type=int, default=100000,
+                        help='Amount of stories built.')
+    parser.add_argument('-a', '--authors', type=int, default=500,
+                        help='Amount of different authors.')
+    parser.add_argument('-t', '--tags', type=int, default=2000,
+                        help='Amount of different tags.')
+    args = parser.parse_args()
+
+    variants = [
+        ('dict-backed', DictStory, DictAuthor, DictTag, lambda s: s),
+        ('slots + interning', Story, Author, Tag, sys.intern),
+    ]
+    print('{} stories, {} authors, {} tags'.format(args.stories, args.authors,
+                                                   args.tags))
+    print('{:<20} {:>14}'.format('variant', 'bytes/story'))
+    for name, *models in variants:
+        size = bytes_per_story(args.stories, args.authors, args.tags, *models)
+        print('{:<20} {:>14.1f}'.format(name, size))
+
+
+if __name__ == '__main__':
+    main()
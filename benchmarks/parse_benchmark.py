@@ -0,0 +1,109 @@
+"""
+Compares the parsing time and memory of the HTML parsers, with and without
+the strainers built by the Configuration, over a directory of saved pages.
+The directory is expected to hold the pages in the subdirectories stories,
+profiles, tag_listings and top_stories.
+
+Run from the project root with:
+    python -m benchmarks.parse_benchmark [PAGES_DIRECTORY] [-r REPEAT]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from main import build_configuration
+from settings import HTML_PARSER_LXML, HTML_PARSER_PYTHON
+from benchmarks.site import FIXTURES_DIRECTORY
+
+PAGE_KINDS = {
+    'stories': 'story_strainer',
+    'profiles': 'author_strainer',
+    'tag_listings': 'tag_urls_strainer',
+    'top_stories': 'main_urls_strainer',
+}
+
+
+def load_pages(directory):
+    """
+    Reads the saved pages of every kind
+    Args:
+        directory: directory holding a subdirectory per kind of page
+
+    Returns:
+        pages: list of (kind, bytes) tuples
+    """
+    pages = []
+    for kind in PAGE_KINDS:
+        kind_dir = os.path.join(directory, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for name in sorted(os.listdir(kind_dir)):
+            if name.endswith('.html'):
+                with open(os.path.join(kind_dir, name), 'rb') as f:
+                    pages.append((kind, f.read()))
+    return pages
+
+
+def measure(pages, parser, strainers, repeat):
+    """
+    Parses every page with a parser
+    Args:
+        pages: list of (kind, bytes) tuples
+        parser: name of the parser used by BeautifulSoup
+        strainers: dictionary of strainers per kind of page, or None to
+            parse the whole pages
+        repeat: amount of times each page is parsed
+
+    Returns:
+        seconds, peak: average seconds per page and peak bytes allocated
+            while holding a parsed page
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for kind, content in pages:
+            strainer = strainers[kind] if strainers else None
+            BeautifulSoup(content, parser, parse_only=strainer)
+    seconds = (time.perf_counter() - start) / (repeat * len(pages))
+
+    peak = 0
+    for kind, content in pages:
+        strainer = strainers[kind] if strainers else None
+        tracemalloc.start()
+        soup = BeautifulSoup(content, parser, parse_only=strainer)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del soup
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML parsing benchmark')
+    parser.add_argument('directory', nargs='?', default=FIXTURES_DIRECTORY,
+                        help='Directory of saved pages. The fixture pages '
+                             'are used by default.')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args.directory)
+    if not pages:
+        parser.error('No saved pages were found in {}'.format(args.directory))
+    config = build_configuration()
+    strainers = {kind: getattr(config, attr)
+                 for kind, attr in PAGE_KINDS.items()}
+
+    print('{} pages'.format(len(pages)))
+    print('{:<26} {:>10} {:>14}'.format('parser', 'ms/page', 'peak KiB'))
+    for name, parser_name, page_strainers in [
+            ('html.parser', HTML_PARSER_PYTHON, None),
+            ('html.parser + strainer', HTML_PARSER_PYTHON, strainers),
+            ('lxml', HTML_PARSER_LXML, None),
+            ('lxml + strainer', HTML_PARSER_LXML, strainers)]:
+        seconds, peak = measure(pages, parser_name, page_strainers,
+                                args.repeat)
+        print('{:<26} {:>10.2f} {:>14.1f}'.format(name, seconds * 1000,
+                                                  peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares the lookup time of the author and tag registries against the
+linear scans over lists they replaced.
+
+Run from the project root with:
+    python -m benchmarks.registry_benchmark [-s SIZES]
+"""
+import argparse
+import random
+import time
+from author import Author
+from registry import Registry
+from tag import Tag
+
+MEMBER_SINCE = '\nMember since\nJune 1, 2010\n'
+
+
+def build(size):
+    """
+    Creates a given amount of authors and tags
+    Args:
+        size: amount of entities of each kind to create
+
+    Returns:
+        authors, tags: lists of Author and Tag objects
+    """
+    authors = [Author('user{}'.format(i), 'User {}'.format(i), MEMBER_SINCE)
+               for i in range(size)]
+    tags = [Tag('Tag {}'.format(i), '/tags/tag-{}/'.format(i))
+            for i in range(size)]
+    return authors, tags
+
+
+def linear_lookup(objects, key, get_key):
+    """
+    Looks up an object the way the scraper used to, scanning the whole list
+    """
+    found = None
+    for obj in objects:
+        if key == get_key(obj):
+            found = obj
+    return found
+
+
+def time_per_lookup(lookup, keys):
+    """
+    Returns the average seconds per lookup
+    """
+    start = time.perf_counter()
+    for key in keys:
+        if lookup(key) is None:
+            raise RuntimeError('Key {} was not found'.format(key))
+    return (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entity registry benchmark')
+    parser.add_argument('-s', '--sizes', default='1000,10000,100000',
+                        help='Comma separated amounts of entities.')
+    parser.add_argument('-l', '--lookups', type=int, default=200,
+                        help='Amount of lookups timed with the linear scan.')
+    args = parser.parse_args()
+
+    print('{:>8} {:>8} {:>16} {:>16}'.format('kind', 'size', 'list (us)',
+                                             'registry (us)'))
+    for size in [int(s) for s in args.sizes.split(',')]:
+        authors, tags = build(size)
+        kinds = [('author', authors, Author.get_username),
+                 ('tag', tags, Tag.get_url)]
+        for kind, objects, get_key in kinds:
+            registry = Registry()
+            for obj in objects:
+                registry.add(get_key(obj), obj)
+            keys = [get_key(random.choice(objects))
+                    for _ in range(args.lookups)]
+            linear = time_per_lookup(
+                lambda k: linear_lookup(objects, k, get_key), keys)
+            hashed = time_per_lookup(registry.get, keys * 100)
+            print('{:>8} {:>8} {:>16.2f} {:>16.4f}'.format(
+                kind, size, linear * 1e6, hashed * 1e6))
+
+
+if __name__ == '__main__':
+    main()
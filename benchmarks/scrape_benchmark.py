@@ -0,0 +1,211 @@
+"""
+Runs Scraper.scrape in each mode against a local stand-in server serving the
+fixture pages, and reports the pages fetched per second, the latency
+percentiles of each stage and the peak memory.
+The stories are printed (to a discarded stdout) instead of saved, so no
+database is needed. The author mode isn't included because it drives a real
+Chrome browser, but the profiles of the stories' authors are scraped in
+every mode.
+
+Run from the project root with:
+    python -m benchmarks.scrape_benchmark [-m MODE] [-w WORKERS]
+        [-l LATENCY] [-e ERROR_RATE] [-n NUMBER] [--rate-limit]
+"""
+import argparse
+import contextlib
+import io
+import threading
+import time
+import tracemalloc
+from benchmarks.server import StandInServer
+from benchmarks.site import FIXTURES_DIRECTORY, StandInTransport, \
+    load_site, tags
+from http_cache import url_class
+from main import build_configuration
+from rate_limiter import RateLimiter
+from scraper import Scraper
+from settings import MODE_TOP_STORIES, MODE_TAG, MODE_BATCH, API_SCIENCE, \
+    HTML_PARSERS, HTML_PARSER_DEFAULT, SUCCESS_STATUS_CODE, \
+    DESTINATION_FILE_NAME
+
+MODE_API = 'top_stories+api'
+MODES = [MODE_TOP_STORIES, MODE_TAG, MODE_BATCH, MODE_API]
+PERCENTILES = [50, 90, 99]
+
+
+class StageTimes:
+    """
+    Class that collects the durations of each stage of the scraping, from
+    several threads
+    """
+
+    def __init__(self):
+        self.times = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.times.setdefault(stage, []).append(seconds)
+
+    def add_response(self, response):
+        """
+        Records a response received by the transport as a fetch of its URL
+        class
+        """
+        self.add('fetch {}'.format(url_class(response.url)),
+                 response.elapsed)
+        if response.status_code != SUCCESS_STATUS_CODE:
+            with self._lock:
+                self.errors += 1
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+
+class BenchmarkScraper(Scraper):
+    """
+    Scraper that times its parsing, author and story stages
+    """
+
+    def __init__(self, *args, stage_times, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stage_times = stage_times
+
+    def _scrape_story(self, url, index):
+        with self.stage_times.measure('story (total)'):
+            return super()._scrape_story(url, index)
+
+    def _extract_story_fields(self, content, url=None):
+        with self.stage_times.measure('parse story'):
+            return super()._extract_story_fields(content, url)
+
+    def _scrape_author(self, username):
+        with self.stage_times.measure('author (total)'):
+            return super()._scrape_author(username)
+
+
+def percentile(values, p):
+    """
+    Returns the nearest-rank percentile of a list of values
+    Args:
+        values: sorted list of numbers
+        p: percentile between 0 and 100
+
+    Returns:
+        value: the percentile
+    """
+    rank = max(1, int(round(p / 100 * len(values))))
+    return values[min(rank, len(values)) - 1]
+
+
+def run(mode, server, args):
+    """
+    Runs the scraper once in a mode
+    Args:
+        mode: one of MODES
+        server: running StandInServer
+        args: parsed command line arguments
+
+    Returns:
+        elapsed, peak, stage_times: seconds the scrape took, peak bytes
+            allocated and StageTimes of the run
+    """
+    stage_times = StageTimes()
+    transport = StandInTransport(server.url,
+                                 on_response=stage_times.add_response)
+    rate_limiter = RateLimiter(robots_transport=transport) \
+        if args.rate_limit else None
+    kwargs = {}
+    if mode == MODE_API:
+        kwargs['api'] = API_SCIENCE
+        mode = MODE_TOP_STORIES
+    elif mode == MODE_TAG:
+        kwargs['tag'] = tags(args.directory)[0]
+    elif mode == MODE_BATCH:
+        kwargs['targets'] = [(MODE_TOP_STORIES, None)] + \
+            [(MODE_TAG, tag) for tag in tags(args.directory)]
+    scraper = BenchmarkScraper(
+        build_configuration(), logging=False, should_save=False,
+        fail_silently=True, file_name=DESTINATION_FILE_NAME, mode=mode,
+        number=args.number,
+        workers=args.workers, transport=transport, parser=args.parser,
+        stream=args.stream, processes=args.processes,
+        rate_limiter=rate_limiter, stage_times=stage_times, **kwargs)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraper.scrape()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, stage_times
+
+
+def report(mode, elapsed, peak, stage_times):
+    """
+    Prints the results of a run
+    """
+    pages = sum(len(times) for stage, times in stage_times.times.items()
+                if stage.startswith('fetch'))
+    print('\n{}: {} pages in {:.3f} s, {:.1f} pages/s, {} non-200 responses, '
+          'peak {:.1f} MiB'.format(mode, pages, elapsed, pages / elapsed,
+                                   stage_times.errors, peak / 1024 / 1024))
+    header = '{:<24} {:>7}' + ' {:>9}' * len(PERCENTILES)
+    print(header.format('stage', 'count',
+                        *['p{} ms'.format(p) for p in PERCENTILES]))
+    for stage in sorted(stage_times.times):
+        times = sorted(stage_times.times[stage])
+        print(header.replace('{:>9}', '{:>9.2f}').format(
+            stage, len(times),
+            *[percentile(times, p) * 1000 for p in PERCENTILES]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scraper benchmark')
+    parser.add_argument('-m', '--mode', choices=MODES, action='append',
+                        help='Mode to run. It can be repeated; all of them '
+                             'run by default.')
+    parser.add_argument('-d', '--directory', default=FIXTURES_DIRECTORY,
+                        help='Directory of fixture pages.')
+    parser.add_argument('-n', '--number', type=int, default=100)
+    parser.add_argument('-w', '--workers', type=int, default=4)
+    parser.add_argument('-p', '--processes', type=int)
+    parser.add_argument('-s', '--stream', action='store_true')
+    parser.add_argument('--parser', choices=HTML_PARSERS,
+                        default=HTML_PARSER_DEFAULT)
+    parser.add_argument('--rate-limit', action='store_true',
+                        help='Send the requests through the rate limiter.')
+    parser.add_argument('-l', '--latency', type=float, default=0.0,
+                        help='Seconds the server waits before answering.')
+    parser.add_argument('-e', '--error-rate', type=float, default=0.0,
+                        help='Fraction of the requests answered with an '
+                             'error.')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the injected errors.')
+    args = parser.parse_args()
+
+    pages = load_site(args.directory)
+    if not pages:
+        parser.error('No fixture pages were found in {}'
+                     .format(args.directory))
+    with StandInServer(pages, args.latency, args.error_rate,
+                       args.error_status, seed=args.seed) as server:
+        for mode in args.mode or MODES:
+            try:
+                elapsed, peak, stage_times = run(mode, server, args)
+            except (RuntimeError, ValueError) as e:
+                print('\n{}: failed: {}'.format(mode, e))
+                continue
+            report(mode, elapsed, peak, stage_times)
+
+
+if __name__ == '__main__':
+    main()
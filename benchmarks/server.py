@@ -0,0 +1,124 @@
+import gzip
+import io
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Request handler for the local stand-in server. It answers every GET with
+    the page registered for the path, keeping the connection alive. A
+    fraction of the requests can be answered with an error instead.
+    """
+    protocol_version = 'HTTP/1.1'
+    # Sends small responses right away instead of waiting for the client to
+    # acknowledge the previous segment (Nagle's algorithm)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """
+        Serves the page registered for the requested path, or a 404 error
+        """
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.should_fail():
+            self._send(server.error_status, b'Service unavailable',
+                       {'Retry-After': str(server.retry_after)})
+            return
+        body = server.pages.get(self.path.split('?')[0])
+        if body is None:
+            self._send(404, b'Not found')
+            return
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            self._send(200, gzip.compress(body), {'Content-Encoding': 'gzip'})
+        else:
+            self._send(200, body)
+
+    def _send(self, status, body, headers=None):
+        """
+        Sends a complete response with its Content-Length so the connection
+        can be reused. The headers and the body are sent in a single write.
+        Args:
+            status: HTTP status code
+            body: bytes to send
+            headers: optional dictionary of extra headers
+        """
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        # The header block is written to a buffer first, so the response
+        # goes out with a single write
+        wfile = self.wfile
+        self.wfile = io.BytesIO()
+        try:
+            self.end_headers()
+            response = self.wfile.getvalue() + body
+        finally:
+            self.wfile = wfile
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        """
+        Silences the default request logging
+        """
+        pass
+
+
+class StandInServer:
+    """
+    Local HTTP server that stands in for the sites the scraper queries, so it
+    can be benchmarked without touching the network
+    """
+
+    def __init__(self, pages, latency=0.0, error_rate=0.0, error_status=503,
+                 retry_after=1, seed=None):
+        """
+        Creates the server on a free local port
+        Args:
+            pages: dictionary mapping a path to the bytes served for it
+            latency: seconds the server waits before answering each request
+            error_rate: fraction of the requests answered with an error
+            error_status: HTTP status code of the injected errors
+            retry_after: value of the Retry-After header sent with the
+                injected errors
+            seed: optional - seed of the random errors, so runs can be
+                repeated
+        """
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.pages = pages
+        self.httpd.latency = latency
+        self.httpd.error_rate = error_rate
+        self.httpd.error_status = error_status
+        self.httpd.retry_after = retry_after
+        errors = random.Random(seed)
+        errors_lock = threading.Lock()
+
+        def should_fail():
+            with errors_lock:
+                return errors.random() < error_rate
+
+        self.httpd.should_fail = should_fail
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+
+    @property
+    def url(self):
+        """
+        Returns the base URL of the server
+        """
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,120 @@
+"""
+Stand-in for the sites the scraper queries, built out of the fixture pages
+in benchmarks/fixtures:
+
+    stories/<slug>.html          served as /news/<slug>/
+    profiles/<username>.html     served as /profiles/<username>
+    tag_listings/<tag>.html      served as /tags/<tag>
+    tag_listings/<tag>-<n>.html  served as /tags/<tag>/<n>/
+    top_stories/index.html       served as /news/
+    api/<topic>.json             served as /svc/topstories/v2/<topic>.json
+
+The fixture pages are synthetic: they follow the markup the templates in
+settings.py select from (both story layouts), surrounded by the usual
+header, scripts and footer of a CNET page.
+"""
+import os
+import re
+from transport import HttpTransport
+from settings import DOMAIN_URL, API_URL
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                  'fixtures')
+_API_ORIGIN = re.match(r'https?://[^/]+', API_URL).group(0)
+_TAG_PAGE = re.compile(r'^(.+)-(\d+)$')
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _files(directory, extension):
+    """
+    Lists the files of a directory with an extension
+    Args:
+        directory: directory to list
+        extension: extension of the files, e.g. '.html'
+
+    Returns:
+        files: list of (name without extension, path) tuples
+    """
+    if not os.path.isdir(directory):
+        return []
+    return [(name[:-len(extension)], os.path.join(directory, name))
+            for name in sorted(os.listdir(directory))
+            if name.endswith(extension)]
+
+
+def load_site(directory=FIXTURES_DIRECTORY):
+    """
+    Reads the fixture pages and maps them to the paths they are served at
+    Args:
+        directory: directory holding the fixture pages
+
+    Returns:
+        pages: dictionary mapping a path to the bytes served for it
+    """
+    pages = {}
+    for slug, path in _files(os.path.join(directory, 'stories'), '.html'):
+        pages['/news/{}/'.format(slug)] = _read(path)
+    for username, path in _files(os.path.join(directory, 'profiles'),
+                                  '.html'):
+        pages['/profiles/{}'.format(username)] = _read(path)
+    for name, path in _files(os.path.join(directory, 'tag_listings'),
+                             '.html'):
+        match = _TAG_PAGE.match(name)
+        if match:
+            pages['/tags/{}/{}/'.format(*match.groups())] = _read(path)
+        else:
+            pages['/tags/{}'.format(name)] = _read(path)
+    index = os.path.join(directory, 'top_stories', 'index.html')
+    if os.path.isfile(index):
+        pages['/news/'] = _read(index)
+    for topic, path in _files(os.path.join(directory, 'api'), '.json'):
+        pages['/svc/topstories/v2/{}.json'.format(topic)] = _read(path)
+    return pages
+
+
+def tags(directory=FIXTURES_DIRECTORY):
+    """
+    Returns the tags that have fixture listing pages
+    Args:
+        directory: directory holding the fixture pages
+
+    Returns:
+        tags: sorted list of tags
+    """
+    return sorted({name for name, _ in
+                   _files(os.path.join(directory, 'tag_listings'), '.html')
+                   if not _TAG_PAGE.match(name)})
+
+
+class StandInTransport(HttpTransport):
+    """
+    HttpTransport that sends the requests for CNET and the New York Times API
+    to a local stand-in server instead. The responses keep the original URL.
+    """
+
+    def __init__(self, base_url, on_response=None, **kwargs):
+        """
+        Creates the transport
+        Args:
+            base_url: base URL of the stand-in server
+            on_response: optional - function called with every Response
+            **kwargs: keyword arguments passed to HttpTransport
+        """
+        super().__init__(**kwargs)
+        self.base_url = base_url
+        self.on_response = on_response
+
+    def get(self, url, headers=None):
+        local_url = url
+        for origin in (DOMAIN_URL, _API_ORIGIN):
+            if url.startswith(origin):
+                local_url = self.base_url + url[len(origin):]
+        response = super().get(local_url, headers=headers)
+        response.url = url
+        if self.on_response is not None:
+            self.on_response(response)
+        return response
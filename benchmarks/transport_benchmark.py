@@ -0,0 +1,85 @@
+"""
+Compares the HTTP transports against a local stand-in server.
+
+Run from the project root with:
+    python -m benchmarks.transport_benchmark [-r REQUESTS] [-w WORKERS]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from benchmarks.server import StandInServer
+from settings import HTTP_BACKEND_REQUESTS, HTTP_BACKEND_HTTP2
+from transport import create_transport
+
+PAGE = b'<html><body>' + b'<p>CNET story paragraph</p>' * 2000 + \
+       b'</body></html>'
+
+
+class BareRequestsTransport:
+    """
+    Transport that reproduces the original behaviour: a bare requests.get
+    per page, opening a new connection every time
+    """
+
+    @staticmethod
+    def get(url):
+        return requests.get(url)
+
+    def close(self):
+        pass
+
+
+def run(transport, url, amount, workers):
+    """
+    Requests the same URL several times through a transport
+    Args:
+        transport: transport to benchmark
+        url: URL to request
+        amount: amount of requests to make
+        workers: amount of concurrent requests
+
+    Returns:
+        elapsed: seconds it took to make every request
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for page in executor.map(lambda _: transport.get(url), range(amount)):
+            if page.status_code != 200:
+                raise RuntimeError('Unexpected status code {}'
+                                   .format(page.status_code))
+    elapsed = time.perf_counter() - start
+    transport.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP transport benchmark')
+    parser.add_argument('-r', '--requests', type=int, default=500)
+    parser.add_argument('-w', '--workers', type=int, default=8)
+    parser.add_argument('-l', '--latency', type=float, default=0.0,
+                        help='Seconds the server waits before answering.')
+    args = parser.parse_args()
+
+    with StandInServer({'/news/story/': PAGE}, args.latency) as server:
+        url = server.url + '/news/story/'
+        transports = [('bare requests.get', BareRequestsTransport)]
+        transports.append((HTTP_BACKEND_REQUESTS,
+                           lambda: create_transport(HTTP_BACKEND_REQUESTS)))
+        transports.append((HTTP_BACKEND_HTTP2,
+                           lambda: create_transport(HTTP_BACKEND_HTTP2)))
+        print('{:<20} {:>10} {:>12}'.format('transport', 'seconds',
+                                            'requests/s'))
+        for name, factory in transports:
+            try:
+                transport = factory()
+            except RuntimeError as e:
+                print('{:<20} skipped: {}'.format(name, e))
+                continue
+            elapsed = run(transport, url, args.requests, args.workers)
+            print('{:<20} {:>10.3f} {:>12.1f}'.format(
+                name, elapsed, args.requests / elapsed))
+
+
+if __name__ == '__main__':
+    main()
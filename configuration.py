@@ -1,3 +1,14 @@
+import re
+import soupsieve
+from bs4 import SoupStrainer
+
+# First compound selector of a CSS selector, i.e. up to the first combinator
+SELECTOR_ROOT = re.compile(r'[^\s>+~]+')
+SELECTOR_TAG = re.compile(r'^[a-zA-Z][\w-]*')
+SELECTOR_ID = re.compile(r'#([\w-]+)')
+SELECTOR_CLASS = re.compile(r'\.([\w-]+)')
+
+
 class Configuration:
     """
     Class in charge of handling everything related to the scraper's settings
@@ -55,6 +66,9 @@ class Configuration:
         ]
         """
 
+        self._args = (main_urls_pattern, story_templates, author_template,
+                      stories_tag_template, stories_tag_topic_template,
+                      author_urls_pattern, tag_urls_pattern)
         self.main_urls_pattern = main_urls_pattern
         self._fix_main_patterns_extract_urls()
         self.story_templates = story_templates
@@ -63,6 +77,126 @@ class Configuration:
         self.stories_tag_topic_template = stories_tag_topic_template
         self.author_urls_pattern = author_urls_pattern
         self.tag_urls_pattern = tag_urls_pattern
+        self._build_strainers()
+        self._compile_selectors()
+
+    def _compile_selectors(self):
+        """
+        Compiles every selector used to scrape the sites once, so they don't
+        need to be parsed again for every site and field. The compiled
+        templates have the same keys as the original ones, holding
+        soupsieve.SoupSieve objects with select and match methods.
+        """
+
+        self.compiled_main_urls_pattern = [
+            [soupsieve.compile(pattern[0]), pattern[1]]
+            for pattern in self.main_urls_pattern
+        ]
+        self.compiled_story_templates = [
+            self.compile_template(template)
+            for template in self.story_templates
+        ]
+        self.compiled_author_template = self.compile_template(
+            self.author_template)
+        self.compiled_stories_tag_template = self.compile_template(
+            self.stories_tag_template)
+        self.compiled_stories_tag_topic_template = self.compile_template(
+            self.stories_tag_topic_template)
+        self.compiled_tag_urls_pattern = soupsieve.compile(
+            self.tag_urls_pattern)
+
+    @staticmethod
+    def compile_template(template):
+        """
+        Compiles the selectors of a template
+
+        Args:
+            template: dictionary of CSS selectors
+
+        Returns:
+            compiled: dictionary with the same keys and the compiled selectors
+        """
+
+        return {key: soupsieve.compile(selector)
+                for key, selector in template.items()}
+
+    def __reduce__(self):
+        """
+        Pickles the Configuration through its constructor arguments, so it
+        can be sent to other processes: the strainers and compiled selectors
+        are built again there.
+        """
+
+        return Configuration, self._args
+
+    def _build_strainers(self):
+        """
+        Builds the SoupStrainers that restrict the parsing of each kind of
+        site to the subtrees its templates select from
+        """
+
+        story_selectors = []
+        for template in self.story_templates:
+            story_selectors += template.values()
+        story_selectors += self.stories_tag_template.values()
+        story_selectors += self.stories_tag_topic_template.values()
+        self.story_strainer = self._build_strainer(story_selectors)
+        self.author_strainer = self._build_strainer(
+            self.author_template.values())
+        self.main_urls_strainer = self._build_strainer(
+            [pattern[0] for pattern in self.main_urls_pattern])
+        self.tag_urls_strainer = self._build_strainer([self.tag_urls_pattern])
+
+    @staticmethod
+    def _build_strainer(selectors):
+        """
+        Builds a SoupStrainer that only keeps the elements (and their
+        subtrees) matching the first compound selector of any of the given
+        CSS selectors, taking into account its tag name, id and classes.
+
+        Args:
+            selectors: list of CSS selectors
+
+        Returns:
+            strainer: SoupStrainer instance or None if any of the selectors
+                can't be restricted, so the whole site needs to be parsed
+        """
+
+        roots = set()
+        for selector in selectors:
+            for part in selector.split(','):
+                root = SELECTOR_ROOT.match(part.strip())
+                if root is None:
+                    return None
+                root = root.group(0)
+                tag = SELECTOR_TAG.match(root)
+                element_id = SELECTOR_ID.search(root)
+                classes = frozenset(SELECTOR_CLASS.findall(root))
+                if element_id is None and not classes:
+                    return None
+                roots.add((tag.group(0).lower() if tag else None,
+                           element_id.group(1) if element_id else None,
+                           classes))
+
+        def keep(name, attrs):
+            """
+            Returns True if the element matches any of the roots
+            """
+            if not isinstance(attrs, dict):
+                return False
+            element_classes = attrs.get('class') or ''
+            if isinstance(element_classes, str):
+                element_classes = element_classes.split()
+            for tag, element_id, classes in roots:
+                if tag is not None and tag != name:
+                    continue
+                if element_id is not None and element_id != attrs.get('id'):
+                    continue
+                if classes.issubset(element_classes):
+                    return True
+            return False
+
+        return SoupStrainer(keep)
 
     def _fix_main_patterns_extract_urls(self):
         """
@@ -1 +1,3 @@
+from .connection_pool import ConnectionPool
 from .mysql_connection import MySqlConnection
+from .bulk_loader import BulkLoader
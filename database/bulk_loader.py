@@ -0,0 +1,270 @@
+import datetime
+import os
+import pymysql.cursors
+from settings import HOST, USER, PASSWORD, DATABASE, DB_CONNECT_TIMEOUT
+from .mysql_connection import MySqlConnection, MeteredDictCursor
+from metrics import DB_COMMIT_SECONDS
+from tracing import TRACER
+
+# MySQL errors raised when LOAD DATA LOCAL INFILE is disabled in the server
+LOCAL_INFILE_DISABLED_ERRORS = (1148, 2068, 3948)
+
+# Staging tables: name, definition of the columns and columns of its TSV
+# file, in order. They are temporary, so they only exist in the connection
+# of the load, and use the character set of the real tables.
+STAGING_TABLES = [
+    ('stage_article',
+     'title varchar(255), date datetime, url varchar(255), '
+     'description varchar(255), scraped_at datetime',
+     ['title', 'date', 'url', 'description', 'scraped_at']),
+    ('stage_author',
+     'nick_name varchar(255), name varchar(255), location varchar(255), '
+     'occupation varchar(255), url varchar(255), member_since date',
+     ['nick_name', 'name', 'location', 'occupation', 'url',
+      'member_since']),
+    ('stage_hashtag',
+     'name varchar(255), url varchar(255), is_topic tinyint',
+     ['name', 'url', 'is_topic']),
+    ('stage_article_author',
+     'url varchar(255), nick_name varchar(255)',
+     ['url', 'nick_name']),
+    ('stage_article_hashtag',
+     'url varchar(255), name varchar(255)',
+     ['url', 'name']),
+]
+
+# Set-based merges of the staging tables into the real tables, in order
+MERGE_STATEMENTS = [
+    'INSERT INTO article (title, date, url, description, scraped_at) '
+    'SELECT title, date, url, description, scraped_at FROM stage_article '
+    'ON DUPLICATE KEY UPDATE title = VALUES(title), date = VALUES(date), '
+    'description = VALUES(description), scraped_at = VALUES(scraped_at)',
+
+    'INSERT INTO author (nick_name, name, location, occupation, url, '
+    'member_since) SELECT nick_name, name, location, occupation, url, '
+    'member_since FROM stage_author '
+    'ON DUPLICATE KEY UPDATE name = VALUES(name), '
+    'location = VALUES(location), occupation = VALUES(occupation), '
+    'url = VALUES(url), member_since = VALUES(member_since)',
+
+    'INSERT INTO hashtag (name, url, is_topic) '
+    'SELECT name, url, is_topic FROM stage_hashtag '
+    'ON DUPLICATE KEY UPDATE url = VALUES(url), '
+    'is_topic = VALUES(is_topic)',
+
+    'INSERT INTO article_author (id_article, id_author) '
+    'SELECT t.id_article, t.id_author FROM ('
+    'SELECT DISTINCT a.id_article, au.id_author FROM stage_article_author s '
+    'JOIN article a ON a.url = s.url '
+    'JOIN author au ON au.nick_name = s.nick_name) AS t '
+    'ON DUPLICATE KEY UPDATE id_article = t.id_article',
+
+    'INSERT INTO article_hashtag (id_article, id_hashtag) '
+    'SELECT t.id_article, t.id_hashtag FROM ('
+    'SELECT DISTINCT a.id_article, h.id_hashtag FROM stage_article_hashtag s '
+    'JOIN article a ON a.url = s.url '
+    'JOIN hashtag h ON h.name = s.name) AS t '
+    'ON DUPLICATE KEY UPDATE id_article = t.id_article',
+]
+
+
+def tsv_field(value):
+    """
+    Formats a value as a field of a TSV file read by LOAD DATA with its
+    default options: NULL is written as \\N and backslashes, tabs and line
+    breaks are escaped.
+
+    Args:
+        value: value of the field
+
+    Returns:
+        field: text of the field
+    """
+
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        value = int(value)
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r').replace('\0', '\\0')
+
+
+def _recover_staging_file(path):
+    """
+    Prepares a staging file left by a previous run to be appended to: a
+    last line cut in the middle (e.g. by a crash) is dropped.
+
+    Args:
+        path: path of the staging file
+
+    Returns:
+        lines: amount of complete lines in the file
+    """
+
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb+') as f:
+        content = f.read()
+        complete = content.rfind(b'\n') + 1
+        if complete < len(content):
+            f.truncate(complete)
+    return content.count(b'\n', 0, complete)
+
+
+class BulkLoader:
+    """
+    Class that saves stories with a bulk load, for large backfills. The
+    stories are staged to one TSV file per table as they are added, and
+    load reads the files into temporary staging tables with LOAD DATA LOCAL
+    INFILE and merges them into the real tables with set-based upserts, in
+    a single transaction.
+    The staging files are only emptied once they are loaded, so stories
+    staged by a run whose load failed are loaded by the next one.
+    The server needs to allow it: SET GLOBAL local_infile = 1
+    """
+
+    def __init__(self, directory):
+        """
+        Creates the staging directory, if needed, and opens the staging
+        files, keeping the stories a previous run left in them
+        Args:
+            directory: directory of the staging files
+        """
+        directory = os.path.abspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._authors = set()
+        self._tags = set()
+        self._files = {}
+        for table, _, _ in STAGING_TABLES:
+            path = os.path.join(directory, table + '.tsv')
+            lines = _recover_staging_file(path)
+            if table == 'stage_article':
+                # Stories staged by a previous run that weren't loaded
+                self.recovered = lines
+            self._files[table] = open(path, 'a', encoding='utf-8',
+                                      newline='')
+        self.staged = self.recovered
+
+    def _write_rows(self, table, rows):
+        """
+        Appends rows to the staging file of a table
+        Args:
+            table: name of the staging table
+            rows: iterable of tuples of values
+        """
+        self._files[table].writelines(
+            '\t'.join(map(tsv_field, row)) + '\n' for row in rows)
+
+    def add_stories(self, stories):
+        """
+        Stages a batch of stories, with their authors and tags and the
+        relationships between them. Authors and tags are staged once.
+        Args:
+            stories: list of Story objects
+        """
+        scraped_at = datetime.datetime.now().replace(microsecond=0)
+        stories = [story for story in stories if story.url is not None]
+        authors = {}
+        tags = {}
+        stories_authors = []
+        stories_tags = []
+        for story in stories:
+            for author in story.authors or ():
+                if author.username.lower() not in self._authors:
+                    authors[author.username.lower()] = author
+                stories_authors.append((story.url, author.username))
+            for tag in story.tags or ():
+                if tag.name.lower() not in self._tags:
+                    tags[tag.name.lower()] = tag
+                stories_tags.append((story.url, tag.name))
+
+        self._write_rows('stage_article', (
+            (story.title,
+             MySqlConnection._fix_date(story.date).replace(microsecond=0),
+             story.url, story.description, scraped_at)
+            for story in stories))
+        self._write_rows('stage_author', (
+            (author.username, author.name, author.location,
+             author.occupation, author.website,
+             MySqlConnection._fix_date(author.member_since, 'author'))
+            for author in authors.values()))
+        self._write_rows('stage_hashtag', (
+            (tag.name, tag.url, tag.is_topic) for tag in tags.values()))
+        self._write_rows('stage_article_author', stories_authors)
+        self._write_rows('stage_article_hashtag', stories_tags)
+        self._authors.update(authors)
+        self._tags.update(tags)
+        self.staged += len(stories)
+
+    def load(self):
+        """
+        Loads the staged stories into the database and empties the staging
+        files. If the load fails, nothing is saved and the staged stories
+        are kept in the files, so the load can be retried, by this loader or
+        by the next one created on the same directory.
+
+        Returns:
+            loaded: amount of stories loaded
+        """
+        for f in self._files.values():
+            f.flush()
+        if self.staged == 0:
+            return 0
+        with TRACER.span('db_bulk_load', stories=self.staged):
+            try:
+                connection = pymysql.connect(
+                    host=HOST, user=USER, password=PASSWORD,
+                    database=DATABASE, connect_timeout=DB_CONNECT_TIMEOUT,
+                    cursorclass=MeteredDictCursor, local_infile=True)
+            except pymysql.MySQLError as e:
+                raise RuntimeError('Error! Could not connect to the database '
+                                   'for the bulk load: {}'.format(e))
+            try:
+                with connection.cursor() as cursor:
+                    self._load_staging_tables(cursor)
+                    for sql in MERGE_STATEMENTS:
+                        cursor.execute(sql)
+                with DB_COMMIT_SECONDS.time(), TRACER.span('db_commit'):
+                    connection.commit()
+            except pymysql.MySQLError as e:
+                try:
+                    connection.rollback()
+                except pymysql.MySQLError:
+                    pass
+                if e.args and e.args[0] in LOCAL_INFILE_DISABLED_ERRORS:
+                    raise RuntimeError('Error! The database server does not '
+                                       'allow LOAD DATA LOCAL INFILE. Enable '
+                                       'it with: SET GLOBAL local_infile = 1')
+                raise
+            finally:
+                connection.close()
+        loaded = self.staged
+        for f in self._files.values():
+            f.seek(0)
+            f.truncate()
+        self.staged = 0
+        self.recovered = 0
+        return loaded
+
+    def _load_staging_tables(self, cursor):
+        """
+        Creates the staging tables and loads the staging files into them
+        Args:
+            cursor: cursor of the connection of the load
+        """
+        for table, definition, columns in STAGING_TABLES:
+            cursor.execute(f'DROP TEMPORARY TABLE IF EXISTS {table}')
+            cursor.execute(f'CREATE TEMPORARY TABLE {table} ({definition}) '
+                           f'DEFAULT CHARSET = latin1')
+            cursor.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+                           f"CHARACTER SET utf8mb4 ({', '.join(columns)})",
+                           (self._files[table].name,))
+
+    def close(self):
+        """
+        Closes the staging files. Stories that weren't loaded stay in them,
+        and they are loaded by the next BulkLoader on the same directory.
+        """
+        for f in self._files.values():
+            f.close()
@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+import pymysql.cursors
+from settings import DB_POOL_SIZE, DB_HEALTH_CHECK_INTERVAL
+
+# MySQL client errors meaning the connection to the server was lost
+CONNECTION_LOST_ERRORS = (2006, 2013, 2055)
+
+
+def is_connection_lost(error):
+    """
+    Checks if a database error was caused by a lost connection
+
+    Args:
+        error: exception raised by pymysql
+
+    Returns:
+        True if the connection to the server was lost
+    """
+
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    return isinstance(error, pymysql.err.OperationalError) and \
+        len(error.args) > 0 and error.args[0] in CONNECTION_LOST_ERRORS
+
+
+class ConnectionPool:
+    """
+    Pool of database connections. Connections are only opened when they are
+    needed, they are reused across calls and threads, and the ones that
+    stayed idle for a while are checked (and reconnected) before being
+    handed out.
+    """
+
+    def __init__(self, max_size=DB_POOL_SIZE,
+                 health_check_interval=DB_HEALTH_CHECK_INTERVAL,
+                 **connect_kwargs):
+        """
+        Creates the pool, without opening any connection
+
+        Args:
+            max_size: maximum amount of open connections. Callers wait for a
+            free connection when all of them are in use.
+            health_check_interval: seconds a connection can stay idle before
+            being pinged when it's handed out again
+            **connect_kwargs: arguments passed to pymysql.connect
+        """
+
+        self.connect_kwargs = connect_kwargs
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that hands out a connection and returns it to the
+        pool afterwards. The transaction left open by the caller is rolled
+        back before, so the next caller doesn't read from its stale
+        REPEATABLE READ snapshot: changes need to be committed inside the
+        block. If an error happens while it's in use, or the block is left
+        early (e.g. a generator holding the connection is closed), the
+        transaction is rolled back too and, if the connection was lost, it's
+        discarded.
+
+        Yields:
+            connection: pymysql connection
+        """
+
+        self._slots.acquire()
+        connection = None
+        try:
+            connection = self._get_connection()
+            yield connection
+            connection = self._end_transaction(connection)
+        except BaseException as e:
+            if connection is not None:
+                connection = self._discard_if_broken(connection, e)
+            raise
+        finally:
+            if connection is not None:
+                self._idle.put((connection, time.monotonic()))
+            self._slots.release()
+
+    def _get_connection(self):
+        """
+        Returns an idle connection, pinging it if it was idle for too long,
+        or opens a new one
+
+        Returns:
+            connection: pymysql connection
+        """
+
+        try:
+            connection, released_at = self._idle.get_nowait()
+        except queue.Empty:
+            return pymysql.connect(**self.connect_kwargs)
+        if time.monotonic() - released_at > self.health_check_interval:
+            try:
+                connection.ping(reconnect=True)
+            except pymysql.MySQLError:
+                self._close(connection)
+                return pymysql.connect(**self.connect_kwargs)
+        return connection
+
+    def _end_transaction(self, connection):
+        """
+        Rolls back the transaction a connection has open, if any, before it
+        goes back to the pool. If that fails, the connection is closed.
+
+        Args:
+            connection: pymysql connection
+
+        Returns:
+            connection: the connection if it can be reused or None
+        """
+
+        try:
+            connection.rollback()
+            return connection
+        except pymysql.MySQLError:
+            self._close(connection)
+            return None
+
+    def _discard_if_broken(self, connection, error):
+        """
+        Rolls back the current transaction of a connection after an error.
+        If the connection was lost, it's closed instead.
+
+        Args:
+            connection: pymysql connection
+            error: exception raised while using the connection
+
+        Returns:
+            connection: the connection if it can be reused or None
+        """
+
+        if not isinstance(error, pymysql.MySQLError) or \
+                not is_connection_lost(error):
+            try:
+                connection.rollback()
+                return connection
+            except pymysql.MySQLError:
+                pass
+        self._close(connection)
+        return None
+
+    @staticmethod
+    def _close(connection):
+        """
+        Closes a connection, ignoring the errors of an already broken one
+
+        Args:
+            connection: pymysql connection
+        """
+
+        try:
+            connection.close()
+        except pymysql.MySQLError:
+            pass
+
+    def close(self):
+        """
+        Closes every idle connection of the pool
+        """
+
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
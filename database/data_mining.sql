@@ -15,6 +15,7 @@ CREATE TABLE `article`  (
   `date` datetime(0) NOT NULL,
   `url` varchar(255) CHARACTER SET latin1 COLLATE latin1_swedish_ci DEFAULT NULL,
   `description` varchar(255) CHARACTER SET latin1 COLLATE latin1_swedish_ci DEFAULT NULL,
+  `scraped_at` datetime(0) DEFAULT NULL,
   PRIMARY KEY (`id_article`) USING BTREE,
   UNIQUE INDEX `url`(`url`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = latin1 COLLATE = latin1_swedish_ci ROW_FORMAT = Dynamic;
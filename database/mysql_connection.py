@@ -1,25 +1,350 @@
 from datetime import datetime
+import threading
 import pymysql.cursors
-from settings import HOST, USER, PASSWORD, DATABASE
+from settings import HOST, USER, PASSWORD, DATABASE, DB_LOOKUP_CHUNK_SIZE, \
+    DB_BATCH_SIZE, DB_CONNECT_TIMEOUT, DB_RECONNECT_ATTEMPTS
+from .connection_pool import ConnectionPool, is_connection_lost
+from metrics import DB_STATEMENT_SECONDS, DB_COMMIT_SECONDS
+from tracing import TRACER
+
+
+class MeteredDictCursor(pymysql.cursors.DictCursor):
+    """
+    DictCursor that records the duration of every statement sent to the
+    server, by kind of statement (INSERT, SELECT...). executemany sends its
+    statements through execute, so each of them is recorded.
+    """
+
+    def execute(self, query, args=None):
+        statement = query.lstrip().split(None, 1)[0].upper() if query \
+            else 'UNKNOWN'
+        with DB_STATEMENT_SECONDS.time(statement=statement), \
+                TRACER.span('db_statement', statement=statement):
+            return super().execute(query, args)
 
 
 class MySqlConnection:
-    connection = pymysql.connect(host=HOST, user=USER, password=PASSWORD,
-                                 database=DATABASE,
-                                 cursorclass=pymysql.cursors.DictCursor)
+    # The connection pool is created the first time the database is used
+    pool = None
+    _pool_lock = threading.Lock()
+    # Row IDs of the authors and hashtags already saved in this session,
+    # indexed by their lower-cased username and name
+    author_ids = {}
+    tag_ids = {}
+
+    @staticmethod
+    def get_pool():
+        """
+        Returns the connection pool, creating it the first time
+
+        Returns:
+            pool: ConnectionPool instance
+        """
+
+        if MySqlConnection.pool is None:
+            with MySqlConnection._pool_lock:
+                if MySqlConnection.pool is None:
+                    MySqlConnection.pool = ConnectionPool(
+                        host=HOST, user=USER, password=PASSWORD,
+                        database=DATABASE, connect_timeout=DB_CONNECT_TIMEOUT,
+                        cursorclass=MeteredDictCursor)
+        return MySqlConnection.pool
+
+    @staticmethod
+    def run_transaction(work):
+        """
+        Runs some work inside a transaction, using a pooled connection, and
+        commits it. If the connection to the server is lost, the work is
+        retried on a new connection.
+
+        Args:
+            work: function that receives a cursor and does the work
+
+        Returns:
+            result: the value returned by work
+        """
+
+        for attempt in range(DB_RECONNECT_ATTEMPTS + 1):
+            try:
+                with MySqlConnection.get_pool().connection() as connection:
+                    with connection.cursor() as cursor:
+                        result = work(cursor)
+                    with DB_COMMIT_SECONDS.time(), TRACER.span('db_commit'):
+                        connection.commit()
+                    return result
+            except pymysql.MySQLError as e:
+                if not is_connection_lost(e) or \
+                        attempt == DB_RECONNECT_ATTEMPTS:
+                    raise
 
     @staticmethod
-    def save_results(data):
+    def clear_id_maps():
+        """
+        Forgets the IDs of the authors and hashtags saved in this session, so
+        the maps don't grow forever in a long-running process. The IDs are
+        looked up again the next time they are needed.
+        """
+
+        MySqlConnection.author_ids = {}
+        MySqlConnection.tag_ids = {}
+
+    @staticmethod
+    def save_results(data, batch_size=DB_BATCH_SIZE):
         """
         Save the scraped information in the database,
-        that is, stories, tags and authors
+        that is, stories, tags and authors. The stories are saved in batches,
+        using multi-row upserts and a single transaction per batch.
+        Authors and tags already saved in this session are not written again;
+        their IDs come from the in-process ID maps.
+
+        Args:
+            data: scraping values to be save in the database
+            batch_size: amount of stories saved per transaction
+        """
+
+        for start in range(0, len(data), batch_size):
+            batch = data[start:start + batch_size]
+            with TRACER.span('db_save_batch', stories=len(batch)):
+                author_ids, tag_ids = MySqlConnection.run_transaction(
+                    lambda cursor: MySqlConnection._save_batch(batch,
+                                                               cursor))
+            # IDs are only remembered once the rows they point to are
+            # committed
+            MySqlConnection.author_ids.update(author_ids)
+            MySqlConnection.tag_ids.update(tag_ids)
+
+    @staticmethod
+    def _save_batch(stories, cursor):
+        """
+        Upsert a batch of stories, with their authors and tags, and the
+        relationships between them. Only the authors and tags missing from
+        the ID maps are upserted, and their IDs are resolved in bulk. It
+        doesn't commit the transaction.
+
+        Args:
+            stories: list of stories to be saved
+            cursor: object that contains information regarding the connection
+            with the database
+
+        Returns:
+            new_author_ids, new_tag_ids: dictionaries with the IDs resolved for
+            the authors and tags that weren't in the ID maps
+        """
+
+        stories = [story for story in stories if story.url is not None]
+        authors = {}
+        tags = {}
+        for story in stories:
+            for author in story.authors or []:
+                if author.username.lower() not in MySqlConnection.author_ids:
+                    authors[author.username.lower()] = author
+            for tag in story.tags or []:
+                if tag.name.lower() not in MySqlConnection.tag_ids:
+                    tags[tag.name.lower()] = tag
+
+        story_ids = MySqlConnection._upsert_stories(stories, cursor)
+        new_author_ids = MySqlConnection._upsert_authors(
+            list(authors.values()), cursor)
+        new_tag_ids = MySqlConnection._upsert_tags(list(tags.values()), cursor)
+
+        stories_authors = set()
+        stories_tags = set()
+        for story in stories:
+            id_story = story_ids.get(story.url.lower())
+            if id_story is None:
+                continue
+            for author in story.authors or []:
+                id_author = MySqlConnection._get_id(
+                    author.username.lower(), new_author_ids,
+                    MySqlConnection.author_ids)
+                if id_author is not None:
+                    stories_authors.add((id_story, id_author))
+            for tag in story.tags or []:
+                id_tag = MySqlConnection._get_id(
+                    tag.name.lower(), new_tag_ids, MySqlConnection.tag_ids)
+                if id_tag is not None:
+                    stories_tags.add((id_story, id_tag))
+
+        if stories_authors:
+            cursor.executemany(
+                'INSERT INTO article_author (id_article, id_author) '
+                'VALUES (%s, %s) '
+                'ON DUPLICATE KEY UPDATE id_article = VALUES(id_article)',
+                sorted(stories_authors))
+        if stories_tags:
+            cursor.executemany(
+                'INSERT INTO article_hashtag (id_article, id_hashtag) '
+                'VALUES (%s, %s) '
+                'ON DUPLICATE KEY UPDATE id_article = VALUES(id_article)',
+                sorted(stories_tags))
+
+        return new_author_ids, new_tag_ids
+
+    @staticmethod
+    def _get_id(key, new_ids, session_ids):
+        """
+        Looks up the ID of an author or tag among the ones resolved by the
+        current batch and, if it isn't there, in the ID map of the session.
+        The session map is only updated once the batch is committed, so it
+        isn't copied for every batch.
+
+        Args:
+            key: lower-cased username or tag name
+            new_ids: dictionary of the IDs resolved by the current batch
+            session_ids: ID map of the session
+
+        Returns:
+            id: row ID, or None if it's unknown
+        """
+
+        id_row = new_ids.get(key)
+        if id_row is None:
+            id_row = session_ids.get(key)
+        return id_row
+
+    @staticmethod
+    def _upsert_stories(stories, cursor):
+        """
+        Insert the stories into the database, or update them if they already
+        exist, with a multi-row upsert
+
+        Args:
+            stories: list of stories to be saved
+            cursor: object that contains information regarding the connection
+            with the database
+
+        Returns:
+            ids: dictionary mapping each lower-cased URL to its row ID
+        """
+
+        if not stories:
+            return {}
+        scraped_at = datetime.now().replace(microsecond=0)
+        rows = {}
+        for story in stories:
+            rows[story.url] = (story.title, MySqlConnection._fix_date(
+                story.date).replace(microsecond=0), story.url,
+                story.description, scraped_at)
+        cursor.executemany(
+            'INSERT INTO article (title, date, url, description, scraped_at) '
+            'VALUES (%s, %s, %s, %s, %s) '
+            'ON DUPLICATE KEY UPDATE title = VALUES(title), '
+            'date = VALUES(date), description = VALUES(description), '
+            'scraped_at = VALUES(scraped_at)', list(rows.values()))
+        return MySqlConnection._select_ids(cursor, 'article', 'id_article',
+                                           'url', list(rows))
+
+    @staticmethod
+    def _upsert_authors(authors, cursor):
+        """
+        Insert the authors into the database, or update them if they already
+        exist, with a multi-row upsert
+
+        Args:
+            authors: list of authors to be saved
+            cursor: object that contains information regarding the connection
+            with the database
+
+        Returns:
+            ids: dictionary mapping each lower-cased username to its row ID
+        """
+
+        if not authors:
+            return {}
+        rows = [(author.username, author.name, author.location,
+                 author.occupation, author.website,
+                 MySqlConnection._fix_date(author.member_since, 'author'))
+                for author in authors]
+        cursor.executemany(
+            'INSERT INTO author (nick_name, name, location, occupation, url, '
+            'member_since) VALUES (%s, %s, %s, %s, %s, %s) '
+            'ON DUPLICATE KEY UPDATE name = VALUES(name), '
+            'location = VALUES(location), occupation = VALUES(occupation), '
+            'url = VALUES(url), member_since = VALUES(member_since)', rows)
+        return MySqlConnection._select_ids(
+            cursor, 'author', 'id_author', 'nick_name',
+            [author.username for author in authors])
+
+    @staticmethod
+    def _upsert_tags(tags, cursor):
+        """
+        Insert the tags into the database, or update them if they already
+        exist, with a multi-row upsert
+
+        Args:
+            tags: list of tags to be saved
+            cursor: object that contains information regarding the connection
+            with the database
+
+        Returns:
+            ids: dictionary mapping each lower-cased tag name to its row ID
+        """
+
+        if not tags:
+            return {}
+        rows = [(tag.name, tag.url, 1 if tag.is_topic else 0) for tag in tags]
+        cursor.executemany(
+            'INSERT INTO hashtag (name, url, is_topic) VALUES (%s, %s, %s) '
+            'ON DUPLICATE KEY UPDATE url = VALUES(url), '
+            'is_topic = VALUES(is_topic)', rows)
+        return MySqlConnection._select_ids(cursor, 'hashtag', 'id_hashtag',
+                                           'name', [tag.name for tag in tags])
+
+    @staticmethod
+    def _select_ids(cursor, table, id_column, key_column, keys):
+        """
+        Get the row IDs for a list of unique keys of a table, in a single
+        query per chunk of keys. The rows are mapped back to the keys that
+        were looked up: the columns use a case-insensitive collation that
+        also considers equal values that differ in more than the case (e.g.
+        accents or trailing spaces), so the few keys that don't match a
+        returned value once lower-cased are looked up one by one.
+
+        Args:
+            cursor: object that contains information regarding the connection
+            with the database
+            table: name of the table
+            id_column: name of the ID column
+            key_column: name of the unique column to look up
+            keys: list of values of the unique column
+
+        Returns:
+            ids: dictionary mapping each lower-cased key to its row ID
+        """
+
+        ids = {}
+        for start in range(0, len(keys), DB_LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + DB_LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'SELECT {id_column}, {key_column} FROM {table} '
+                           f'WHERE {key_column} IN ({placeholders})', chunk)
+            found = {row[key_column].lower(): row[id_column]
+                     for row in cursor.fetchall()}
+            for key in chunk:
+                id_row = found.get(key.lower())
+                if id_row is None:
+                    cursor.execute(f'SELECT {id_column} FROM {table} '
+                                   f'WHERE {key_column} = %s', (key,))
+                    row = cursor.fetchone()
+                    if row is None:
+                        continue
+                    id_row = row[id_column]
+                ids[key.lower()] = id_row
+        return ids
+
+    @staticmethod
+    def save_results_row_by_row(data):
+        """
+        Save the scraped information in the database one row at a time,
+        committing after every statement. It's kept as a reference for
+        benchmarking the batched path of save_results.
 
         Args:
             data: scraping values to be save in the database
         """
 
-        with MySqlConnection.connection:
-            with MySqlConnection.connection.cursor() as cursor:
+        with MySqlConnection.get_pool().connection() as connection:
+            with connection.cursor() as cursor:
                 for element in data:
                     id_merged_story = MySqlConnection._merge_story(element,
                                                                    cursor)
@@ -38,6 +363,126 @@ class MySqlConnection:
                             MySqlConnection._merge_stories_tags(
                                 [id_merged_story, id_merged_tag], cursor)
 
+    @staticmethod
+    def get_stored_urls(urls, refresh_age=None):
+        """
+        Looks up which of the given URLs are already stored in the article
+        table, in a single query per chunk of URLs
+
+        Args:
+            urls: list of candidate story URLs
+            refresh_age: optional - seconds after which a stored story is
+            considered outdated. Outdated stories aren't returned, so they
+            get scraped again.
+
+        Returns:
+            stored: set of the URLs that are stored and up to date
+        """
+
+        stored = set()
+        with MySqlConnection.get_pool().connection() as connection, \
+                connection.cursor() as cursor:
+            for start in range(0, len(urls), DB_LOOKUP_CHUNK_SIZE):
+                chunk = urls[start:start + DB_LOOKUP_CHUNK_SIZE]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                sql = f'SELECT url FROM article WHERE url IN ({placeholders})'
+                params = list(chunk)
+                if refresh_age is not None:
+                    sql += ' AND scraped_at >= NOW() - INTERVAL %s SECOND'
+                    params.append(int(refresh_age))
+                cursor.execute(sql, params)
+                stored.update(row['url'] for row in cursor.fetchall())
+        return stored
+
+    @staticmethod
+    def stream_rows(sql, chunk_size=DB_LOOKUP_CHUNK_SIZE):
+        """
+        Runs a query on an unbuffered cursor and yields its rows in chunks,
+        so only one chunk is held in memory whatever the size of the result
+
+        Args:
+            sql: query to run
+            chunk_size: amount of rows fetched at once
+
+        Returns:
+            chunks: generator of lists of rows, as dictionaries
+        """
+
+        with MySqlConnection.get_pool().connection() as connection, \
+                connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    @staticmethod
+    def stream_stories(chunk_size=DB_LOOKUP_CHUNK_SIZE):
+        """
+        Yields every stored story in chunks, with the usernames of its
+        authors and the names of its tags
+
+        Args:
+            chunk_size: amount of stories fetched at once
+
+        Returns:
+            chunks: generator of lists of story dictionaries
+        """
+
+        sql = ("SELECT a.url, a.title, a.description, a.date, a.scraped_at, "
+               "(SELECT GROUP_CONCAT(au.nick_name SEPARATOR '\\n') "
+               "FROM article_author aa JOIN author au "
+               "ON au.id_author = aa.id_author "
+               "WHERE aa.id_article = a.id_article) AS authors, "
+               "(SELECT GROUP_CONCAT(h.name SEPARATOR '\\n') "
+               "FROM article_hashtag ah JOIN hashtag h "
+               "ON h.id_hashtag = ah.id_hashtag "
+               "WHERE ah.id_article = a.id_article) AS tags "
+               "FROM article a ORDER BY a.id_article")
+        for rows in MySqlConnection.stream_rows(sql, chunk_size):
+            for row in rows:
+                for column in ('authors', 'tags'):
+                    row[column] = row[column].split('\n') \
+                        if row[column] else []
+            yield rows
+
+    @staticmethod
+    def stream_authors(chunk_size=DB_LOOKUP_CHUNK_SIZE):
+        """
+        Yields every stored author in chunks
+
+        Args:
+            chunk_size: amount of authors fetched at once
+
+        Returns:
+            chunks: generator of lists of author dictionaries
+        """
+
+        return MySqlConnection.stream_rows(
+            'SELECT nick_name AS username, name, member_since, location, '
+            'occupation, url AS website FROM author ORDER BY id_author',
+            chunk_size)
+
+    @staticmethod
+    def stream_tags(chunk_size=DB_LOOKUP_CHUNK_SIZE):
+        """
+        Yields every stored tag in chunks
+
+        Args:
+            chunk_size: amount of tags fetched at once
+
+        Returns:
+            chunks: generator of lists of tag dictionaries
+        """
+
+        for rows in MySqlConnection.stream_rows(
+                'SELECT name, url, CAST(is_topic AS UNSIGNED) AS is_topic '
+                'FROM hashtag ORDER BY id_hashtag', chunk_size):
+            for row in rows:
+                row['is_topic'] = bool(row['is_topic'])
+            yield rows
+
     @staticmethod
     def _merge_story(story, cursor):
         """
@@ -59,14 +504,15 @@ class MySqlConnection:
         description = MySqlConnection.clean_text(story.description)
         title = story.title
 
-        sql_header = 'INSERT INTO article (title, date, url, description) '
+        sql_header = 'INSERT INTO article (title, date, url, description, ' \
+                     'scraped_at) '
         sql_values = f'VALUES ("{title}", "{formatted_date}", ' \
-                     f'"{story.url}", "{description}") '
+                     f'"{story.url}", "{description}", NOW()) '
         sql_duplicate = 'ON DUPLICATE KEY UPDATE date = "{}", title = "{}", ' \
-                        'description = "{}"' \
+                        'description = "{}", scraped_at = NOW()' \
             .format(formatted_date, title, description)
         cursor.execute(sql_header + sql_values + sql_duplicate)
-        MySqlConnection.connection.commit()
+        cursor.connection.commit()
         row_id = cursor.lastrowid
 
         if row_id == 0:
@@ -104,7 +550,7 @@ class MySqlConnection:
                         f'url = "{author.website}", ' \
                         f'member_since = "{formatted_member_since}"'
         cursor.execute(sql_header + sql_values + sql_duplicate)
-        MySqlConnection.connection.commit()
+        cursor.connection.commit()
         row_id = cursor.lastrowid
 
         if row_id == 0:
@@ -131,7 +577,7 @@ class MySqlConnection:
         sql_duplicate = f'ON DUPLICATE KEY UPDATE id_article = {values[0]}, ' \
                         f'id_author = {values[1]}'
         cursor.execute(sql_header + sql_values + sql_duplicate)
-        MySqlConnection.connection.commit()
+        cursor.connection.commit()
 
     @staticmethod
     def _merge_tag(tag, cursor):
@@ -154,7 +600,7 @@ class MySqlConnection:
         sql_duplicate = f'ON DUPLICATE KEY UPDATE url = "{tag.url}", ' \
                         f'is_topic = {1 if tag.is_topic else 0}'
         cursor.execute(sql_header + sql_values + sql_duplicate)
-        MySqlConnection.connection.commit()
+        cursor.connection.commit()
         row_id = cursor.lastrowid
 
         if row_id == 0:
@@ -181,7 +627,7 @@ class MySqlConnection:
         sql_duplicate = f'ON DUPLICATE KEY UPDATE id_article = {values[0]}, ' \
                         f'id_hashtag = {values[1]}'
         cursor.execute(sql_header + sql_values + sql_duplicate)
-        MySqlConnection.connection.commit()
+        cursor.connection.commit()
 
     @staticmethod
     def _fix_date(date_to_fix, date_type='story'):
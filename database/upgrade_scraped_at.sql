@@ -0,0 +1,10 @@
+-- ----------------------------
+-- Upgrade of a database created before the incremental mode: adds the
+-- scraped_at column to the article table. Stories saved before the
+-- upgrade have no scraped_at, so they count as outdated for --refresh-age.
+-- Run it once; it fails with "Duplicate column name" if already applied.
+-- ----------------------------
+USE data_mining;
+
+ALTER TABLE `article`
+  ADD COLUMN `scraped_at` datetime(0) NULL DEFAULT NULL AFTER `description`;
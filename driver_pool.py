@@ -0,0 +1,105 @@
+import queue
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
+from selenium.common.exceptions import WebDriverException
+from settings import SELENIUM_DRIVER_PATH, SELENIUM_POOL_SIZE, \
+    SELENIUM_PAGE_LOAD_STRATEGY, SELENIUM_BLOCKED_URLS
+
+
+class DriverPool:
+    """
+    Pool of long-lived headless Chrome drivers, so the browser start-up is
+    paid once per driver instead of once per scraped profile. The drivers
+    load pages eagerly and don't download images, fonts or stylesheets.
+    """
+
+    def __init__(self, size=SELENIUM_POOL_SIZE,
+                 driver_path=SELENIUM_DRIVER_PATH):
+        """
+        Creates the pool, without starting any browser
+        Args:
+            size: maximum amount of drivers. Callers wait for a free driver
+                when all of them are in use.
+            driver_path: path to the chromedriver executable
+        """
+        self.size = size
+        self.driver_path = driver_path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def _create_driver(self):
+        """
+        Starts a new headless Chrome driver
+        Returns:
+            driver: Chrome webdriver instance
+        """
+        chrome_options = webdriver.ChromeOptions()
+        chrome_options.headless = True
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        capabilities = DesiredCapabilities.CHROME.copy()
+        capabilities['pageLoadStrategy'] = SELENIUM_PAGE_LOAD_STRATEGY
+        driver = webdriver.Chrome(executable_path=self.driver_path,
+                                  options=chrome_options,
+                                  desired_capabilities=capabilities)
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs',
+                               {'urls': SELENIUM_BLOCKED_URLS})
+        with self._lock:
+            self._drivers.append(driver)
+        return driver
+
+    @contextmanager
+    def driver(self):
+        """
+        Context manager that hands out a driver and returns it to the pool
+        afterwards. If the browser failed while it was in use, it's quit
+        instead.
+
+        Yields:
+            driver: Chrome webdriver instance
+        """
+        self._slots.acquire()
+        driver = None
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._create_driver()
+            yield driver
+        except WebDriverException:
+            if driver is not None:
+                self._quit(driver)
+                driver = None
+            raise
+        finally:
+            if driver is not None:
+                self._idle.put(driver)
+            self._slots.release()
+
+    def _quit(self, driver):
+        """
+        Quits a driver and removes it from the pool
+        Args:
+            driver: Chrome webdriver instance
+        """
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def close(self):
+        """
+        Quits every driver of the pool
+        """
+        with self._lock:
+            drivers = list(self._drivers)
+        for driver in drivers:
+            self._quit(driver)
+        self._idle = queue.LifoQueue()
@@ -0,0 +1,385 @@
+"""
+Streaming export of the scraped stories, authors and tags to JSONL, CSV or
+Parquet files. The Exporter can be used as a sink of the scraper, writing
+the stories batch by batch, or it can export the whole database with:
+
+    python export.py {jsonl,csv,parquet} [-o DIRECTORY] [-c CHUNK_SIZE]
+
+Rows are written in chunks, so the memory used doesn't depend on the amount
+of rows exported. Parquet requires the optional dependency:
+pip install pyarrow
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import pymysql
+from database import MySqlConnection as SqlConn
+from settings import EXPORT_FORMAT_JSONL, EXPORT_FORMAT_CSV, \
+    EXPORT_FORMAT_PARQUET, EXPORT_FORMATS, EXPORT_CHUNK_SIZE, \
+    EXPORT_LIST_SEPARATOR
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+STORIES = 'stories'
+AUTHORS = 'authors'
+TAGS = 'tags'
+# Columns of the exported files of each entity, with their types
+EXPORT_COLUMNS = {
+    STORIES: [('url', 'string'), ('title', 'string'),
+              ('description', 'string'), ('date', 'datetime'),
+              ('scraped_at', 'datetime'), ('authors', 'list'),
+              ('tags', 'list')],
+    AUTHORS: [('username', 'string'), ('name', 'string'),
+              ('member_since', 'date'), ('location', 'string'),
+              ('occupation', 'string'), ('website', 'string')],
+    TAGS: [('name', 'string'), ('url', 'string'), ('is_topic', 'bool')],
+}
+
+
+def _isoformat(value):
+    """
+    Serializes the dates and datetimes of the rows
+    """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError('{} is not serializable'.format(type(value).__name__))
+
+
+class JsonlWriter:
+    """
+    Writer of rows as JSON lines
+    """
+    extension = '.jsonl'
+
+    def __init__(self, path, columns):
+        """
+        Creates the file, replacing it
+        Args:
+            path: path of the file
+            columns: list of (name, type) tuples of the columns
+        """
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        """
+        Writes a chunk of rows
+        Args:
+            rows: list of row dictionaries
+        """
+        self._file.writelines(json.dumps(row, default=_isoformat,
+                                         ensure_ascii=False) + '\n'
+                              for row in rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CsvWriter:
+    """
+    Writer of rows as CSV, with a header. Lists are joined with the export
+    list separator and booleans are written as 1 or 0.
+    """
+    extension = '.csv'
+
+    def __init__(self, path, columns):
+        """
+        Creates the file, replacing it, and writes the header
+        Args:
+            path: path of the file
+            columns: list of (name, type) tuples of the columns
+        """
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._columns = columns
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        """
+        Writes a chunk of rows
+        Args:
+            rows: list of row dictionaries
+        """
+        self._writer.writerows([self._format(row[name], kind)
+                                for name, kind in self._columns]
+                               for row in rows)
+        self._file.flush()
+
+    @staticmethod
+    def _format(value, kind):
+        """
+        Converts a value to the text of its CSV field
+        """
+        if value is None:
+            return ''
+        if kind == 'list':
+            return EXPORT_LIST_SEPARATOR.join(value)
+        if kind == 'bool':
+            return 1 if value else 0
+        if kind in ('date', 'datetime'):
+            return value.isoformat()
+        return value
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Writer of rows as a Parquet file. The rows are buffered and written as
+    a row group every chunk size rows.
+    It requires the optional dependency: pip install pyarrow
+    """
+    extension = '.parquet'
+
+    def __init__(self, path, columns, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Creates the file, replacing it
+        Args:
+            path: path of the file
+            columns: list of (name, type) tuples of the columns
+            chunk_size: amount of rows of each row group
+        """
+        if pyarrow is None:
+            raise RuntimeError('Error! The Parquet export requires pyarrow. '
+                               'Install it with: pip install pyarrow')
+        types = {
+            'string': pyarrow.string(),
+            'datetime': pyarrow.timestamp('s'),
+            'date': pyarrow.date32(),
+            'bool': pyarrow.bool_(),
+            'list': pyarrow.list_(pyarrow.string()),
+        }
+        self._schema = pyarrow.schema([(name, types[kind])
+                                       for name, kind in columns])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._chunk_size = chunk_size
+        self._rows = []
+
+    def write(self, rows):
+        """
+        Buffers a chunk of rows, writing a row group once there are enough
+        Args:
+            rows: list of row dictionaries
+        """
+        self._rows.extend(rows)
+        if len(self._rows) >= self._chunk_size:
+            self._flush()
+
+    def _flush(self):
+        """
+        Writes the buffered rows as a row group
+        """
+        if self._rows:
+            self._writer.write_table(pyarrow.Table.from_pylist(
+                self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+class Exporter:
+    """
+    Class that writes stories, authors and tags to one file per entity
+    (stories, authors and tags) in a directory. Every author and tag is
+    written once, the first time a story references it.
+    """
+
+    def __init__(self, directory, export_format=EXPORT_FORMAT_JSONL,
+                 chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Creates the directory, if needed, and the files, replacing them
+        Args:
+            directory: directory of the exported files
+            export_format: can either be 'jsonl', 'csv' or 'parquet'
+            chunk_size: amount of rows written at once
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError('Invalid value "{}" for the export format.'
+                             .format(export_format))
+        if chunk_size is None or chunk_size < 1:
+            raise ValueError('The export chunk size needs to be a positive '
+                             'integer.')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.counts = dict.fromkeys(EXPORT_COLUMNS, 0)
+        self._exported_authors = set()
+        self._exported_tags = set()
+        self._writers = {}
+        for entity, columns in EXPORT_COLUMNS.items():
+            if export_format == EXPORT_FORMAT_PARQUET:
+                writer = ParquetWriter(
+                    os.path.join(directory, entity + ParquetWriter.extension),
+                    columns, chunk_size)
+            else:
+                writer_class = CsvWriter \
+                    if export_format == EXPORT_FORMAT_CSV else JsonlWriter
+                writer = writer_class(
+                    os.path.join(directory, entity + writer_class.extension),
+                    columns)
+            self._writers[entity] = writer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write_rows(self, entity, rows):
+        """
+        Writes rows of an entity, chunk by chunk
+        Args:
+            entity: 'stories', 'authors' or 'tags'
+            rows: iterable of row dictionaries. It's consumed lazily.
+        """
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(entity, chunk)
+                chunk = []
+        self._write_chunk(entity, chunk)
+
+    def _write_chunk(self, entity, chunk):
+        """
+        Writes a chunk of rows of an entity
+        """
+        if chunk:
+            self._writers[entity].write(chunk)
+            self.counts[entity] += len(chunk)
+
+    def write_stories(self, stories):
+        """
+        Writes a batch of Story objects, and their authors and tags that
+        weren't exported yet
+        Args:
+            stories: list of Story objects
+        """
+        scraped_at = datetime.datetime.now().replace(microsecond=0)
+        authors = []
+        tags = []
+        for story in stories:
+            for author in story.authors or ():
+                if author.username not in self._exported_authors:
+                    self._exported_authors.add(author.username)
+                    authors.append(author)
+            for tag in story.tags or ():
+                if tag.url not in self._exported_tags:
+                    self._exported_tags.add(tag.url)
+                    tags.append(tag)
+        self.write_rows(STORIES, (story_row(story, scraped_at)
+                                  for story in stories))
+        self.write_rows(AUTHORS, map(author_row, authors))
+        self.write_rows(TAGS, map(tag_row, tags))
+
+    def export_database(self):
+        """
+        Writes every story, author and tag stored in the database, fetching
+        them in chunks
+        """
+        for entity, stream in ((STORIES, SqlConn.stream_stories),
+                               (AUTHORS, SqlConn.stream_authors),
+                               (TAGS, SqlConn.stream_tags)):
+            for rows in stream(self.chunk_size):
+                self._write_chunk(entity, rows)
+
+    def close(self):
+        """
+        Writes what's still buffered and closes the files
+        """
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+
+def story_row(story, scraped_at):
+    """
+    Returns the exported row of a story. The date is parsed the same way as
+    when it's saved to the database.
+    Args:
+        story: Story object
+        scraped_at: datetime the story was scraped at
+
+    Returns:
+        row: dictionary of the story columns
+    """
+    return {
+        'url': story.url,
+        'title': story.title,
+        'description': story.description,
+        'date': SqlConn._fix_date(story.date).replace(microsecond=0),
+        'scraped_at': scraped_at,
+        'authors': [author.username for author in story.authors or ()],
+        'tags': [tag.name for tag in story.tags or ()],
+    }
+
+
+def author_row(author):
+    """
+    Returns the exported row of an author
+    Args:
+        author: Author object
+
+    Returns:
+        row: dictionary of the author columns
+    """
+    member_since = SqlConn._fix_date(author.member_since, 'author')
+    if isinstance(member_since, datetime.datetime):
+        member_since = member_since.date()
+    return {
+        'username': author.username,
+        'name': author.name,
+        'member_since': member_since,
+        'location': author.location,
+        'occupation': author.occupation,
+        'website': author.website,
+    }
+
+
+def tag_row(tag):
+    """
+    Returns the exported row of a tag
+    Args:
+        tag: Tag object
+
+    Returns:
+        row: dictionary of the tag columns
+    """
+    return {'name': tag.name, 'url': tag.url, 'is_topic': tag.is_topic}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Database exporter')
+    parser.add_argument('format', choices=EXPORT_FORMATS)
+    parser.add_argument('-o', '--output', default='export',
+                        help='Directory of the exported files.')
+    parser.add_argument('-c', '--chunk-size', type=int,
+                        default=EXPORT_CHUNK_SIZE,
+                        help='Amount of rows fetched and written at once.')
+    args = parser.parse_args()
+
+    try:
+        with Exporter(args.output, args.format, args.chunk_size) as exporter:
+            exporter.export_database()
+    except (ValueError, RuntimeError) as e:
+        print(e)
+        exit(1)
+    except pymysql.MySQLError as e:
+        print(e)
+        exit(2)
+    print(', '.join('{} {}'.format(count, entity)
+                    for entity, count in exporter.counts.items()) +
+          ' exported to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
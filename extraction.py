@@ -0,0 +1,165 @@
+import multiprocessing
+from bs4 import BeautifulSoup
+from metrics import PARSE_SECONDS, SELECTOR_SECONDS
+from tracing import TRACER
+from template_matcher import TemplateMatcher
+from settings import STORY_SCRAPE_FIELDS, STORY_TAG_SCRAPE_FIELDS, \
+    AUTHOR_SCRAPE_FIELDS
+
+# Configuration and template matcher of a worker process of the process pool
+_worker_config = None
+_worker_matcher = None
+_worker_parser = None
+
+
+def scrape_obj(soup, template, fields):
+    """
+    Function that retrieves the fields specified according to a template in
+    the provided site parsed by BS4.
+    Args:
+        soup: BeautifulSoup instance of a site to scrape an object's data
+        template: template to be used to extract the desired content of the
+            site, with its selectors compiled by the Configuration.
+        fields: dictionary of fields to scrape according to a template. It
+            provides configuration for how to get the values.
+
+    Returns:
+        s: dictionary of scraped object with the attributes retrieved.
+    """
+    s = {}
+    for f in fields:
+        element = template[f['field']].select(soup)
+        if len(element) > 0:
+            if 'attr' not in f:
+                if not f['multiple']:
+                    s[f['field']] = element[0].getText()
+                else:
+                    s[f['field']] = [el.getText() for el in element]
+            else:
+                if not f['multiple']:
+                    s[f['field']] = element[0].get(f['attr'], None)
+                else:
+                    s[f['field']] = [el.get(f['attr'], None)
+                                     for el in element]
+        elif 'optional' in f and f['optional']:
+            s[f['field']] = None
+    return s
+
+
+def extract_story_fields(config, matcher, content, order, parser):
+    """
+    Parses a story site and tries to match its header to a known site
+    structure. If it's matched, it extracts the story fields and its tags
+    according to that structure. It only returns plain values, so it can run
+    in another process.
+    Args:
+        config: Configuration object
+        matcher: TemplateMatcher for the configured story templates
+        content: bytes of the story site
+        order: indexes of the story templates, in the order they should be
+            preferred if more than one matches
+        parser: HTML parser used by BeautifulSoup
+
+    Returns:
+        fields: dictionary with the index of the matched 'template' and the
+            scraped 'story', 'tags' and 'tags_topic' fields, or None if no
+            known structure matched
+    """
+    with PARSE_SECONDS.time(page='story'), \
+            TRACER.span('parse', page='story', bytes=len(content)):
+        soup = BeautifulSoup(content, parser,
+                             parse_only=config.story_strainer)
+    with SELECTOR_SECONDS.time(page='story'):
+        with TRACER.span('template_match') as span:
+            ix = matcher.detect(soup, order)
+            span.set('template', ix)
+        if ix is None:
+            return None
+        with TRACER.span('extract', page='story'):
+            return {
+                'template': ix,
+                'story': scrape_obj(soup,
+                                    config.compiled_story_templates[ix],
+                                    STORY_SCRAPE_FIELDS),
+                'tags': scrape_obj(soup, config.compiled_stories_tag_template,
+                                   STORY_TAG_SCRAPE_FIELDS),
+                'tags_topic': scrape_obj(
+                    soup, config.compiled_stories_tag_topic_template,
+                    STORY_TAG_SCRAPE_FIELDS),
+            }
+
+
+def extract_author_fields(config, content, parser):
+    """
+    Parses an author's profile and extracts its fields.
+    Args:
+        config: Configuration object
+        content: bytes of the profile site
+        parser: HTML parser used by BeautifulSoup
+
+    Returns:
+        s: dictionary of the fields scraped from the profile
+    """
+    with PARSE_SECONDS.time(page='author'), \
+            TRACER.span('parse', page='author', bytes=len(content)):
+        soup = BeautifulSoup(content, parser,
+                             parse_only=config.author_strainer)
+    with SELECTOR_SECONDS.time(page='author'), \
+            TRACER.span('extract', page='author'):
+        return scrape_obj(soup, config.compiled_author_template,
+                          AUTHOR_SCRAPE_FIELDS)
+
+
+def process_pool_context():
+    """
+    Returns the multiprocessing context of the extraction process pool. Its
+    workers are started by a fork server (or spawned, where there isn't one)
+    instead of forked from the scraper: the pool forks them lazily, from the
+    fetch threads, and a worker forked while another thread holds a lock,
+    like the one of a metric, would deadlock the first time it takes it.
+
+    Returns:
+        context: multiprocessing context
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def init_worker(config, parser):
+    """
+    Initializes a worker process of the extraction process pool
+    Args:
+        config: Configuration object
+        parser: HTML parser used by BeautifulSoup
+    """
+    global _worker_config, _worker_matcher, _worker_parser
+    # The spans of a worker are sent back with the results instead of being
+    # written by it, in case the tracer was inherited from the parent
+    TRACER.reset()
+    _worker_config = config
+    _worker_matcher = TemplateMatcher(config.compiled_story_templates)
+    _worker_parser = parser
+
+
+def extract_story_fields_in_worker(content, order, trace=False):
+    """
+    Runs extract_story_fields in a worker process initialized by init_worker
+    Args:
+        content: bytes of the story site
+        order: indexes of the story templates, in the order they should be
+            preferred if more than one matches
+        trace: boolean - collect the spans of the extraction
+
+    Returns:
+        fields: same as extract_story_fields
+        spans: list of the span dictionaries collected, empty if trace is
+            False
+    """
+    if not trace:
+        return extract_story_fields(_worker_config, _worker_matcher, content,
+                                    order, _worker_parser), []
+    with TRACER.collect() as spans:
+        fields = extract_story_fields(_worker_config, _worker_matcher,
+                                      content, order, _worker_parser)
+    return fields, spans
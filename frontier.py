@@ -0,0 +1,135 @@
+import heapq
+from collections import OrderedDict
+import threading
+
+
+class UrlFrontier:
+    """
+    Class that holds the URLs waiting to be scraped, ordered by priority.
+    An URL is only accepted the first time it's seen, so the same story
+    found in several listing pages is queued once.
+    Lower priorities come out first. Listings show the newest stories first,
+    so using (page, position) as the priority pops the most recent stories
+    first.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty frontier
+        """
+        self._heap = []
+        self._seen = set()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def add(self, url, priority):
+        """
+        Queues an URL, unless it was seen before
+        Args:
+            url: URL to queue
+            priority: comparable value. Lower values are popped first.
+
+        Returns:
+            True if the URL is new and was queued
+        """
+        with self._lock:
+            if url in self._seen:
+                return False
+            self._seen.add(url)
+            # The counter keeps the insertion order between equal priorities
+            heapq.heappush(self._heap, (priority, self._counter, url))
+            self._counter += 1
+            return True
+
+    def mark_seen(self, url):
+        """
+        Marks an URL as known without queueing it
+        Args:
+            url: URL that shouldn't be queued
+        """
+        with self._lock:
+            self._seen.add(url)
+
+    def pop(self):
+        """
+        Removes the URL with the lowest priority from the frontier
+        Returns:
+            url: URL or None if the frontier is empty
+        """
+        with self._lock:
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)[2]
+
+    def pop_many(self, limit):
+        """
+        Removes up to a limit of URLs from the frontier, in priority order
+        Args:
+            limit: maximum amount of URLs to remove
+
+        Returns:
+            urls: list of URLs
+        """
+        urls = []
+        while len(urls) < limit:
+            url = self.pop()
+            if url is None:
+                break
+            urls.append(url)
+        return urls
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+
+class SeenUrls:
+    """
+    Class that remembers a bounded amount of URLs. When it's full, the URLs
+    that were seen the longest time ago are forgotten first, so its memory
+    stays bounded in long-running processes.
+    """
+
+    def __init__(self, max_size):
+        """
+        Creates an empty set of seen URLs
+        Args:
+            max_size: maximum amount of URLs remembered
+        """
+        self.max_size = max_size
+        self._urls = OrderedDict()
+
+    def filter_new(self, urls):
+        """
+        Returns the URLs that weren't seen before, without repetitions
+        Args:
+            urls: list of URLs
+
+        Returns:
+            new_urls: list of the unseen URLs, in their original order
+        """
+        new_urls = []
+        added = set()
+        for url in urls:
+            if url not in self._urls and url not in added:
+                added.add(url)
+                new_urls.append(url)
+        return new_urls
+
+    def add_all(self, urls):
+        """
+        Marks URLs as seen now, forgetting the oldest ones if needed
+        Args:
+            urls: list of URLs
+        """
+        for url in urls:
+            self._urls[url] = None
+            self._urls.move_to_end(url)
+        while len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+
+    def __contains__(self, url):
+        return url in self._urls
+
+    def __len__(self):
+        return len(self._urls)
@@ -0,0 +1,271 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from settings import HTTP_CACHE_TTLS, HTTP_CACHE_MAX_BYTES, \
+    SUCCESS_STATUS_CODE, NOT_MODIFIED_STATUS_CODE
+from transport import Response, url_class
+from metrics import HTTP_CACHE_REQUESTS
+
+
+class HttpCache:
+    """
+    Persistent, size-bounded store for HTTP responses. It's backed by a
+    SQLite file and evicts the least recently used entries when the total
+    size of the stored bodies goes over its limit.
+    Besides the response, it can hold the fields parsed from it, so a page
+    that didn't change doesn't need to be parsed again.
+    """
+
+    def __init__(self, path, max_bytes=HTTP_CACHE_MAX_BYTES):
+        """
+        Opens (or creates) the cache file
+        Args:
+            path: path to the SQLite file holding the cache
+            max_bytes: maximum amount of bytes of compressed bodies to keep
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                         'url TEXT PRIMARY KEY, status INTEGER, '
+                         'etag TEXT, last_modified TEXT, '
+                         'stored_at REAL, accessed_at REAL, '
+                         'size INTEGER, body BLOB, parsed TEXT)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed_at '
+                         'ON entries (accessed_at)')
+        self._db.commit()
+        self._size = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def get(self, url):
+        """
+        Returns the stored entry for an URL and marks it as recently used
+        Args:
+            url: URL of the entry
+
+        Returns:
+            entry: dictionary with the keys status, etag, last_modified,
+                stored_at and content, or None if the URL isn't cached
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT status, etag, last_modified, stored_at, body '
+                'FROM entries WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE entries SET accessed_at = ? '
+                             'WHERE url = ?', (time.time(), url))
+            self._db.commit()
+        return {
+            'status': row[0],
+            'etag': row[1],
+            'last_modified': row[2],
+            'stored_at': row[3],
+            'content': zlib.decompress(row[4]),
+        }
+
+    def put(self, url, response):
+        """
+        Stores a response, replacing the previous entry for the URL and
+        dropping the fields parsed from it. Evicts the least recently used
+        entries if the cache goes over its size limit.
+        Args:
+            url: URL of the entry
+            response: Response object to store
+        """
+        body = zlib.compress(response.content)
+        now = time.time()
+        with self._lock:
+            previous = self._db.execute('SELECT size FROM entries '
+                                        'WHERE url = ?', (url,)).fetchone()
+            if previous is not None:
+                self._size -= previous[0]
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (url, status, etag, '
+                'last_modified, stored_at, accessed_at, size, body, parsed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)',
+                (url, response.status_code,
+                 _header(response.headers, 'ETag'),
+                 _header(response.headers, 'Last-Modified'),
+                 now, now, len(body), body))
+            self._size += len(body)
+            self._evict()
+            self._db.commit()
+
+    def touch(self, url):
+        """
+        Marks a stored entry as fresh again, after the server confirmed it
+        didn't change
+        Args:
+            url: URL of the entry
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute('UPDATE entries SET stored_at = ?, '
+                             'accessed_at = ? WHERE url = ?', (now, now, url))
+            self._db.commit()
+
+    def get_parsed(self, url):
+        """
+        Returns the fields that were parsed from the stored response
+        Args:
+            url: URL of the entry
+
+        Returns:
+            parsed: the parsed fields or None if they weren't stored
+        """
+        with self._lock:
+            row = self._db.execute('SELECT parsed FROM entries WHERE url = ?',
+                                   (url,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def set_parsed(self, url, parsed):
+        """
+        Stores the fields parsed from the stored response of an URL. It does
+        nothing if the response isn't stored.
+        Args:
+            url: URL of the entry
+            parsed: JSON serializable fields parsed from the response
+        """
+        with self._lock:
+            self._db.execute('UPDATE entries SET parsed = ? WHERE url = ?',
+                             (json.dumps(parsed), url))
+            self._db.commit()
+
+    def _evict(self):
+        """
+        Deletes the least recently used entries until the cache fits in its
+        size limit. It must be called holding the lock.
+        """
+        if self._size <= self.max_bytes:
+            return
+        rows = self._db.execute('SELECT url, size FROM entries '
+                                'ORDER BY accessed_at').fetchall()
+        for url, size in rows:
+            if self._size <= self.max_bytes:
+                break
+            self._db.execute('DELETE FROM entries WHERE url = ?', (url,))
+            self._size -= size
+
+    def close(self):
+        """
+        Closes the cache file
+        """
+        with self._lock:
+            self._db.close()
+
+
+class CachingTransport:
+    """
+    Transport that serves responses from an HttpCache while they are fresh
+    and revalidates them with conditional GETs once they expire. Every other
+    request is delegated to the wrapped transport.
+    """
+
+    def __init__(self, transport, cache, ttls=None):
+        """
+        Creates the caching transport
+        Args:
+            transport: transport that performs the actual requests
+            cache: HttpCache instance
+            ttls: dictionary mapping URL classes to the seconds their
+                responses are fresh. URLs of other classes aren't cached.
+        """
+        self.transport = transport
+        self.cache = cache
+        self.ttls = ttls if ttls is not None else HTTP_CACHE_TTLS
+
+    def get(self, url, headers=None):
+        """
+        Performs a GET request, going through the cache if the URL class
+        is cacheable. Responses coming from the cache, either fresh or
+        confirmed by a 304 reply, have from_cache set to True.
+        Args:
+            url: URL to request
+            headers: optional dictionary of extra request headers
+
+        Returns:
+            response: Response object
+        """
+        name = url_class(url)
+        ttl = self.ttls.get(name)
+        if ttl is None:
+            return self.transport.get(url, headers=headers)
+
+        entry = self.cache.get(url)
+        if entry is not None and time.time() - entry['stored_at'] < ttl:
+            HTTP_CACHE_REQUESTS.inc(url_class=name, result='hit')
+            return self._cached_response(url, entry)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+        response = self.transport.get(url, headers=request_headers)
+
+        if response.status_code == NOT_MODIFIED_STATUS_CODE \
+                and entry is not None:
+            self.cache.touch(url)
+            HTTP_CACHE_REQUESTS.inc(url_class=name, result='revalidated')
+            return self._cached_response(url, entry, response.elapsed)
+        HTTP_CACHE_REQUESTS.inc(url_class=name, result='miss')
+        if response.status_code == SUCCESS_STATUS_CODE and \
+                'no-store' not in _header(response.headers, 'Cache-Control',
+                                          ''):
+            self.cache.put(url, response)
+        return response
+
+    @staticmethod
+    def _cached_response(url, entry, elapsed=0.0):
+        """
+        Builds a Response object out of a cache entry
+        Args:
+            url: URL of the entry
+            entry: entry returned by HttpCache.get
+            elapsed: seconds spent revalidating the entry
+
+        Returns:
+            response: Response object with from_cache set to True
+        """
+        return Response(url, entry['status'], entry['content'],
+                        elapsed=elapsed, from_cache=True)
+
+    def close(self):
+        """
+        Closes the wrapped transport and the cache
+        """
+        self.transport.close()
+        self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _header(headers, name, default=None):
+    """
+    Looks up a header without taking its case into account
+    Args:
+        headers: dictionary of headers
+        name: name of the header
+        default: value returned if the header isn't present
+
+    Returns:
+        value: value of the header
+    """
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return default
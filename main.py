@@ -1,11 +1,26 @@
 import argparse
+import os
+import signal
 from configuration import Configuration
 from scraper import Scraper
 from settings import CONFIG_MAIN_PATTERN, CONFIG_TEMPLATES, SCRAPE_MODE, \
     FAIL_SILENTLY, DESTINATION_FILE_NAME, MODE_TAG, MODE_TOP_STORIES, \
-    MODE_AUTHOR, CONFIG_AUTHOR_TEMPLATE, CONFIG_STORIES_TAG_TEMPLATE, \
-    CONFIG_STORIES_TAG_TOPIC_TEMPLATE, CONFIG_AUTHOR_URLS, \
-    CONFIG_TAG_URLS, API_TOPICS
+    MODE_AUTHOR, MODE_BATCH, CONFIG_AUTHOR_TEMPLATE, \
+    CONFIG_STORIES_TAG_TEMPLATE, CONFIG_STORIES_TAG_TOPIC_TEMPLATE, \
+    CONFIG_AUTHOR_URLS, CONFIG_TAG_URLS, API_TOPICS, WORKERS_DEFAULT, \
+    HTTP_BACKEND_HTTP2, HTTP_BACKEND_REQUESTS, HTTP_CACHE_PATH, \
+    AUTHOR_CACHE_PATH, AUTHOR_CACHE_TTL, DB_BATCH_SIZE, HTML_PARSERS, \
+    HTML_PARSER_DEFAULT, DAEMON_POLL_INTERVAL, DAEMON_POLL_JITTER, \
+    EXPORT_FORMATS, EXPORT_FORMAT_JSONL, BACKFILL_STAGING_PATH
+from transport import create_transport
+from http_cache import HttpCache
+from author_cache import AuthorCache
+from targets import read_targets
+from rate_limiter import RateLimiter
+from metrics import METRICS
+from tracing import TRACER
+from export import Exporter
+from database import BulkLoader
 
 
 def init_parser():
@@ -17,19 +32,83 @@ def init_parser():
     parser = argparse.ArgumentParser(description='CNET News Scraper')
     parser.add_argument('mode', choices=SCRAPE_MODE,
                         help="The scraping can start with the top stories, "
-                             "an author, a tag or the API.")
+                             "an author, a tag, a batch of them or the API.")
     parser.add_argument('-a', '--author',
-                        help="The author to scrape if mode is author.")
+                        help="The author to scrape if mode is author. "
+                             "Several authors can be separated by commas.")
     parser.add_argument('-n', '--number', type=int,
                         help="Amount of stories to scrape.")
     parser.add_argument('-t', '--tag',
                         help="The tag to scrape if mode is tag.")
+    parser.add_argument('-f', '--file',
+                        help="File with the targets to scrape if mode is "
+                             "batch: one 'top_stories', 'tag <tag>' or "
+                             "'author <author>' per line.")
     parser.add_argument('-c', "--console", action='store_true',
                         help='Print results in stdout instead of saving them.')
     parser.add_argument('-v', "--verbose", action='store_true',
                         help='Log extra information to the stdout.')
     parser.add_argument('--api',
                         help='Topic to query the New York Times API on.')
+    parser.add_argument('-w', '--workers', type=int, default=WORKERS_DEFAULT,
+                        help='Amount of stories to fetch concurrently.')
+    parser.add_argument('-p', '--processes', type=int,
+                        help='Amount of processes used to parse the stories, '
+                             'apart from the workers that fetch them.')
+    parser.add_argument('--http2', action='store_true',
+                        help='Use the HTTP/2 transport (requires httpx).')
+    parser.add_argument('-s', '--stream', action='store_true',
+                        help='Save the stories in batches as soon as they '
+                             'are scraped.')
+    parser.add_argument('--parser', choices=HTML_PARSERS,
+                        default=HTML_PARSER_DEFAULT,
+                        help='HTML parser used to parse the sites.')
+    parser.add_argument('--no-rate-limit', action='store_true',
+                        help='Disable the adaptive per-host rate limiting.')
+    parser.add_argument('--metrics-file',
+                        help='Write the metrics to this file in the '
+                             'Prometheus text format.')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve the metrics on '
+                             'http://127.0.0.1:PORT/metrics while running.')
+    parser.add_argument('--trace',
+                        help='Record a span tree per scraped URL in this '
+                             'file, as JSON lines.')
+    parser.add_argument('-e', '--export',
+                        help='Also export the stories, authors and tags to '
+                             'files in this directory.')
+    parser.add_argument('--export-format', choices=EXPORT_FORMATS,
+                        default=EXPORT_FORMAT_JSONL,
+                        help='Format of the exported files.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Disable the on-disk HTTP and author caches.')
+    parser.add_argument('-b', '--batch-size', type=int, default=DB_BATCH_SIZE,
+                        help='Amount of stories saved per database '
+                             'transaction.')
+    parser.add_argument('--author-ttl', type=float,
+                        help='Days a cached author is reused without fetching '
+                             'its profile again.')
+    parser.add_argument('--backfill', action='store_true',
+                        help='Stage the stories to TSV files and bulk load '
+                             'them at the end of the run, for large '
+                             'backfills.')
+    parser.add_argument('--load-only', action='store_true',
+                        help='With --backfill, only load the stories staged '
+                             'by a previous run whose load failed, without '
+                             'scraping.')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help='Skip the stories already saved in the database.')
+    parser.add_argument('-d', '--daemon', action='store_true',
+                        help='Keep running and poll the top stories, only '
+                             'scraping the new ones.')
+    parser.add_argument('--interval', type=float,
+                        help='In daemon mode, seconds between two polls.')
+    parser.add_argument('--jitter', type=float,
+                        help='In daemon mode, fraction of the interval that '
+                             'is randomly added or subtracted to each wait.')
+    parser.add_argument('--refresh-age', type=float,
+                        help='In incremental mode, scrape again the stories '
+                             'saved more than this amount of hours ago.')
     return parser
 
 
@@ -56,11 +135,80 @@ def validate_parser(parser, args):
         if not args.tag:
             parser.error('For tag mode, the parameter tag needs to be set '
                          '(-t / --tag).')
+    elif args.mode == MODE_BATCH:
+        if args.author or args.tag:
+            parser.error('Batch mode takes the authors and tags from the '
+                         'targets file (-f / --file).')
+        if not args.file:
+            parser.error('For batch mode, the targets file needs to be set '
+                         '(-f / --file).')
+    if args.file and args.mode != MODE_BATCH:
+        parser.error("Incorrect arguments. A targets file can only be set "
+                     "in batch mode.")
     if args.tag and args.author:
         parser.error("Incorrect arguments. Can't set tag and author together.")
     if args.api is not None and args.api not in API_TOPICS:
         parser.error("Incorrect arguments. API can only be set to science "
                      "or technology.")
+    if args.refresh_age is not None:
+        if not args.incremental:
+            parser.error("Incorrect arguments. The refresh age can only be "
+                         "set in incremental mode (-i / --incremental).")
+        if args.refresh_age < 0:
+            parser.error("Incorrect arguments. The refresh age can't be "
+                         "negative.")
+    if args.daemon:
+        if args.mode != MODE_TOP_STORIES:
+            parser.error("Incorrect arguments. Only the top stories can be "
+                         "polled in daemon mode.")
+        if args.api is not None:
+            parser.error("Incorrect arguments. The API can't be queried in "
+                         "daemon mode.")
+    elif args.interval is not None or args.jitter is not None:
+        parser.error("Incorrect arguments. The interval and the jitter can "
+                     "only be set in daemon mode (-d / --daemon).")
+    if args.interval is not None and args.interval <= 0:
+        parser.error("Incorrect arguments. The interval needs to be "
+                     "positive.")
+    if args.jitter is not None and not 0 <= args.jitter < 1:
+        parser.error("Incorrect arguments. The jitter needs to be a fraction "
+                     "between 0 and 1.")
+    if args.load_only and not args.backfill:
+        parser.error("Incorrect arguments. --load-only can only be used in "
+                     "backfill mode (--backfill).")
+    if args.backfill:
+        if args.console:
+            parser.error("Incorrect arguments. The backfill mode needs the "
+                         "results to be saved.")
+        if args.daemon:
+            parser.error("Incorrect arguments. The backfill mode can't be "
+                         "used in daemon mode.")
+    if args.metrics_port is not None and not 0 < args.metrics_port < 65536:
+        parser.error("Incorrect arguments. The metrics port needs to be "
+                     "between 1 and 65535.")
+    if args.author_ttl is not None and args.author_ttl < 0:
+        parser.error("Incorrect arguments. The author TTL can't be negative.")
+    if args.processes is not None and args.processes < 1:
+        parser.error("Incorrect arguments. The amount of processes needs to "
+                     "be at least 1.")
+    if args.batch_size < 1:
+        parser.error("Incorrect arguments. The batch size needs to be at "
+                     "least 1.")
+    if args.workers < 1:
+        parser.error("Incorrect arguments. The amount of workers needs to be "
+                     "at least 1.")
+
+
+def build_configuration():
+    """
+    Creates the scraper's Configuration out of the settings
+    Returns:
+        config: Configuration instance
+    """
+    return Configuration(CONFIG_MAIN_PATTERN, CONFIG_TEMPLATES,
+                         CONFIG_AUTHOR_TEMPLATE, CONFIG_STORIES_TAG_TEMPLATE,
+                         CONFIG_STORIES_TAG_TOPIC_TEMPLATE,
+                         CONFIG_AUTHOR_URLS, CONFIG_TAG_URLS)
 
 
 def main_scraper(logging, should_save, args):
@@ -73,17 +221,77 @@ def main_scraper(logging, should_save, args):
             db.
         args: config values coming from the CLI required to create the Scraper.
     """
-    config = Configuration(CONFIG_MAIN_PATTERN, CONFIG_TEMPLATES,
-                           CONFIG_AUTHOR_TEMPLATE, CONFIG_STORIES_TAG_TEMPLATE,
-                           CONFIG_STORIES_TAG_TOPIC_TEMPLATE,
-                           CONFIG_AUTHOR_URLS, CONFIG_TAG_URLS)
+    config = build_configuration()
+    exporter = None
+    bulk_loader = None
+    backend = HTTP_BACKEND_HTTP2 if args.http2 else HTTP_BACKEND_REQUESTS
+    refresh_age = None
+    if args.refresh_age is not None:
+        refresh_age = args.refresh_age * 60 * 60
     try:
+        targets = None
+        if args.mode == MODE_BATCH:
+            targets = read_targets(args.file)
+        transport = create_transport(backend)
+        rate_limiter = None
+        if not args.no_rate_limit:
+            rate_limiter = RateLimiter(robots_transport=transport)
+        cache = None
+        author_cache = None
+        if not args.no_cache:
+            base_dir = os.path.dirname(os.path.realpath(__file__))
+            cache = HttpCache(os.path.join(base_dir, HTTP_CACHE_PATH))
+            author_ttl = AUTHOR_CACHE_TTL
+            if args.author_ttl is not None:
+                author_ttl = args.author_ttl * 24 * 60 * 60
+            author_cache = AuthorCache(os.path.join(base_dir,
+                                                    AUTHOR_CACHE_PATH),
+                                       ttl=author_ttl)
+        if args.export:
+            exporter = Exporter(args.export, args.export_format)
+        if args.backfill:
+            base_dir = os.path.dirname(os.path.realpath(__file__))
+            bulk_loader = BulkLoader(os.path.join(base_dir,
+                                                  BACKFILL_STAGING_PATH))
+            if args.load_only:
+                print('{} staged stories were loaded.'.format(
+                    bulk_loader.load()))
+                return
+            if bulk_loader.recovered:
+                print('Warning! {} stories staged by a previous backfill '
+                      'were not loaded. They will be loaded with this run.'
+                      .format(bulk_loader.recovered))
+        poll_interval = None
+        if args.daemon:
+            poll_interval = args.interval if args.interval is not None \
+                else DAEMON_POLL_INTERVAL
+        poll_jitter = args.jitter if args.jitter is not None \
+            else DAEMON_POLL_JITTER
         scraper = Scraper(config, logging=logging, should_save=should_save,
                           fail_silently=FAIL_SILENTLY,
                           file_name=DESTINATION_FILE_NAME, mode=args.mode,
                           author=args.author, tag=args.tag, number=args.number,
-                          api=args.api)
+                          api=args.api, workers=args.workers,
+                          transport=transport, cache=cache,
+                          incremental=args.incremental,
+                          refresh_age=refresh_age,
+                          author_cache=author_cache,
+                          batch_size=args.batch_size, parser=args.parser,
+                          stream=args.stream, processes=args.processes,
+                          targets=targets, rate_limiter=rate_limiter,
+                          poll_interval=poll_interval,
+                          poll_jitter=poll_jitter,
+                          metrics_file=args.metrics_file,
+                          exporter=exporter, bulk_loader=bulk_loader)
+        if args.daemon:
+            handle_stop_signals(scraper)
+        if args.metrics_port is not None:
+            METRICS.serve(args.metrics_port)
+        if args.trace:
+            TRACER.enable(args.trace)
         scraper.scrape()
+        if logging:
+            print('\n'.join(METRICS.summary_lines()))
     except ValueError as e:
         print(e)
         exit(1)
@@ -96,6 +304,28 @@ def main_scraper(logging, should_save, args):
     except OSError as e:
         print(e)
         exit(3)
+    finally:
+        if exporter is not None:
+            exporter.close()
+        if bulk_loader is not None:
+            bulk_loader.close()
+        TRACER.close()
+
+
+def handle_stop_signals(scraper):
+    """
+    Makes SIGINT and SIGTERM stop a scraper running as a daemon once the
+    current poll is saved. A second signal terminates it right away.
+    Args:
+        scraper: Scraper instance running as a daemon
+    """
+    def stop(signum, frame):
+        print('Stopping the daemon after the current poll...')
+        signal.signal(signum, signal.SIG_DFL)
+        scraper.stop()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
 
 
 def main():
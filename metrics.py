@@ -0,0 +1,385 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from settings import METRICS_PREFIX, METRICS_BUCKETS
+
+_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter:
+    """
+    Metric that only goes up, e.g. the amount of bytes downloaded. It keeps
+    one value per combination of label values.
+    """
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Creates the counter
+        Args:
+            name: name of the metric, without the prefix
+            documentation: description of the metric
+            labelnames: names of the labels of the metric
+        """
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments the counter
+        Args:
+            amount: amount to add
+            **labels: value of each label of the metric
+        """
+        key = _key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """
+        Returns the current values of the counter
+        Returns:
+            samples: list of (name, labels, value) tuples
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name + '_total', dict(zip(self.labelnames, key)), value)
+                for key, value in values]
+
+    def summary_rows(self):
+        """
+        Returns the rows of the counter in the end-of-run summary
+        Returns:
+            rows: list of (series, count, total, mean, max) tuples
+        """
+        return [(_series(self.name, labels), value, None, None, None)
+                for _, labels, value in self.samples()]
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+
+class Histogram:
+    """
+    Metric that counts observations, e.g. durations, in cumulative buckets.
+    It also keeps their sum and their maximum, for the summary table.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=METRICS_BUCKETS):
+        """
+        Creates the histogram
+        Args:
+            name: name of the metric, without the prefix
+            documentation: description of the metric
+            labelnames: names of the labels of the metric
+            buckets: sorted upper bounds of the buckets
+        """
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Records an observation
+        Args:
+            value: observed value
+            **labels: value of each label of the metric
+        """
+        key = _key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'buckets': [0] * len(self.buckets),
+                    'count': 0,
+                    'sum': 0.0,
+                    'max': 0.0,
+                }
+            for ix, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][ix] += 1
+                    break
+            series['count'] += 1
+            series['sum'] += value
+            series['max'] = max(series['max'], value)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Context manager that observes the seconds its block takes
+        Args:
+            **labels: value of each label of the metric
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        """
+        Returns the current buckets, sum and count of the histogram
+        Returns:
+            samples: list of (name, labels, value) tuples
+        """
+        with self._lock:
+            series = sorted((key, dict(value, buckets=list(value['buckets'])))
+                            for key, value in self._series.items())
+        samples = []
+        for key, value in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, value['buckets']):
+                cumulative += count
+                samples.append((self.name + '_bucket',
+                                dict(labels, le=_format_value(bound)),
+                                cumulative))
+            samples.append((self.name + '_bucket', dict(labels, le='+Inf'),
+                            value['count']))
+            samples.append((self.name + '_sum', labels, value['sum']))
+            samples.append((self.name + '_count', labels, value['count']))
+        return samples
+
+    def summary_rows(self):
+        """
+        Returns the rows of the histogram in the end-of-run summary
+        Returns:
+            rows: list of (series, count, total, mean, max) tuples
+        """
+        with self._lock:
+            series = sorted(self._series.items())
+        return [(_series(self.name, dict(zip(self.labelnames, key))),
+                 value['count'], value['sum'],
+                 value['sum'] / value['count'], value['max'])
+                for key, value in series]
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+
+class Metrics:
+    """
+    Class that holds the metrics of the scraper and exports them in the
+    Prometheus text format, to a file or through a local /metrics endpoint,
+    and as a summary table.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Creates and registers a Counter
+        Returns:
+            counter: Counter instance
+        """
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=METRICS_BUCKETS):
+        """
+        Creates and registers a Histogram
+        Returns:
+            histogram: Histogram instance
+        """
+        return self._register(Histogram(name, documentation, labelnames,
+                                        buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text exposition format
+        Returns:
+            text: string with the metrics
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append('# HELP {} {}'.format(metric.name,
+                                               metric.documentation))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+            for name, labels, value in metric.samples():
+                lines.append('{}{} {}'.format(name, _format_labels(labels),
+                                              _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self, path):
+        """
+        Writes the metrics to a file, replacing it atomically so a collector
+        never reads a half written file
+        Args:
+            path: path of the file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """
+        Serves the metrics on http://host:port/metrics from a background
+        thread
+        Args:
+            port: port to listen on
+            host: address to listen on
+
+        Returns:
+            server: the HTTP server. Call its shutdown method to stop it.
+        """
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', _CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def summary_lines(self):
+        """
+        Returns the end-of-run summary table of the metrics that were
+        recorded
+        Returns:
+            lines: list of strings
+        """
+        rows = [row for metric in self._metrics
+                for row in metric.summary_rows()]
+        if not rows:
+            return []
+        width = max(len(row[0]) for row in rows)
+        row_format = '{:<' + str(width) + '} {:>9} {:>11} {:>10} {:>10}'
+        lines = [row_format.format('metric', 'count', 'total', 'mean ms',
+                                   'max ms')]
+        for series, count, total, mean, maximum in rows:
+            if total is None:
+                lines.append(row_format.format(series, _format_value(count),
+                                               '', '', ''))
+            else:
+                lines.append(row_format.format(
+                    series, count, '{:.3f} s'.format(total),
+                    '{:.2f}'.format(mean * 1000),
+                    '{:.2f}'.format(maximum * 1000)))
+        return lines
+
+    def reset(self):
+        """
+        Clears the values of every metric
+        """
+        for metric in self._metrics:
+            metric.reset()
+
+
+def _key(labelnames, labels):
+    """
+    Builds the key of a series out of its label values
+    Args:
+        labelnames: names of the labels of the metric
+        labels: dictionary of label values
+
+    Returns:
+        key: tuple of label values, as strings
+    """
+    if set(labels) != set(labelnames):
+        raise ValueError('Expected the labels {}, got {}.'
+                         .format(labelnames, tuple(labels)))
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value))
+                          for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if not value.is_integer() else str(int(value))
+    return str(value)
+
+
+def _series(name, labels):
+    return name + _format_labels(labels)
+
+
+# Metrics of the scraper. They are always recorded; exporting them is
+# optional.
+METRICS = Metrics()
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    'http_request_duration_seconds',
+    'Seconds an HTTP request took, by URL class and status code.',
+    ('url_class', 'status'))
+HTTP_RESPONSE_BYTES = METRICS.counter(
+    'http_response_bytes',
+    'Bytes of the (decompressed) HTTP response bodies, by URL class.',
+    ('url_class',))
+HTTP_CACHE_REQUESTS = METRICS.counter(
+    'http_cache_requests',
+    'Requests to cacheable URLs, by URL class and result: hit (fresh), '
+    'revalidated (304) or miss.',
+    ('url_class', 'result'))
+PARSE_SECONDS = METRICS.histogram(
+    'parse_duration_seconds',
+    'Seconds spent building the parse tree of a page, by kind of page.',
+    ('page',))
+SELECTOR_SECONDS = METRICS.histogram(
+    'selector_duration_seconds',
+    'Seconds spent matching templates and selectors, by kind of page.',
+    ('page',))
+TEMPLATE_MATCHES = METRICS.counter(
+    'template_matches',
+    'Story templates matched, by path prefix. Misses have template="miss".',
+    ('prefix', 'template'))
+AUTHOR_LOOKUPS = METRICS.counter(
+    'author_lookups',
+    'Authors created, by source: the author cache or their profile.',
+    ('source',))
+STORY_SECONDS = METRICS.histogram(
+    'story_duration_seconds',
+    'Seconds it took to scrape a story, from fetch to Story object, by '
+    'result.',
+    ('result',))
+DB_STATEMENT_SECONDS = METRICS.histogram(
+    'db_statement_duration_seconds',
+    'Seconds a database statement took, by kind of statement.',
+    ('statement',))
+DB_COMMIT_SECONDS = METRICS.histogram(
+    'db_commit_duration_seconds',
+    'Seconds a database commit took.')
@@ -0,0 +1,174 @@
+import queue
+import threading
+from settings import PIPELINE_QUEUE_SIZE
+
+# Marks the end of the stories sent by a scraping worker
+_DONE = object()
+# Seconds a blocked stage waits before checking if it should give up
+_POLL_INTERVAL = 0.1
+
+
+class Pipeline:
+    """
+    Class that streams URLs through the scraping stages: the URLs are fed to
+    a pool of workers that fetch, parse and assemble each story, and the
+    assembled stories are persisted in small batches as soon as they are
+    ready. The stages are connected by bounded queues, so a slow stage makes
+    the previous ones wait instead of piling up items in memory.
+    """
+
+    def __init__(self, scrape_story, persist, workers, batch_size,
+                 queue_size=PIPELINE_QUEUE_SIZE):
+        """
+        Creates the pipeline
+        Args:
+            scrape_story: function that receives an URL and its index and
+                returns a Story object, or None if it should be skipped
+            persist: function that receives a list of Story objects and
+                saves them
+            workers: amount of workers scraping stories concurrently
+            batch_size: amount of stories persisted together
+            queue_size: maximum amount of items waiting between two stages
+        """
+        self.scrape_story = scrape_story
+        self.persist = persist
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.persisted = 0
+        self._stop = threading.Event()
+        self._urls_done = threading.Event()
+        self._persist_done = threading.Event()
+        self._errors = []
+        self._errors_lock = threading.Lock()
+
+    def run(self, urls):
+        """
+        Runs the pipeline until every URL is scraped and persisted. If a stage
+        raises an exception, the pipeline stops, the stories already assembled
+        are persisted and the exception is raised again.
+        Args:
+            urls: iterable of story URLs. It's consumed lazily.
+
+        Returns:
+            persisted: amount of stories persisted
+        """
+        urls_queue = queue.Queue(maxsize=self.queue_size)
+        stories_queue = queue.Queue(maxsize=self.queue_size)
+        threads = [threading.Thread(target=self._scrape_worker,
+                                    args=(urls_queue, stories_queue),
+                                    daemon=True)
+                   for _ in range(self.workers)]
+        threads.append(threading.Thread(target=self._persist_worker,
+                                        args=(stories_queue,), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            for item in enumerate(urls):
+                if not self._put(urls_queue, item, self._stop):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._urls_done.set()
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return self.persisted
+
+    def _scrape_worker(self, urls_queue, stories_queue):
+        """
+        Scrapes the URLs coming from the URLs queue and puts the stories in
+        the stories queue. It always finishes by putting the end mark in the
+        stories queue, unless the persisting stage is gone.
+        Args:
+            urls_queue: queue of (index, URL) tuples
+            stories_queue: queue of Story objects
+        """
+        try:
+            while not self._stop.is_set():
+                try:
+                    index, url = urls_queue.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    if self._urls_done.is_set():
+                        break
+                    continue
+                story = self.scrape_story(url, index)
+                if story is not None and \
+                        not self._put(stories_queue, story,
+                                      self._persist_done):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(stories_queue, _DONE, self._persist_done)
+
+    def _persist_worker(self, stories_queue):
+        """
+        Persists the stories coming from the stories queue in batches, until
+        every scraping worker is done. When the pipeline is stopped because of
+        an error in another stage, the stories it receives are persisted
+        anyway.
+        Args:
+            stories_queue: queue of Story objects
+        """
+        batch = []
+        finished = 0
+        try:
+            while finished < self.workers:
+                story = stories_queue.get()
+                if story is _DONE:
+                    finished += 1
+                    continue
+                batch.append(story)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+            self._flush(batch)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._persist_done.set()
+
+    def _flush(self, batch):
+        """
+        Persists a batch of stories
+        Args:
+            batch: list of Story objects
+        """
+        if batch:
+            self.persist(batch)
+            self.persisted += len(batch)
+
+    @staticmethod
+    def _put(q, item, abort):
+        """
+        Puts an item in a queue, waiting while it's full
+        Args:
+            q: queue to put the item in
+            item: item to put
+            abort: threading.Event that makes it give up waiting when set
+
+        Returns:
+            True if the item was put in the queue
+        """
+        while not abort.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fail(self, error):
+        """
+        Records an error and stops the pipeline
+        Args:
+            error: exception raised by a stage
+        """
+        with self._errors_lock:
+            self._errors.append(error)
+        self._stop.set()
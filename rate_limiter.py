@@ -0,0 +1,398 @@
+import email.utils
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+from registry import Registry
+from settings import SUCCESS_STATUS_CODE, THROTTLED_STATUS_CODES, \
+    NOT_MODIFIED_STATUS_CODE, RATE_LIMIT_LATENCY_WARMUP, \
+    HTTP_USER_AGENT, RATE_LIMIT_INITIAL_RATE, RATE_LIMIT_MIN_RATE, \
+    RATE_LIMIT_MAX_RATE, RATE_LIMIT_BURST, RATE_LIMIT_INITIAL_CONCURRENCY, \
+    RATE_LIMIT_MAX_CONCURRENCY, RATE_LIMIT_DECREASE_FACTOR, \
+    RATE_LIMIT_LATENCY_FACTOR, RATE_LIMIT_LATENCY_TOLERANCE, \
+    RATE_LIMIT_COOLDOWN, RATE_LIMIT_MAX_RETRIES, \
+    RATE_LIMIT_RETRY_AFTER_DEFAULT, RATE_LIMIT_RETRY_AFTER_MAX, \
+    ROBOTS_TXT_PATH
+from transport import url_class
+
+# Weight of the last response in the moving average of the recent latency
+_LATENCY_SMOOTHING = 0.2
+# Weight of the last response in the moving average of the usual latency
+_BASELINE_SMOOTHING = 0.02
+
+
+class LatencyTracker:
+    """
+    Class that follows the latency of a class of URLs of a host with two
+    moving averages: a fast one, the recent latency, and a slow one, the
+    usual latency. The usual latency is the plain average of the first
+    responses, so a single fast or slow response doesn't set it.
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.recent = None
+        self.usual = None
+
+    def add(self, elapsed):
+        """
+        Adds the latency of a response and checks if the recent latency rose
+        over the usual one
+        Args:
+            elapsed: seconds a request took
+
+        Returns:
+            True if the latency is rising
+        """
+        self.samples += 1
+        if self.recent is None:
+            self.recent = self.usual = elapsed
+            return False
+        self.recent += _LATENCY_SMOOTHING * (elapsed - self.recent)
+        if self.samples <= RATE_LIMIT_LATENCY_WARMUP:
+            self.usual += (elapsed - self.usual) / self.samples
+            return False
+        slow = self.recent > self.usual * RATE_LIMIT_LATENCY_FACTOR and \
+            self.recent - self.usual > RATE_LIMIT_LATENCY_TOLERANCE
+        self.usual += _BASELINE_SMOOTHING * (elapsed - self.usual)
+        return slow
+
+
+class HostLimiter:
+    """
+    Class that paces the requests to a single host. A request needs a token
+    from a token bucket, which limits the request rate, and a free slot in
+    the concurrency window, which limits the requests in flight.
+    Both the rate and the window grow additively while the host answers
+    well, and are cut multiplicatively when it throttles the requests (429 or
+    503), a request fails or the latency rises (AIMD). The latency is
+    compared with the usual latency of the same class of URLs, since a
+    profile and a story page of the same host can take very different times.
+    """
+
+    def __init__(self, rate=RATE_LIMIT_INITIAL_RATE, burst=RATE_LIMIT_BURST,
+                 concurrency=RATE_LIMIT_INITIAL_CONCURRENCY,
+                 min_rate=RATE_LIMIT_MIN_RATE, max_rate=RATE_LIMIT_MAX_RATE,
+                 max_concurrency=RATE_LIMIT_MAX_CONCURRENCY):
+        """
+        Creates the limiter
+        Args:
+            rate: initial requests per second
+            burst: maximum amount of tokens the bucket holds
+            concurrency: initial size of the concurrency window
+            min_rate: the rate is never cut below this value
+            max_rate: the rate never grows over this value
+            max_concurrency: the concurrency window never grows over this
+                value
+        """
+        self.rate = rate
+        self.burst = burst
+        self.limit = float(concurrency)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._latencies = {}
+        self._condition = threading.Condition()
+
+    def set_crawl_delay(self, delay):
+        """
+        Caps the request rate to one request every delay seconds, as asked by
+        the robots.txt of the host
+        Args:
+            delay: seconds between two requests
+        """
+        if delay is None or delay <= 0:
+            return
+        with self._condition:
+            self.max_rate = min(self.max_rate, 1 / delay)
+            self.min_rate = min(self.min_rate, self.max_rate)
+            self.rate = min(self.rate, self.max_rate)
+            self.burst = 1
+            self._tokens = min(self._tokens, 1.0)
+
+    def acquire(self):
+        """
+        Waits until a request can be sent to the host. Every call needs to be
+        followed by a call to release once the request is done.
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    timeout = self._blocked_until - now
+                elif self._in_flight >= max(1, int(self.limit)):
+                    timeout = None
+                elif self._tokens < 1:
+                    timeout = (1 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    return
+                self._condition.wait(timeout)
+
+    def release(self, status_code=None, elapsed=None, retry_after=None,
+                latency_class=None):
+        """
+        Marks a request as done and adapts the rate and the concurrency window
+        to its outcome
+        Args:
+            status_code: status code of the response or None if the request
+                failed
+            elapsed: optional - seconds the request took. If provided, it's
+                used to detect a rising latency. The latency of 304 responses
+                isn't, since they have no body.
+            retry_after: optional - seconds the host asked to wait before the
+                next request
+            latency_class: optional - class of the URL requested. Latencies
+                are only compared within the same class.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if status_code in THROTTLED_STATUS_CODES:
+                self._decrease(now)
+                if retry_after is None:
+                    retry_after = RATE_LIMIT_RETRY_AFTER_DEFAULT
+                self._blocked_until = max(self._blocked_until,
+                                          now + retry_after)
+            elif status_code is None or \
+                    (elapsed is not None and
+                     status_code != NOT_MODIFIED_STATUS_CODE and
+                     self._is_slow(elapsed, latency_class)):
+                self._decrease(now)
+            else:
+                self._increase()
+            self._condition.notify_all()
+
+    def _refill(self, now):
+        """
+        Adds the tokens earned since the last refill. It must be called
+        holding the lock.
+        Args:
+            now: current monotonic time
+        """
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _is_slow(self, elapsed, latency_class):
+        """
+        Adds a latency to the tracker of its class of URLs and checks if the
+        host became slow compared to its usual latency. It must be called
+        holding the lock.
+        Args:
+            elapsed: seconds a request took
+            latency_class: class of the URL requested
+
+        Returns:
+            True if the latency is rising
+        """
+        tracker = self._latencies.get(latency_class)
+        if tracker is None:
+            tracker = self._latencies[latency_class] = LatencyTracker()
+        return tracker.add(elapsed)
+
+    def _increase(self):
+        """
+        Grows the concurrency window by one slot and the rate by one request
+        per second for every full window of good responses. It must be called
+        holding the lock.
+        """
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self.rate = min(self.max_rate, self.rate + 1 / self.limit)
+
+    def _decrease(self, now):
+        """
+        Cuts the rate and the concurrency window, at most once per cooldown
+        period so a burst of bad responses counts as a single event. It must
+        be called holding the lock.
+        Args:
+            now: current monotonic time
+        """
+        if now - self._last_decrease < RATE_LIMIT_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit * RATE_LIMIT_DECREASE_FACTOR)
+        self.rate = max(self.min_rate, self.rate * RATE_LIMIT_DECREASE_FACTOR)
+
+
+class RateLimiter:
+    """
+    Class that holds one HostLimiter per host. The first time a host is seen,
+    its robots.txt is read and its crawl delay, if any, is respected.
+    """
+
+    def __init__(self, robots_transport=None, user_agent=HTTP_USER_AGENT):
+        """
+        Creates the rate limiter
+        Args:
+            robots_transport: optional - transport used to fetch the
+                robots.txt of the hosts. If not provided, robots.txt isn't
+                read.
+            user_agent: user agent the robots.txt rules are looked up for
+        """
+        self.robots_transport = robots_transport
+        self.user_agent = user_agent
+        self._hosts = Registry()
+
+    def host_limiter(self, url):
+        """
+        Returns the limiter of the host of an URL, creating it if needed
+        Args:
+            url: URL that will be requested
+
+        Returns:
+            limiter: HostLimiter instance
+        """
+        parts = urlsplit(url)
+        origin = '{}://{}'.format(parts.scheme, parts.netloc)
+        return self._hosts.get_or_create(origin,
+                                         lambda: self._create(origin))
+
+    def _create(self, origin):
+        """
+        Creates the limiter of a host, applying its robots.txt crawl delay
+        Args:
+            origin: scheme and host, e.g. https://www.cnet.com
+
+        Returns:
+            limiter: HostLimiter instance
+        """
+        limiter = HostLimiter()
+        limiter.set_crawl_delay(self._crawl_delay(origin))
+        return limiter
+
+    def _crawl_delay(self, origin):
+        """
+        Reads the crawl delay of a host from its robots.txt
+        Args:
+            origin: scheme and host, e.g. https://www.cnet.com
+
+        Returns:
+            delay: seconds between two requests or None if there's none
+        """
+        if self.robots_transport is None:
+            return None
+        try:
+            response = self.robots_transport.get(origin + ROBOTS_TXT_PATH)
+        except RuntimeError as e:
+            print('Warning! {}'.format(e))
+            return None
+        if response.status_code != SUCCESS_STATUS_CODE:
+            return None
+        robots = RobotFileParser()
+        robots.parse(response.text.splitlines())
+        delay = robots.crawl_delay(self.user_agent)
+        rate = robots.request_rate(self.user_agent)
+        if rate is not None and rate.requests:
+            delay = max(delay or 0, rate.seconds / rate.requests)
+        return float(delay) if delay else None
+
+    @contextmanager
+    def throttle(self, url):
+        """
+        Context manager that runs a request that doesn't go through a
+        transport (e.g. a Selenium page load) under the limiter of its host
+        Args:
+            url: URL that will be requested
+        """
+        limiter = self.host_limiter(url)
+        limiter.acquire()
+        try:
+            yield
+        except Exception:
+            limiter.release()
+            raise
+        limiter.release(SUCCESS_STATUS_CODE)
+
+
+class RateLimitedTransport:
+    """
+    Transport that sends every request through the limiter of its host.
+    Throttled requests are retried after the time asked by the host.
+    """
+
+    def __init__(self, transport, limiter, max_retries=RATE_LIMIT_MAX_RETRIES):
+        """
+        Creates the rate limited transport
+        Args:
+            transport: transport that performs the actual requests
+            limiter: RateLimiter instance
+            max_retries: times a throttled request is retried
+        """
+        self.transport = transport
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    def get(self, url, headers=None):
+        """
+        Performs a GET request once its host allows it
+        Args:
+            url: URL to request
+            headers: optional dictionary of extra request headers
+
+        Returns:
+            response: Response object. If the request was still throttled
+                after every retry, the throttled response.
+        """
+        limiter = self.limiter.host_limiter(url)
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            try:
+                response = self.transport.get(url, headers=headers)
+            except RuntimeError:
+                limiter.release()
+                raise
+            limiter.release(response.status_code, response.elapsed,
+                            parse_retry_after(response.headers),
+                            url_class(url))
+            if response.status_code not in THROTTLED_STATUS_CODES:
+                break
+        return response
+
+    def close(self):
+        """
+        Closes the wrapped transport
+        """
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def parse_retry_after(headers):
+    """
+    Reads the Retry-After header of a response, given either in seconds or
+    as an HTTP date
+    Args:
+        headers: dictionary of response headers
+
+    Returns:
+        seconds: seconds to wait, capped to RATE_LIMIT_RETRY_AFTER_MAX, or
+            None if the header is missing or invalid
+    """
+    value = None
+    for key, header in headers.items():
+        if key.lower() == 'retry-after':
+            value = header.strip()
+    if not value:
+        return None
+    if value.isdigit():
+        seconds = int(value)
+    else:
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = date.timestamp() - time.time()
+    return min(max(seconds, 0), RATE_LIMIT_RETRY_AFTER_MAX)
@@ -0,0 +1,96 @@
+import threading
+
+
+class Registry:
+    """
+    Class that holds one object per entity (author, tag...), indexed by the
+    key that identifies it. Lookups take constant time and, when used from
+    several threads, an entity is only created once.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty registry
+        """
+        self._entries = {}
+        self._creating = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the object registered for a key
+        Args:
+            key: key that identifies the entity
+
+        Returns:
+            obj: registered object or None if the key isn't registered
+        """
+        return self._entries.get(key)
+
+    def add(self, key, obj):
+        """
+        Registers an object for a key, unless the key is already registered
+        Args:
+            key: key that identifies the entity
+            obj: object to register
+
+        Returns:
+            obj: the object registered for the key
+        """
+        with self._lock:
+            return self._entries.setdefault(key, obj)
+
+    def get_or_create(self, key, factory):
+        """
+        Returns the object registered for a key. If there isn't one, it
+        creates it by calling factory and registers it. If factory raises an
+        exception, nothing is registered and the exception is propagated.
+        Concurrent calls for the same key wait for the first one to create
+        the object instead of creating it again.
+        Args:
+            key: key that identifies the entity
+            factory: function with no arguments that creates the object
+
+        Returns:
+            obj: the object registered for the key
+        """
+        obj = self._entries.get(key)
+        if obj is not None:
+            return obj
+        with self._lock:
+            obj = self._entries.get(key)
+            if obj is not None:
+                return obj
+            key_lock = self._creating.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                obj = self._entries.get(key)
+                if obj is None:
+                    obj = factory()
+                    self._entries[key] = obj
+        finally:
+            with self._lock:
+                self._creating.pop(key, None)
+        return obj
+
+    def clear(self):
+        """
+        Removes every registered object
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def values(self):
+        """
+        Returns a list of the registered objects, in registration order
+        """
+        return list(self._entries.values())
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,18 +1,34 @@
 from bs4 import BeautifulSoup
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, \
     WebDriverException
 from database import MySqlConnection as SqlConn
-import requests
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import datetime
 import os
 import json
+import importlib.util
+import random
+import sys
+import threading
+import time
+from contextlib import nullcontext
 from story import Story
 from author import Author
 from tag import Tag
+from registry import Registry
+from template_matcher import TemplateMatcher
+from pipeline import Pipeline
+from driver_pool import DriverPool
+from frontier import UrlFrontier, SeenUrls
+import extraction
+from transport import create_transport, MeteredTransport
+from metrics import METRICS, PARSE_SECONDS, AUTHOR_LOOKUPS, STORY_SECONDS
+from tracing import TRACER
+from http_cache import CachingTransport
+from rate_limiter import RateLimitedTransport
 from settings import *
 
 
@@ -25,7 +41,14 @@ class Scraper:
     def __init__(self, config, logging=True, should_save=True,
                  mode=MODE_TOP_STORIES, fail_silently=False, file_name=None,
                  file_full_path=False, author=None, tag=None,
-                 number=None, api=None):
+                 number=None, api=None, workers=WORKERS_DEFAULT,
+                 transport=None, cache=None, incremental=False,
+                 refresh_age=None, author_cache=None,
+                 batch_size=DB_BATCH_SIZE, parser=HTML_PARSER_DEFAULT,
+                 stream=False, processes=None, driver_pool=None,
+                 targets=None, rate_limiter=None, poll_interval=None,
+                 poll_jitter=DAEMON_POLL_JITTER, metrics_file=None,
+                 exporter=None, bulk_loader=None):
         """
         Constructor for the Scraper class
         Args:
@@ -33,8 +56,8 @@ class Scraper:
                 is scraped
             logging: boolean - defines if program will print output to the
                 console or not
-            mode: can either be 'top_stories', 'author' or 'tag'. Will
-                determine the scraper entry point.
+            mode: can either be 'top_stories', 'author', 'tag' or 'batch'.
+                Will determine the scraper entry point.
             should_save: boolean - can disable the data saving to the text
                 file. Mainly for testing
             fail_silently: boolean - if a story can't be scraped, it can stop
@@ -45,6 +68,54 @@ class Scraper:
             author: author to scrape if mode is set to author.
             tag: tag to scrape if mode is set to tag.
             number: optional - limit the amount of stories to scrape.
+            api: optional - topic to query the New York Times API on.
+            workers: amount of stories to fetch concurrently. 1 scrapes them
+                one after another.
+            transport: optional - transport used for every HTTP request. If
+                not provided, a pooled HttpTransport is created.
+            cache: optional - HttpCache instance. If provided, story and
+                profile pages are cached and revalidated through it, and the
+                fields parsed from them are reused while they don't change.
+            incremental: boolean - skip the stories whose URL is already
+                stored in the database.
+            refresh_age: optional - seconds after which a stored story is
+                scraped again in incremental mode.
+            author_cache: optional - AuthorCache instance. Authors that are
+                fresh in it are created without fetching their profile.
+            batch_size: amount of stories saved to the database per
+                transaction.
+            parser: HTML parser used by BeautifulSoup. If lxml is selected but
+                it isn't installed, html.parser is used instead.
+            stream: boolean - save (or print) the stories in batches as soon
+                as they are scraped, instead of keeping all of them until the
+                end.
+            processes: optional - amount of processes used to parse the
+                stories. If not set, the stories are parsed by the same
+                workers that fetch them.
+            driver_pool: optional - DriverPool used to scrape authors'
+                profiles in author mode. If not provided, one is created when
+                it's needed.
+            targets: list of (mode, value) tuples to scrape if mode is set to
+                batch. The value is the tag or the author of the target, or
+                None for the top stories.
+            rate_limiter: optional - RateLimiter instance. If provided, every
+                request (HTTP and Selenium) waits for the limiter of its host,
+                which adapts the pace to how the host responds.
+            poll_interval: optional - seconds between two polls. If set, the
+                scraper runs as a daemon: it polls the top stories until it's
+                stopped and only scrapes the stories it didn't see before.
+            poll_jitter: fraction of the poll interval that's randomly added
+                or subtracted to each wait, so polls don't happen at fixed
+                times.
+            metrics_file: optional - path of a file the metrics are written
+                to, in the Prometheus text format, at the end of the run and
+                after every poll in daemon mode.
+            exporter: optional - Exporter instance. If provided, the scraped
+                stories, authors and tags are also written to its files, as
+                they are saved (or printed).
+            bulk_loader: optional - BulkLoader instance. If provided, the
+                stories are staged to its files instead of being upserted,
+                and bulk loaded into the database at the end of the run.
         """
         self.config = config
         self.logging = logging
@@ -52,15 +123,59 @@ class Scraper:
         self.fail_silently = fail_silently
         self.urls = []
         self.stories = []
-        self.authors = []
-        self.tags = []
+        self.authors = Registry()
+        self.tags = Registry()
+        self.template_matcher = TemplateMatcher(
+            config.compiled_story_templates)
         self.author = author
         self.tag = tag
         self.number = number if number is not None else MAX_URLS_DEFAULT
+        if workers is None or workers < 1:
+            raise ValueError('The amount of workers needs to be a positive '
+                             'integer.')
+        self.workers = workers
+        self.transport = MeteredTransport(
+            transport if transport is not None else create_transport())
+        self.cache = cache
+        if refresh_age is not None and not incremental:
+            raise ValueError('A refresh age can only be set in incremental '
+                             'mode.')
+        self.incremental = incremental
+        self.refresh_age = refresh_age
+        self.author_cache = author_cache
+        if batch_size is None or batch_size < 1:
+            raise ValueError('The batch size needs to be a positive integer.')
+        self.batch_size = batch_size
+        if parser not in HTML_PARSERS:
+            raise ValueError('Invalid value "{}" for the HTML parser.'
+                             .format(parser))
+        if parser == HTML_PARSER_LXML and \
+                importlib.util.find_spec('lxml') is None:
+            print('Warning! lxml is not installed, html.parser will be used.')
+            parser = HTML_PARSER_PYTHON
+        self.parser = parser
+        self.stream = stream
+        if processes is not None and processes < 1:
+            raise ValueError('The amount of processes needs to be a positive '
+                             'integer.')
+        self.processes = processes
+        self.process_pool = None
+        self.driver_pool = driver_pool
+        self.rate_limiter = rate_limiter
+        if self.rate_limiter is not None:
+            self.transport = RateLimitedTransport(self.transport,
+                                                  self.rate_limiter)
+        if self.cache is not None:
+            ttls = None
+            if poll_interval is not None:
+                # The news index is revalidated in every poll
+                ttls = dict(HTTP_CACHE_TTLS, **{URL_CLASS_NEWS_INDEX: 0})
+            self.transport = CachingTransport(self.transport, self.cache,
+                                              ttls)
 
         if mode not in SCRAPE_MODE:
-            raise ValueError('Scrape mode can only take one of the three '
-                             'values: top_stories, author or tag')
+            raise ValueError('Scrape mode can only take one of the four '
+                             'values: top_stories, author, tag or batch')
         self.mode = mode
         if self.mode == MODE_AUTHOR and author is None:
             raise AttributeError('An author needs to be passed to the scraper '
@@ -68,6 +183,10 @@ class Scraper:
         if self.mode == MODE_TAG and tag is None:
             raise AttributeError('A tag needs to be passed to the scraper '
                                  'because tag mode was set.')
+        if self.mode == MODE_BATCH and not targets:
+            raise AttributeError('A list of targets needs to be passed to the '
+                                 'scraper because batch mode was set.')
+        self.targets = targets
 
         if self.should_save and file_name is None:
             raise ValueError('File name needs to be provided '
@@ -78,6 +197,35 @@ class Scraper:
                              'the scraper.'.format(api))
         self.api = api
 
+        if poll_interval is not None:
+            if poll_interval <= 0:
+                raise ValueError('The poll interval needs to be a positive '
+                                 'number.')
+            if self.mode != MODE_TOP_STORIES:
+                raise ValueError('Only the top stories can be polled in '
+                                 'daemon mode.')
+            if self.api is not None:
+                raise ValueError("The API can't be queried in daemon mode.")
+        if poll_jitter < 0 or poll_jitter >= 1:
+            raise ValueError('The poll jitter needs to be a fraction between '
+                             '0 and 1.')
+        self.poll_interval = poll_interval
+        self.poll_jitter = poll_jitter
+        self._stop = threading.Event()
+        self.metrics_file = metrics_file
+        self.exporter = exporter
+        # URLs of the stories that failed for good in the current run
+        self._gone_urls = set()
+        self._gone_lock = threading.Lock()
+        if bulk_loader is not None:
+            if not self.should_save:
+                raise ValueError('A bulk loader can only be used when the '
+                                 'results are saved.')
+            if poll_interval is not None:
+                raise ValueError("A bulk loader can't be used in daemon "
+                                 "mode.")
+        self.bulk_loader = bulk_loader
+
         if file_full_path:
             file_dir = os.path.dirname(file_name)
             if file_dir:
@@ -99,24 +247,272 @@ class Scraper:
         Functions that runs the scraping process: gets the URLs for the top
         stories, scrapes them and saves the results.
         """
+        if self.processes is not None:
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=extraction.process_pool_context(),
+                initializer=extraction.init_worker,
+                initargs=(self.config, self.parser))
+        try:
+            if self.poll_interval is not None:
+                self._poll_forever()
+            else:
+                self._scrape()
+        finally:
+            if self.process_pool is not None:
+                self.process_pool.shutdown()
+            if self.driver_pool is not None:
+                self.driver_pool.close()
+            self.transport.close()
+            if self.author_cache is not None:
+                self.author_cache.close()
+            self._export_metrics()
+
+    def _export_metrics(self):
+        """
+        Writes the metrics to the metrics file, if one was set.
+        """
+        if self.metrics_file is not None:
+            METRICS.write_file(self.metrics_file)
+
+    def stop(self):
+        """
+        Asks a scraper running as a daemon to stop. The poll in progress, if
+        any, is finished and saved before it stops. It's safe to call it from
+        a signal handler.
+        """
+        self._stop.set()
+
+    def _poll_forever(self):
+        """
+        Polls the top stories every poll interval (with some jitter) until
+        the scraper is stopped. Each poll only scrapes and saves the stories
+        that weren't seen in a previous poll. A failed poll is logged and its
+        stories are tried again in the next one, and so are the stories that
+        failed silently, unless they are gone for good.
+        """
+        seen = SeenUrls(DAEMON_SEEN_URLS_MAX)
+        polls = 0
+        while not self._stop.is_set():
+            polls += 1
+            if self.logging:
+                print('Poll no. {}: {}'.format(
+                    polls, datetime.datetime.now().strftime(
+                        "%d/%m/%Y, %H:%M:%S")))
+            try:
+                self._poll(seen)
+            except Exception as e:
+                print('Warning! Poll no. {} failed: {}'.format(polls, e))
+            self._trim_session()
+            self._export_metrics()
+            jitter = self.poll_interval * self.poll_jitter
+            self._stop.wait(self.poll_interval +
+                            random.uniform(-jitter, jitter))
+        if self.logging:
+            print('The daemon was stopped after {} polls.'.format(polls))
+
+    def _poll(self, seen):
+        """
+        Runs a single poll: gets the URLs of the top stories, drops the ones
+        seen in previous polls and scrapes and saves the rest. Only the URLs
+        that were stored or are gone for good are marked as seen.
+        Args:
+            seen: SeenUrls instance with the URLs of previous polls
+        """
+        self.urls = []
+        self.stories = []
+        self._collect_urls()
+        self.urls = seen.filter_new(self.urls)
+        seen.add_all(self._scrape_urls())
+
+    def _trim_session(self):
+        """
+        Releases the memory held by the previous poll, and forgets the
+        authors and tags of the session once there are too many of them, so
+        a long-running daemon doesn't keep growing.
+        """
+        self.urls = []
+        self.stories = []
+        self._forget_entities(DAEMON_MAX_ENTITIES)
+
+    def _forget_entities(self, limit):
+        """
+        Forgets the authors and tags of the session, and their database IDs,
+        once there are more than a limit of them. They are scraped (or looked
+        up) again the next time a story needs them.
+        Args:
+            limit: maximum amount of authors and tags kept
+        """
+        if len(self.authors) + len(self.tags) > limit:
+            self.authors.clear()
+            self.tags.clear()
+            SqlConn.clear_id_maps()
+
+    def _scrape(self):
+        """
+        Runs every step of the scraping process. In streaming mode, the URLs
+        of a tag go into the pipeline as its listing pages are read, so they
+        are never held all at once.
+        """
+        if self.stream and self.mode == MODE_TAG:
+            self._scrape_urls(self._iter_tag_urls(self.tag))
+            return
+        self._collect_urls()
+        self._scrape_urls()
+
+    def _collect_urls(self):
+        """
+        Gathers the URLs of the stories to scrape, according to the mode.
+        """
         if self.mode == MODE_TOP_STORIES:
             self.scrape_top_stories_page()
         elif self.mode == MODE_AUTHOR:
             self.scrape_stories_author()
+        elif self.mode == MODE_BATCH:
+            self.scrape_batch_targets()
         else:
             self.scrape_stories_tag()
 
-        if self.logging:
-            print('{} stories will be scraped'.format(len(self.urls)))
-        self.scrape_stories()
+    def _scrape_urls(self, urls=None):
+        """
+        Scrapes the stories of the gathered URLs, and the API results if
+        needed, and saves (or prints) them.
+        Args:
+            urls: optional - iterable of URLs streamed through the pipeline
+                instead of the gathered ones, in streaming mode. It's
+                consumed lazily and it isn't filtered in incremental mode.
+
+        Returns:
+            done: list of the URLs that don't need to be scraped again: the
+                ones stored (or printed), already stored or gone for good
+        """
+        with self._gone_lock:
+            self._gone_urls = set()
+        done = []
+        if urls is not None:
+            if self.logging:
+                print('Up to {} stories will be scraped'.format(self.number))
+        else:
+            if self.incremental:
+                gathered = self.urls
+                self.skip_stored_urls()
+                remaining = set(self.urls)
+                done += [url for url in gathered if url not in remaining]
+            if self.logging:
+                print('{} stories will be scraped'.format(len(self.urls)))
+            urls = self.urls
+        if self.stream:
+            done += self._scrape_streaming(urls)
+        else:
+            self.scrape_stories()
+
+            if self.api is not None:
+                self.query_api()
+
+            if self.should_save:
+                self.save_results()
+            else:
+                self.print_results()
+            if self.exporter is not None:
+                self.exporter.write_stories(self.stories)
+            done += [story.url for story in self.stories]
+        with self._gone_lock:
+            done += self._gone_urls
+        return done
+
+    def _scrape_streaming(self, urls):
+        """
+        Scrapes the stories and the API results in streaming mode: they are
+        saved (or printed) batch by batch, and only the stories of the batch
+        being saved are kept in memory.
+        Args:
+            urls: iterable of URLs of the stories to scrape
+
+        Returns:
+            persisted: list of the URLs of the stories saved (or printed), in
+                daemon mode. It's empty otherwise.
+        """
+        if not self.should_save:
+            self._print_session_header()
+        persisted = self.stream_stories(urls)
 
         if self.api is not None:
             self.query_api()
+            self._persist_batch(self.stories)
+            self.stories = []
 
-        if self.should_save:
-            self.save_results()
+        if not self.should_save:
+            self._print_authors()
         else:
-            self.print_results()
+            if self.bulk_loader is not None:
+                self._bulk_load()
+            if self.logging:
+                print('Results were saved!')
+        return persisted
+
+    def stream_stories(self, urls=None):
+        """
+        Scrapes the stories for the existing URLs through a streaming
+        pipeline, persisting them in batches as soon as they are assembled.
+        When the stories are saved, the authors and tags of the session are
+        bounded after every batch, so memory doesn't grow with the run.
+        Args:
+            urls: optional - iterable of URLs, consumed lazily. The existing
+                URLs are used by default.
+
+        Returns:
+            persisted: list of the URLs of the stories saved (or printed), in
+                daemon mode, where they are marked as seen. It's empty
+                otherwise, so a long run doesn't keep them.
+        """
+        persisted = []
+
+        def persist(stories):
+            urls_persisted = self._persist_batch(stories)
+            if self.poll_interval is not None:
+                persisted.extend(urls_persisted)
+            if self.should_save:
+                self._forget_entities(STREAM_MAX_ENTITIES)
+
+        pipeline = Pipeline(self._scrape_story_logged, persist, self.workers,
+                            self.batch_size)
+        count = pipeline.run(self.urls if urls is None else urls)
+        if self.logging:
+            print('{} stories were scraped!'.format(count))
+        return persisted
+
+    def _persist_batch(self, stories):
+        """
+        Saves a batch of stories to the database (or stages it for the bulk
+        load), or prints them if the results shouldn't be saved, and exports
+        them if there's an exporter.
+        Args:
+            stories: list of Story objects
+
+        Returns:
+            urls: list of the URLs of the persisted stories
+        """
+        if not self.should_save:
+            self._print_stories(stories)
+        elif self.bulk_loader is not None:
+            self.bulk_loader.add_stories(stories)
+        else:
+            SqlConn.save_results(stories, self.batch_size)
+        if self.exporter is not None:
+            self.exporter.write_stories(stories)
+        return [story.url for story in stories]
+
+    def skip_stored_urls(self):
+        """
+        Removes from the URLs to scrape the ones already stored in the
+        database, looking all of them up at once. If a refresh age was set,
+        stored stories older than that are kept so they get updated.
+        """
+        stored = SqlConn.get_stored_urls(self.urls, self.refresh_age)
+        if self.logging:
+            print('{} of {} stories are already stored and will be skipped'
+                  .format(len(stored), len(self.urls)))
+        self.urls = [url for url in self.urls if url not in stored]
 
     def query_api(self):
         """
@@ -124,7 +520,7 @@ class Scraper:
         """
         if self.logging:
             print('Querying the New York Times API...')
-        response = requests.get(API_URL.format(self.api, API_KEY))
+        response = self.transport.get(API_URL.format(self.api, API_KEY))
         if response.status_code != SUCCESS_STATUS_CODE:
             if response.status_code == UNAUTHORIZED_STATUS_CODE:
                 raise ValueError("Error! There's an error related to "
@@ -168,56 +564,192 @@ class Scraper:
         that the link point to a relative address, we build the full address for
         each story and saves the list of the URLs that point to the top stories.
         """
-        page = requests.get(BASE_URL)
-        soup = BeautifulSoup(page.content, 'html.parser')
+        self.urls += self._collect_top_stories_urls()
+        self.urls = self.urls[:self.number]
+
+    def _collect_top_stories_urls(self):
+        """
+        Scrapes the main site and returns the URLs of the top stories.
+        Returns:
+            urls: list of URLs, limited to the amount of stories to scrape
+        """
+        urls = []
+        page = self.transport.get(BASE_URL)
+        soup = self._make_soup(page.content, self.config.main_urls_strainer)
 
-        for pattern in self.config.main_urls_pattern:
-            top_stories = soup.select(pattern[0])
+        for pattern in self.config.compiled_main_urls_pattern:
+            top_stories = pattern[0].select(soup)
             if len(top_stories) == 0:
                 raise RuntimeError('Error! Scraping the main site to get the'
                                    'news list failed.')
-            self.urls += [DOMAIN_URL + a.get(pattern[1]) for a in top_stories]
-
-        self.urls = self.urls[:self.number]
+            urls += [DOMAIN_URL + a.get(pattern[1]) for a in top_stories]
+        return urls[:self.number]
 
     def scrape_stories_tag(self):
         """
         Scrapes the tag website to get a list of stories and saves them in a
         class attribute so they can be scraped later.
         """
-        page = requests.get(TAG_URL + self.tag)
+        self.urls += self._collect_tag_urls(self.tag)
+        self.urls = self.urls[:self.number]
+
+    def _collect_tag_urls(self, tag):
+        """
+        Crawls the listing pages of a tag and returns the URLs of its most
+        recent stories.
+        Args:
+            tag: tag to scrape
+
+        Returns:
+            urls: list of URLs, limited to the amount of stories to scrape
+        """
+        return list(self._iter_tag_urls(tag))
+
+    def _iter_tag_urls(self, tag):
+        """
+        Crawls the listing pages of a tag and yields the URLs of its most
+        recent stories, page by page as they are read. The pages are read one
+        after another into a URL frontier until it yielded enough stories, the
+        listing ends or a page brings only URLs that are already known: seen
+        in a previous page or, in incremental mode, already stored in the
+        database.
+        Args:
+            tag: tag to scrape
+
+        Returns:
+            urls: generator of URLs, limited to the amount of stories to
+                scrape
+        """
+        frontier = UrlFrontier()
+        remaining = self.number
+        for page_number in range(1, TAG_MAX_PAGES + 1):
+            if remaining <= 0:
+                break
+            urls = self._scrape_tag_page(tag, page_number)
+            if not urls:
+                break
+            stored = set()
+            if self.incremental:
+                stored = SqlConn.get_stored_urls(urls, self.refresh_age)
+            added = 0
+            for position, url in enumerate(urls):
+                if url in stored:
+                    frontier.mark_seen(url)
+                elif frontier.add(url, (page_number, position)):
+                    added += 1
+            if self.logging:
+                print('Tag {} page {}: {} new stories'.format(
+                    tag, page_number, added))
+            if added == 0:
+                break
+            # The stories of a page are more recent than the ones of the next
+            # pages, so they can be handed out before reading them
+            for url in frontier.pop_many(remaining):
+                remaining -= 1
+                yield url
+
+    def _scrape_tag_page(self, tag, page_number):
+        """
+        Scrapes a listing page of a tag and returns the URLs of its stories.
+        Args:
+            tag: tag to scrape
+            page_number: number of the listing page, starting at 1
+
+        Returns:
+            urls: list of URLs in the order of the page. It's empty if the
+                page is past the end of the listing.
+        """
+        if page_number == 1:
+            page = self.transport.get(TAG_URL + tag)
+        else:
+            page = self.transport.get(TAG_PAGE_URL.format(tag, page_number))
         if page.status_code != SUCCESS_STATUS_CODE:
-            raise RuntimeError('Error! Tag {} was not found.'.format(self.tag))
-        soup = BeautifulSoup(page.content, 'html.parser')
-        tag_stories = soup.select(self.config.get_tag_urls_pattern())
+            if page_number > 1:
+                return []
+            raise RuntimeError('Error! Tag {} was not found.'.format(tag))
+        soup = self._make_soup(page.content, self.config.tag_urls_strainer)
+        tag_stories = self.config.compiled_tag_urls_pattern.select(soup)
         if len(tag_stories) == 0:
+            if page_number > 1:
+                return []
             raise RuntimeError('Error! No stories with the tag {} were found.'
-                               .format(self.tag))
+                               .format(tag))
         urls = [a.get('href') for a in tag_stories]
         urls = list(filter(lambda x: NEWS_URL_FILTER in x, urls))
-        self.urls += [DOMAIN_URL + u for u in urls]
-        self.urls = self.urls[:self.number]
+        return [DOMAIN_URL + u for u in urls]
+
+    def scrape_batch_targets(self):
+        """
+        Gathers the URLs of the stories of every target of a batch run and
+        saves them to self.urls. The targets are scraped concurrently and
+        share the transport, caches and driver pool of the scraper. A story
+        that shows up under several targets is only scraped once.
+        If a target fails and the scraper fails silently, the target is
+        skipped.
+        """
+        if any(mode == MODE_AUTHOR for mode, _ in self.targets) and \
+                self.driver_pool is None:
+            self.driver_pool = DriverPool()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._collect_target_urls, mode, value)
+                       for mode, value in self.targets]
+            seen = set(self.urls)
+            for (mode, value), future in zip(self.targets, futures):
+                try:
+                    urls = future.result()
+                except RuntimeError as e:
+                    if not self.fail_silently:
+                        raise
+                    print('Warning! {}'.format(e))
+                    continue
+                new_urls = [u for u in urls if u not in seen]
+                seen.update(new_urls)
+                self.urls += new_urls
+                if self.logging:
+                    print('Target {}: {} stories, {} of them new'.format(
+                        ' '.join(filter(None, (mode, value))), len(urls),
+                        len(new_urls)))
+
+    def _collect_target_urls(self, mode, value):
+        """
+        Gathers the URLs of the stories of a target of a batch run.
+        Args:
+            mode: mode of the target: top_stories, tag or author
+            value: tag or author of the target, or None for the top stories
+
+        Returns:
+            urls: list of URLs, limited to the amount of stories to scrape
+        """
+        if mode == MODE_TOP_STORIES:
+            return self._collect_top_stories_urls()
+        if mode == MODE_TAG:
+            return self._collect_tag_urls(value)
+        return self._scrape_author_urls(value)[:self.number]
 
-    def _check_selenium_404(self, driver):
+    @staticmethod
+    def _check_selenium_404(driver, author):
         """
         Checks if the desired page to scrape returned a 404 error by checking
         the pattern for a 404 error page. If a 404 error was encountered, it
         raises an error.
         Args:
             driver: Chrome webdriver instance used by Selenium
+            author: username of the author whose profile was requested
         """
         try:
             driver.find_element_by_css_selector(SELENIUM_CHECK_404)
         except NoSuchElementException:
             raise RuntimeError("Error! Author {} wasn't found."
-                               .format(self.author))
+                               .format(author))
 
-    def _await_author_profile_load(self, driver):
+    @staticmethod
+    def _await_author_profile_load(driver, author):
         """
         Makes Selenium webdriver instance wait for the dynamic results of the
         articles written by an author to be loaded.
         Args:
             driver: Chrome webdriver instance used by Selenium
+            author: username of the author whose profile was requested
         """
         try:
             WebDriverWait(driver, SELENIUM_TIMEOUT).until(
@@ -225,51 +757,135 @@ class Scraper:
                                                 "#ugc_content > .result-list"))
             )
         except WebDriverException:
-            driver.quit()
             raise RuntimeError("Error! Couldn't fetch Author {} profile."
-                               .format(self.author))
+                               .format(author))
 
     def scrape_stories_author(self):
         """
-        Scrapes an Author profile using Selenium to get the URLs for the
-        articles and saves them to self.urls
+        Scrapes the profiles of the authors set in the scraper (separated by
+        commas) using Selenium to get the URLs for their articles and saves
+        them to self.urls. The profiles are scraped in parallel, using the
+        drivers of the driver pool.
         It checks for an unknown author and raises an exception in that case.
+        """
+        authors = [a.strip() for a in self.author.split(',') if a.strip()]
+        for urls in self.scrape_authors_urls(authors):
+            self.urls += urls
+        self.urls = self.urls[:self.number]
 
+    def scrape_authors_urls(self, authors):
         """
-        chrome_options = webdriver.ChromeOptions()
-        chrome_options.headless = True
-        driver = webdriver.Chrome(executable_path=SELENIUM_DRIVER_PATH,
-                                  options=chrome_options)
-        driver.get(BASE_AUTHOR_URL + self.author)
-        self._check_selenium_404(driver)
-        driver.find_element_by_css_selector(SELENIUM_ARTICLES).click()
-        self._await_author_profile_load(driver)
+        Scrapes the URLs of the articles of several authors in parallel, one
+        author per driver of the driver pool.
+        Args:
+            authors: list of authors' usernames
 
+        Returns:
+            urls: list with the list of URLs of each author, in the same order
+        """
+        if self.driver_pool is None:
+            self.driver_pool = DriverPool()
+        with ThreadPoolExecutor(max_workers=self.driver_pool.size) as executor:
+            return list(executor.map(self._scrape_author_urls, authors))
+
+    def _scrape_author_urls(self, author):
+        """
+        Scrapes an Author profile using Selenium to get the URLs for the
+        articles.
+        Args:
+            author: username of the author
+
+        Returns:
+            urls: list of the URLs of the author's news articles
+        """
+        url = BASE_AUTHOR_URL + author
+        # Selenium errors (a missing element, a page load timeout...) are
+        # raised as RuntimeError, like the rest of the failures of a target.
+        # They are converted outside of the driver context, so the pool
+        # still quits a broken browser.
         try:
-            urls = driver.find_elements_by_css_selector(
-                self.config.get_author_urls_pattern())
-            urls = [u.get_attribute('href') for u in urls]
-            self.urls = list(filter(lambda x: NEWS_URL_FILTER in x, urls))
-            self.urls = self.urls[:self.number]
+            with self.driver_pool.driver() as driver, self._throttle(url):
+                driver.get(url)
+                self._check_selenium_404(driver, author)
+                driver.find_element_by_css_selector(SELENIUM_ARTICLES).click()
+                self._await_author_profile_load(driver, author)
+                urls = driver.find_elements_by_css_selector(
+                    self.config.get_author_urls_pattern())
+                urls = [u.get_attribute('href') for u in urls]
         except WebDriverException:
-            driver.quit()
             raise RuntimeError("Error! Couldn't fetch Author {} profile."
-                               .format(self.author))
-        driver.quit()
+                               .format(author))
+        return list(filter(lambda x: NEWS_URL_FILTER in x, urls))
+
+    def _throttle(self, url):
+        """
+        Returns a context manager that runs a request that doesn't go through
+        the transport under the rate limiter, if there's one.
+        Args:
+            url: URL that will be requested
+
+        Returns:
+            context manager
+        """
+        if self.rate_limiter is None:
+            return nullcontext()
+        return self.rate_limiter.throttle(url)
 
     def scrape_stories(self):
         """
         Iterates over the existing URLs and calls the scraping method over each
         of them. Saves the result in an object variable.
+        If more than one worker was configured, the stories are fetched
+        concurrently but they are still saved in the original URL order.
         """
-        for ix, url in enumerate(self.urls):
-            if self.logging:
-                print('Scraping story no. {}...'.format(ix + 1))
-            story = self._scrape_story(url, ix)
+        if self.workers == 1:
+            stories = map(self._scrape_story_logged, self.urls,
+                          range(len(self.urls)))
+            self._collect_stories(stories)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                stories = executor.map(self._scrape_story_logged, self.urls,
+                                       range(len(self.urls)))
+                self._collect_stories(stories)
+        if self.logging:
+            print('{} stories were scraped!'.format(len(self.urls)))
+            print('Template hits: {}'.format(
+                self.template_matcher.get_hits()))
+
+    def _collect_stories(self, stories):
+        """
+        Saves the scraped stories in an object variable, skipping the ones that
+        failed silently.
+        Args:
+            stories: iterable of Story objects or None, in the URLs order
+        """
+        for story in stories:
             if story is not None:
                 self.stories.append(story)
+
+    def _scrape_story_logged(self, url, index):
+        """
+        Logs the story that is about to be scraped and scrapes it.
+        Args:
+            url: URL for the story to be scraped
+            index: index to be assigned to the Story object
+
+        Returns:
+            story: Story object with all the scraped information
+        """
         if self.logging:
-            print('{} stories were scraped!'.format(len(self.urls)))
+            print('Scraping story no. {}...'.format(index + 1))
+        start = time.perf_counter()
+        story = None
+        with TRACER.span('story', url=url, index=index) as span:
+            try:
+                story = self._scrape_story(url, index)
+                return story
+            finally:
+                result = 'scraped' if story is not None else 'failed'
+                span.set('result', result)
+                STORY_SECONDS.observe(time.perf_counter() - start,
+                                      result=result)
 
     def _scrape_story(self, url, index):
         """
@@ -287,15 +903,26 @@ class Scraper:
         Returns:
             story: Story object with all the scraped information
         """
-        page = requests.get(url)
-        soup = BeautifulSoup(page.content, 'html.parser')
+        try:
+            page = self.transport.get(url)
+        except RuntimeError as e:
+            if not self.fail_silently:
+                raise
+            print('Warning! {}'.format(e))
+            return None
+        if page.status_code in GONE_STATUS_CODES:
+            with self._gone_lock:
+                self._gone_urls.add(url)
+        fields = self._get_parsed(page)
+        if fields is None:
+            fields = self._extract_story_fields(page.content, url)
+            if fields is not None:
+                self._set_parsed(page, fields)
 
-        for template in self.config.story_templates:
-            header = soup.select(template['header'])
-            if len(header) > 0:
-                story = self._scrape_story_content(soup, template, index)
-                story.set_url(url)
-                return story
+        if fields is not None:
+            story = self._scrape_story_content(fields, index)
+            story.set_url(url)
+            return story
 
         if not self.fail_silently:
             raise RuntimeError('An error occurred when trying to scrape '
@@ -304,42 +931,95 @@ class Scraper:
             print('Warning! An error occurred when trying to scrape the story: '
                   '{}'.format(url))
 
-    def _scrape_story_content(self, soup, template, index):
+    def _get_parsed(self, page):
+        """
+        Returns the fields parsed before from a page, if the page didn't change
+        since they were cached.
+        Args:
+            page: Response object for the page
+
+        Returns:
+            fields: dictionary of parsed fields or None
+        """
+        if self.cache is None or not page.from_cache:
+            return None
+        return self.cache.get_parsed(page.url)
+
+    def _set_parsed(self, page, fields):
+        """
+        Caches the fields parsed from a page, so they can be reused while the
+        page doesn't change.
+        Args:
+            page: Response object for the page
+            fields: dictionary of parsed fields
+        """
+        if self.cache is not None:
+            self.cache.set_parsed(page.url, fields)
+
+    def _extract_story_fields(self, content, url=None):
         """
-        Scrapes the provided site's content according to the provided template
-        structure looking for the title, description, authors and published
-        date. It call a function to get or create the authors if they haven't
-        been scraped before.
+        Parses a story site and tries to match its header to a known site
+        structure. If it's matched, it extracts the story fields and its tags
+        according to that structure. If a process pool was configured, the
+        work is done in one of its processes.
         Args:
-            soup: BeautifulSoup object with the story site parsed
-            template: template to be used to extract the desired content of the
-                site
+            content: bytes of the story site
+            url: optional - URL of the story site, used to rank the known
+                site structures
+
+        Returns:
+            fields: dictionary with the index of the matched 'template' and
+                the scraped 'story', 'tags' and 'tags_topic' fields or None if
+                no known structure matched
+        """
+        order = self.template_matcher.order(url)
+        if self.process_pool is not None:
+            # The parse and selector times are recorded inside the worker
+            # processes, so the whole round trip is recorded here instead.
+            # The worker's spans come back with the fields.
+            with PARSE_SECONDS.time(page='story_process_pool'), \
+                    TRACER.span('process_pool'):
+                fields, spans = self.process_pool.submit(
+                    extraction.extract_story_fields_in_worker, content,
+                    order, TRACER.enabled).result()
+                TRACER.adopt(spans)
+        else:
+            fields = extraction.extract_story_fields(
+                self.config, self.template_matcher, content, order,
+                self.parser)
+        self.template_matcher.record(
+            url, fields['template'] if fields is not None else None)
+        return fields
+
+    def _scrape_story_content(self, fields, index):
+        """
+        Creates the Story object out of the fields scraped from a story site,
+        looking for the title, description, authors and published date. It
+        calls a function to get or create the authors if they haven't been
+        scraped before.
+        Args:
+            fields: dictionary returned by _extract_story_fields
             index: index to be assigned to the Story object
 
         Returns:
             story: Story object with all the scraped information
         """
-        s = self._scrape_obj(soup, template, STORY_SCRAPE_FIELDS)
-        tags = self._scrape_obj(soup, self.config.get_stories_tag_template(),
-                                STORY_TAG_SCRAPE_FIELDS)
-        tags_topic = self._scrape_obj(
-            soup,
-            self.config.get_stories_tag_topic_template(),
-            STORY_TAG_SCRAPE_FIELDS)
-        authors = ['+'.join(a.split('profiles/')[1][:-1].split())
+        s = fields['story']
+        tags = fields['tags']
+        tags_topic = fields['tags_topic']
+        authors = [sys.intern('+'.join(a.split('profiles/')[1][:-1].split()))
                    for a in s['authors']]
         authors_created = self._get_or_create_authors(authors)
 
-        tags_parsed = []
-        tags_topic_parsed = []
+        tags_parsed = ()
+        tags_topic_parsed = ()
         if 'name' in tags and 'url' in tags:
             tags_parsed = zip(tags['name'], tags['url'])
         if 'name' in tags_topic and 'url' in tags_topic:
             tags_topic_parsed = zip(tags_topic['name'], tags_topic['url'])
 
-        tags = self._get_or_create_tags(tags_parsed)
-        tags_topic = self._get_or_create_tags(tags_topic_parsed)
-        tags += tags_topic
+        tags = self._get_or_create_tags(tags_parsed) + \
+            self._get_or_create_tags(tags_topic_parsed)
         try:
             story = Story(index + 1, s['title'], s['description'], s['date'],
                           authors_created, tags=tags)
@@ -349,57 +1029,39 @@ class Scraper:
 
         return story
 
-    @staticmethod
-    def _scrape_obj(soup, template, fields):
+    def _make_soup(self, content, strainer=None):
         """
-        Function that retrieves the fields specified according to a template in
-        the provided site parsed by BS4.
+        Parses a site with the configured parser.
         Args:
-            soup: BeautifulSoup instance of a site to scrape an object's data
-            template: template to be used to extract the desired content of the
-                site.
-            fields: dictionary of fields to scrape according to a template. It
-                provides configuration for how to get the values.
+            content: bytes of the site
+            strainer: optional - SoupStrainer that restricts the parsing to
+                the parts of the site that will be scraped
 
         Returns:
-            s: dictionary of scraped object with the attributes retrieved.
-        """
-        s = {}
-        for f in fields:
-            element = soup.select(template[f['field']])
-            if len(element) > 0:
-                if 'attr' not in f:
-                    if not f['multiple']:
-                        s[f['field']] = element[0].getText()
-                    else:
-                        s[f['field']] = [el.getText() for el in element]
-                else:
-                    if not f['multiple']:
-                        s[f['field']] = element[0].get(f['attr'], None)
-                    else:
-                        s[f['field']] = [el.get(f['attr'], None)
-                                         for el in element]
-            elif 'optional' in f and f['optional']:
-                s[f['field']] = None
-        return s
+            soup: BeautifulSoup object with the site parsed
+        """
+        with PARSE_SECONDS.time(page='listing'), \
+                TRACER.span('parse', page='listing'):
+            return BeautifulSoup(content, self.parser, parse_only=strainer)
 
     def _scrape_author(self, username):
         """
-        Scrapes an author with a given username, creates the instance, adds it
-        to the scraper's known authors and returns it.
+        Scrapes an author with a given username, creates the instance and
+        returns it. If the author is fresh in the author cache, it's created
+        from the cached fields without fetching the profile.
         Args:
             username: username for the author to scrape
 
         Returns:
             author: Author object for the author scraped
         """
-        page = requests.get(BASE_AUTHOR_URL + username)
-        soup = BeautifulSoup(page.content, 'html.parser')
-        if page.status_code != SUCCESS_STATUS_CODE:
-            raise RuntimeError("Warning! Author {} couldn't be scraped."
-                               .format(username))
-        template = self.config.get_author_template()
-        s = self._scrape_obj(soup, template, AUTHOR_SCRAPE_FIELDS)
+        s = None
+        if self.author_cache is not None:
+            s = self.author_cache.get(username)
+        cached = s is not None
+        if not cached:
+            s = self._fetch_author_fields(username)
+        AUTHOR_LOOKUPS.inc(source='cache' if cached else 'profile')
         for field in AUTHOR_SCRAPE_FIELDS:
             if field['field'] not in s:
                 print('Error! Something unexpected happened when scraping '
@@ -416,14 +1078,35 @@ class Scraper:
             print('Error! Something unexpected happened when scraping the '
                   'Author: {}'.format(username))
             raise ValueError(e)
-        self.authors.append(author)
+        if not cached and self.author_cache is not None:
+            self.author_cache.put(username, s)
         return author
 
+    def _fetch_author_fields(self, username):
+        """
+        Fetches the profile of an author and scrapes its fields.
+        Args:
+            username: username for the author to scrape
+
+        Returns:
+            s: dictionary of the fields scraped from the profile
+        """
+        page = self.transport.get(BASE_AUTHOR_URL + username)
+        if page.status_code != SUCCESS_STATUS_CODE:
+            raise RuntimeError("Warning! Author {} couldn't be scraped."
+                               .format(username))
+        s = self._get_parsed(page)
+        if s is None:
+            s = extraction.extract_author_fields(self.config, page.content,
+                                                 self.parser)
+            self._set_parsed(page, s)
+        return s
+
     def _get_or_create_authors(self, authors):
         """
         Given a list of authors' usernames, it returns a list of Author objects.
         It checks if the desired author was already scraped or it will be
-        scraped if it wasn't before
+        scraped if it wasn't before, registering it by its username.
         Args:
             authors: list of authors' usernames
 
@@ -432,15 +1115,11 @@ class Scraper:
         """
         result = []
         for a in authors:
-            found = None
-            for author_obj in self.authors:
-                if a == author_obj.get_username():
-                    found = author_obj
-            if found is not None:
-                result.append(found)
-            else:
+            with TRACER.span('author', username=a,
+                             registered=a in self.authors):
                 try:
-                    result.append(self._scrape_author(a))
+                    result.append(self.authors.get_or_create(
+                        a, lambda: self._scrape_author(a)))
                 except RuntimeError as e:
                     print(e)
                 except ValueError as e:
@@ -450,7 +1129,9 @@ class Scraper:
     def _get_or_create_tags(self, tags):
         """
         Given a list of tags as tuples, it returns a list of Tag objects.
-        It checks if the desired tag was already created or it will do it.
+        It checks if the desired tag was already created or it will do it,
+        registering it by its full URL, interned so the key and the tag's URL
+        are the same string.
         Args:
             tags: list of tags tuples following the structure (name, URL)
 
@@ -458,30 +1139,38 @@ class Scraper:
             result: list of Tag objects
         """
         result = []
-        for t in tags:
-            if t[0] is not None and t[1] is not None:
-                found = None
-                for tag in self.tags:
-                    if t[1] == tag.get_url():
-                        found = tag
-                if found is not None:
-                    result.append(found)
-                else:
-                    try:
-                        new_tag = Tag(name=t[0], url=t[1])
-                        result.append(new_tag)
-                    except AttributeError as e:
-                        pass
+        for name, url in tags:
+            if name is not None and url is not None:
+                try:
+                    result.append(self.tags.get_or_create(
+                        sys.intern(DOMAIN_URL + url),
+                        lambda: Tag(name=name, url=url)))
+                except AttributeError:
+                    pass
         return result
 
     def save_results(self):
         """
         Function that saves the information scraped to the database.
         """
-        SqlConn.save_results(self.stories)
+        if self.bulk_loader is not None:
+            self.bulk_loader.add_stories(self.stories)
+            self._bulk_load()
+        else:
+            SqlConn.save_results(self.stories, self.batch_size)
         if self.logging:
             print('Results were saved!')
 
+    def _bulk_load(self):
+        """
+        Loads the stories staged in the bulk loader into the database.
+        """
+        start = time.perf_counter()
+        loaded = self.bulk_loader.load()
+        if self.logging:
+            print('{} stories were bulk loaded in {:.2f} seconds'.format(
+                loaded, time.perf_counter() - start))
+
     def print_results(self):
         """
         Function that prints to the console the information for the scraped
@@ -489,13 +1178,37 @@ class Scraper:
         datetime. It also prints the information for the authors of those
         stories.
         """
+        self._print_session_header()
+        self._print_stories(self.stories)
+        self._print_authors()
+
+    @staticmethod
+    def _print_session_header():
+        """
+        Prints to the console the header of the scraping session, with the
+        current datetime.
+        """
         print('Scraping session: {}\n'.format(
             datetime.datetime.now().strftime("%d/%m/%Y, %H:%M:%S")))
         print('====================\n')
-        for story in self.stories:
+
+    @staticmethod
+    def _print_stories(stories):
+        """
+        Prints to the console the information for a list of stories.
+        Args:
+            stories: list of Story objects
+        """
+        for story in stories:
             text = story.get_full_info_lines()
             for line in text:
                 print(line)
+
+    def _print_authors(self):
+        """
+        Prints to the console the information for the authors of the scraped
+        stories.
+        """
         print('====================')
         for author in self.authors:
             text = author.get_full_info_lines()
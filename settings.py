@@ -4,20 +4,136 @@ FAIL_SILENTLY = True
 MODE_TOP_STORIES = 'top_stories'
 MODE_TAG = 'tag'
 MODE_AUTHOR = 'author'
+MODE_BATCH = 'batch'
 
-SCRAPE_MODE = [MODE_TOP_STORIES, MODE_TAG, MODE_AUTHOR]
+SCRAPE_MODE = [MODE_TOP_STORIES, MODE_TAG, MODE_AUTHOR, MODE_BATCH]
+# Modes that can be used as targets of a batch run
+TARGET_MODES = [MODE_TOP_STORIES, MODE_TAG, MODE_AUTHOR]
+# Lines of a targets file starting with this are ignored
+TARGETS_COMMENT = '#'
 
 # Scraper internal config
 BASE_URL = "https://www.cnet.com/news/"
 BASE_AUTHOR_URL = "https://www.cnet.com/profiles/"
 DOMAIN_URL = "https://www.cnet.com"
 TAG_URL = 'https://www.cnet.com/tags/'
+# Listing page of a tag after the first one: tag and page number
+TAG_PAGE_URL = TAG_URL + '{}/{}/'
+# Maximum amount of listing pages crawled per tag
+TAG_MAX_PAGES = 200
 DESTINATION_FILE_NAME = 'scraping.txt'
 MAX_URLS_DEFAULT = 15
+# Daemon mode config. Seconds between two polls, and the fraction of it
+# that's randomly added or subtracted to each wait.
+DAEMON_POLL_INTERVAL = 300
+DAEMON_POLL_JITTER = 0.1
+# Amount of URLs remembered between polls
+DAEMON_SEEN_URLS_MAX = 10000
+# Amount of authors and tags kept in memory before they are forgotten
+DAEMON_MAX_ENTITIES = 50000
+WORKERS_DEFAULT = 1
+PIPELINE_QUEUE_SIZE = 100
+# Amount of authors and tags kept in memory by a streaming run that saves
+# the stories before they are forgotten
+STREAM_MAX_ENTITIES = 5000
 SUCCESS_STATUS_CODE = 200
+NOT_MODIFIED_STATUS_CODE = 304
 UNAUTHORIZED_STATUS_CODE = 401
+# Status codes of stories that are gone for good, so they aren't retried
+GONE_STATUS_CODES = [404, 410]
 NEWS_URL_FILTER = '/news/'
 
+# HTTP transport config
+HTTP_BACKEND_REQUESTS = 'requests'
+HTTP_BACKEND_HTTP2 = 'http2'
+HTTP_BACKENDS = [HTTP_BACKEND_REQUESTS, HTTP_BACKEND_HTTP2]
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 20
+HTTP_POOL_CONNECTIONS = 4
+HTTP_MAX_CONNECTIONS_PER_HOST = 10
+HTTP_USER_AGENT = 'Mozilla/5.0 (compatible; data-mining-itc-cnet)'
+
+# Rate limiting config, applied per host. The request rate (token bucket)
+# and the amount of concurrent requests (AIMD window) grow while the host
+# answers well and are cut when it throttles or slows down.
+THROTTLED_STATUS_CODES = [429, 503]
+RATE_LIMIT_INITIAL_RATE = 5.0
+RATE_LIMIT_MIN_RATE = 0.2
+RATE_LIMIT_MAX_RATE = 50.0
+RATE_LIMIT_BURST = 5
+RATE_LIMIT_INITIAL_CONCURRENCY = 2
+RATE_LIMIT_MAX_CONCURRENCY = HTTP_MAX_CONNECTIONS_PER_HOST
+RATE_LIMIT_DECREASE_FACTOR = 0.5
+# Recent latency (moving average) over the usual latency of the same class
+# of URLs that counts as slow
+RATE_LIMIT_LATENCY_FACTOR = 3.0
+# Seconds the recent latency needs to grow over the usual one to count as
+# slow
+RATE_LIMIT_LATENCY_TOLERANCE = 0.5
+# Responses of a class of URLs needed before its latency is judged
+RATE_LIMIT_LATENCY_WARMUP = 10
+# Seconds between two consecutive cuts of the rate
+RATE_LIMIT_COOLDOWN = 1.0
+RATE_LIMIT_MAX_RETRIES = 3
+# Seconds to wait after a throttled response without a valid Retry-After
+RATE_LIMIT_RETRY_AFTER_DEFAULT = 5
+RATE_LIMIT_RETRY_AFTER_MAX = 120
+ROBOTS_TXT_PATH = '/robots.txt'
+
+# Metrics config. Prefix of the metric names and upper bounds (seconds) of
+# the histogram buckets.
+METRICS_PREFIX = 'cnet_scraper_'
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Tracing config. Name of the service the spans belong to.
+TRACE_SERVICE_NAME = 'cnet-scraper'
+
+# Export config. Rows written to the exported files (and fetched from the
+# database) at once, and separator of the authors and tags in CSV files.
+EXPORT_FORMAT_JSONL = 'jsonl'
+EXPORT_FORMAT_CSV = 'csv'
+EXPORT_FORMAT_PARQUET = 'parquet'
+EXPORT_FORMATS = [EXPORT_FORMAT_JSONL, EXPORT_FORMAT_CSV,
+                  EXPORT_FORMAT_PARQUET]
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_LIST_SEPARATOR = '|'
+
+# HTML parsing config
+HTML_PARSER_LXML = 'lxml'
+HTML_PARSER_PYTHON = 'html.parser'
+HTML_PARSERS = [HTML_PARSER_LXML, HTML_PARSER_PYTHON]
+HTML_PARSER_DEFAULT = HTML_PARSER_LXML
+
+# URL classes, matched in order against the full URL
+URL_CLASS_PROFILE = 'profile'
+URL_CLASS_NEWS_INDEX = 'news_index'
+URL_CLASS_TAG_LISTING = 'tag_listing'
+URL_CLASS_STORY = 'story'
+URL_CLASS_API = 'api'
+URL_CLASSES = [
+    (URL_CLASS_PROFILE, r'^https://www\.cnet\.com/profiles/'),
+    (URL_CLASS_NEWS_INDEX, r'^https://www\.cnet\.com/news/$'),
+    (URL_CLASS_TAG_LISTING, r'^https://www\.cnet\.com/tags/'),
+    (URL_CLASS_STORY, r'^https://www\.cnet\.com/'),
+    (URL_CLASS_API, r'^https?://api\.nytimes\.com/'),
+]
+
+# HTTP cache config. Seconds a cached response is fresh, per URL class.
+# URL classes not listed here are never cached.
+HTTP_CACHE_PATH = '.cache/http_cache.sqlite3'
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+HTTP_CACHE_TTLS = {
+    URL_CLASS_PROFILE: 7 * 24 * 60 * 60,
+    URL_CLASS_NEWS_INDEX: 5 * 60,
+    URL_CLASS_TAG_LISTING: 60 * 60,
+    URL_CLASS_STORY: 24 * 60 * 60,
+}
+
+# Author cache config. Seconds a cached author is considered fresh.
+AUTHOR_CACHE_PATH = '.cache/authors.sqlite3'
+AUTHOR_CACHE_TTL = 30 * 24 * 60 * 60
+
 CONSOLE_WELCOME_MESSAGE = 'CNET News Web Scraper initialized'
 ERROR_FILE_PATH = "Error! Path to file_name doesn't exist."
 
@@ -75,6 +191,14 @@ STORY_SCRAPE_FIELDS = [
 # Selenium config for authors
 SELENIUM_DRIVER_PATH = './chromedriver/chromedriver'
 SELENIUM_TIMEOUT = 15
+SELENIUM_POOL_SIZE = 2
+# 'eager' returns as soon as the DOM is ready, without waiting for resources
+SELENIUM_PAGE_LOAD_STRATEGY = 'eager'
+# The trailing '*' also blocks the URLs with a query string or a fragment
+# after the extension, e.g. style.css?v=3
+SELENIUM_BLOCKED_URLS = ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*',
+                         '*.svg*', '*.ico*', '*.woff*', '*.ttf*', '*.otf*',
+                         '*.eot*', '*.css*']
 SELENIUM_ARTICLES = '#user_tab > div.col-2 > div > section > ul > ' \
                     'li:nth-child(2) > a'
 SELENIUM_CHECK_404 = '#profile-info > h1 > span:nth-child(1)'
@@ -151,3 +275,12 @@ HOST = 'localhost'
 DATABASE = 'data_mining'
 USER = 'root'
 PASSWORD = ''
+DB_LOOKUP_CHUNK_SIZE = 1000
+DB_BATCH_SIZE = 50
+DB_POOL_SIZE = 4
+DB_CONNECT_TIMEOUT = 5
+DB_HEALTH_CHECK_INTERVAL = 30
+DB_RECONNECT_ATTEMPTS = 1
+# Backfill config. Directory of the TSV files the stories are staged to
+# before being bulk loaded with LOAD DATA LOCAL INFILE.
+BACKFILL_STAGING_PATH = '.cache/backfill'
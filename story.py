@@ -1,7 +1,12 @@
 class Story:
     """
-    Class that holds all the information related to a news story
+    Class that holds all the information related to a news story. It uses
+    slots and keeps its authors and tags as tuples of the shared Author and
+    Tag instances, since a backfill holds hundreds of thousands of stories.
     """
+    __slots__ = ('index', 'title', 'description', 'date', 'url', 'authors',
+                 'tags')
+
     def __init__(self, index, title, description,
                  date, authors=None, url=None, tags=None):
         """
@@ -11,9 +16,9 @@ class Story:
             title: string - title of the story
             description: string - description of the story
             date: string - published date of the story
-            authors: list of Author objects that wrote the story
+            authors: iterable of Author objects that wrote the story
             url: story's original URL
-            tags: list of Tag objects
+            tags: iterable of Tag objects
         """
         if index is None:
             raise ValueError('An index needs to be provided to a Story.')
@@ -29,8 +34,8 @@ class Story:
         self.description = description.strip()
         self.date = date.strip()
         self.url = url
-        self.authors = authors
-        self.tags = tags
+        self.authors = tuple(authors) if authors is not None else None
+        self.tags = tuple(tags) if tags is not None else None
 
     def __str__(self):
         """
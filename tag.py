@@ -1,10 +1,14 @@
+import sys
 from settings import DOMAIN_URL
 
 
 class Tag:
     """
-    Class that holds all the information related to a tag
+    Class that holds all the information related to a tag. Its name and URL
+    are interned, so they are shared with the registry keys.
     """
+    __slots__ = ('name', 'url', 'is_topic')
+
     def __init__(self, name, url):
         if not isinstance(name, str):
             raise AttributeError("The tag's name needs to be a string.")
@@ -14,8 +18,8 @@ class Tag:
             raise AttributeError("The tag's name can't be an empty string.")
         if url == '':
             raise AttributeError("The tag's URL can't be an empty string.")
-        self.name = name
-        self.url = DOMAIN_URL + url
+        self.name = sys.intern(name)
+        self.url = sys.intern(DOMAIN_URL + url)
         self.is_topic = '/topics/' in self.url
 
     def __str__(self):
@@ -0,0 +1,51 @@
+from settings import TARGET_MODES, TARGETS_COMMENT, MODE_TOP_STORIES
+
+
+def parse_target(line):
+    """
+    Parses a line of a targets file. A target is a mode followed by its
+    value, e.g. 'tag apple' or 'author john', or just 'top_stories'.
+    Args:
+        line: line of the targets file, without comments
+
+    Returns:
+        target: tuple (mode, value). The value is None for top stories.
+    """
+    parts = line.split(None, 1)
+    mode = parts[0]
+    value = parts[1].strip() if len(parts) > 1 else None
+    if mode not in TARGET_MODES:
+        raise ValueError('Invalid target "{}". A target needs to start with '
+                         'one of: {}.'.format(line, ', '.join(TARGET_MODES)))
+    if mode == MODE_TOP_STORIES and value is not None:
+        raise ValueError('Invalid target "{}". Top stories take no value.'
+                         .format(line))
+    if mode != MODE_TOP_STORIES and value is None:
+        raise ValueError('Invalid target "{}". A {} needs to be provided.'
+                         .format(line, mode))
+    return mode, value
+
+
+def read_targets(path):
+    """
+    Reads the targets of a batch run from a file, one target per line. Empty
+    lines and comments are skipped, and so are repeated targets.
+    Args:
+        path: path to the targets file
+
+    Returns:
+        targets: list of (mode, value) tuples in the order of the file
+    """
+    targets = []
+    with open(path) as file:
+        for line in file:
+            line = line.split(TARGETS_COMMENT, 1)[0].strip()
+            if not line:
+                continue
+            target = parse_target(line)
+            if target not in targets:
+                targets.append(target)
+    if not targets:
+        raise ValueError('Error! The targets file {} has no targets.'
+                         .format(path))
+    return targets
@@ -0,0 +1,125 @@
+import threading
+from urllib.parse import urlparse
+import soupsieve
+from metrics import TEMPLATE_MATCHES
+
+MISS = 'miss'
+
+
+class TemplateMatcher:
+    """
+    Class that detects which of the story templates matches a site, checking
+    every template header in a single walk of the tree. When more than one
+    template matches, the one with the highest hit rate for the URL's path
+    prefix (/news/, /features/...) wins. It keeps the hit counts so changes
+    in the sites' layouts can be spotted.
+    """
+
+    def __init__(self, templates):
+        """
+        Creates the matcher for a list of templates
+        Args:
+            templates: list of templates with their selectors compiled, as
+                in Configuration.compiled_story_templates
+        """
+        self.templates = templates
+        self.headers = [template['header'] for template in templates]
+        self.all_headers = soupsieve.compile(
+            ', '.join(header.pattern for header in self.headers))
+        self._hits = {}
+        self._lock = threading.Lock()
+
+    def detect(self, soup, order):
+        """
+        Finds the template that matches a parsed site, without recording it
+        Args:
+            soup: BeautifulSoup object with the site parsed
+            order: template indexes in the order they are preferred if more
+                than one matches, as returned by order
+
+        Returns:
+            ix: index of the matched template or None if none matched
+        """
+        matched = set()
+        for element in self.all_headers.select(soup):
+            for ix, header in enumerate(self.headers):
+                if ix not in matched and header.match(element):
+                    matched.add(ix)
+            if len(matched) == len(self.headers):
+                break
+        for ix in order:
+            if ix in matched:
+                return ix
+        return None
+
+    def order(self, url=None):
+        """
+        Returns the template indexes sorted by their hit count for the path
+        prefix of an URL, most hit first, keeping the configured order for
+        ties
+        Args:
+            url: optional - URL of the site
+
+        Returns:
+            order: sorted list of template indexes
+        """
+        with self._lock:
+            hits = dict(self._hits.get(self._path_prefix(url), {}))
+        return self._rank(hits, range(len(self.templates)))
+
+    def record(self, url, ix):
+        """
+        Records the template that matched a site
+        Args:
+            url: URL of the site
+            ix: index of the matched template or None if none matched
+        """
+        key = MISS if ix is None else ix
+        prefix = self._path_prefix(url)
+        with self._lock:
+            hits = self._hits.setdefault(prefix, {})
+            hits[key] = hits.get(key, 0) + 1
+        TEMPLATE_MATCHES.inc(
+            prefix=prefix,
+            template=MISS if ix is None else self.headers[ix].pattern)
+
+    @staticmethod
+    def _rank(hits, indexes):
+        """
+        Sorts template indexes by their hit count, most hit first, keeping
+        the configured order for ties
+        Args:
+            hits: dictionary of hit counts per template index
+            indexes: template indexes to sort
+
+        Returns:
+            ranked: sorted list of template indexes
+        """
+        return sorted(indexes, key=lambda ix: (-hits.get(ix, 0), ix))
+
+    @staticmethod
+    def _path_prefix(url):
+        """
+        Returns the first segment of the path of an URL, e.g. /news/
+        """
+        if url is None:
+            return '/'
+        segments = urlparse(url).path.strip('/').split('/')
+        return '/{}/'.format(segments[0]) if segments[0] else '/'
+
+    def get_hits(self):
+        """
+        Returns the hit counts per path prefix, with the templates identified
+        by their header selector
+        Returns:
+            hits: dictionary mapping each path prefix to a dictionary of hit
+                counts per template header, plus the misses
+        """
+        with self._lock:
+            return {
+                prefix: {
+                    MISS if ix == MISS else self.headers[ix].pattern: count
+                    for ix, count in hits.items()
+                }
+                for prefix, hits in self._hits.items()
+            }
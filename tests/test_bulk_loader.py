@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+from author import Author
+from database.bulk_loader import BulkLoader, tsv_field
+from story import Story
+from tag import Tag
+
+
+class TsvFieldTest(unittest.TestCase):
+    """
+    Checks the fields are written as LOAD DATA reads them by default
+    """
+
+    def test_special_characters_are_escaped(self):
+        self.assertEqual(tsv_field('a\tb\nc\rd\\e\0f'),
+                         'a\\tb\\nc\\rd\\\\e\\0f')
+
+    def test_null_and_booleans(self):
+        self.assertEqual(tsv_field(None), '\\N')
+        self.assertEqual(tsv_field('None'), 'None')
+        self.assertEqual(tsv_field(True), '1')
+        self.assertEqual(tsv_field(False), '0')
+
+
+class BulkLoaderTest(unittest.TestCase):
+    """
+    Checks the staging files and the recovery of the stories left in them
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def make_loader(self):
+        loader = BulkLoader(self.directory)
+        self.addCleanup(loader.close)
+        return loader
+
+    @staticmethod
+    def make_story(number):
+        author = Author('author{}'.format(number), 'Name',
+                        'Member since\nJanuary 1, 2020\n')
+        tag = Tag('Tag\t{}'.format(number), '/tags/{}/'.format(number))
+        return Story(number, 'Title {}'.format(number), 'Line\nbreak',
+                     'January 1, 2020 1:00 p.m. PT', [author],
+                     'https://www.cnet.com/news/{}/'.format(number), [tag])
+
+    def read_lines(self, table):
+        with open(os.path.join(self.directory, table + '.tsv'),
+                  encoding='utf-8', newline='') as f:
+            return f.read().split('\n')[:-1]
+
+    def test_every_table_is_staged(self):
+        loader = self.make_loader()
+        loader.add_stories([self.make_story(1), self.make_story(2)])
+        loader.close()
+        self.assertEqual(loader.staged, 2)
+        articles = self.read_lines('stage_article')
+        self.assertEqual(len(articles), 2)
+        self.assertEqual(articles[0].split('\t')[3], 'Line\\nbreak')
+        self.assertEqual(len(self.read_lines('stage_author')), 2)
+        self.assertEqual(self.read_lines('stage_article_hashtag')[0],
+                         'https://www.cnet.com/news/1/\tTag\\t1')
+
+    def test_leftover_stories_are_recovered(self):
+        loader = self.make_loader()
+        loader.add_stories([self.make_story(1), self.make_story(2)])
+        loader.close()
+        # A crash in the middle of a line
+        with open(os.path.join(self.directory, 'stage_article.tsv'),
+                  'a') as f:
+            f.write('Title 3\t2020-01-01')
+
+        loader = self.make_loader()
+        self.assertEqual(loader.recovered, 2)
+        self.assertEqual(loader.staged, 2)
+        loader.add_stories([self.make_story(4)])
+        loader.close()
+        self.assertEqual(loader.staged, 3)
+        urls = [line.split('\t')[2]
+                for line in self.read_lines('stage_article')]
+        self.assertEqual(urls, ['https://www.cnet.com/news/{}/'.format(n)
+                                for n in (1, 2, 4)])
+
+
+if __name__ == '__main__':
+    unittest.main()
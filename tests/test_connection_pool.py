@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+from database.connection_pool import ConnectionPool
+
+
+class FakeConnection:
+    """
+    Stand-in of a pymysql connection that records the transaction calls
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def commit(self):
+        self.calls.append('commit')
+
+    def rollback(self):
+        self.calls.append('rollback')
+
+    def close(self):
+        self.calls.append('close')
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    """
+    Checks that connections go back to the pool without an open transaction
+    """
+
+    def setUp(self):
+        patcher = mock.patch('pymysql.connect', side_effect=FakeConnection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ConnectionPool(max_size=1)
+
+    def test_read_transaction_is_ended_before_reuse(self):
+        with self.pool.connection() as connection:
+            pass
+        self.assertEqual(connection.calls, ['rollback'])
+        with self.pool.connection() as reused:
+            self.assertIs(reused, connection)
+
+    def test_committed_work_is_kept(self):
+        with self.pool.connection() as connection:
+            connection.commit()
+        self.assertEqual(connection.calls, ['commit', 'rollback'])
+
+    def test_abandoned_generator_ends_the_transaction(self):
+        def rows():
+            with self.pool.connection() as connection:
+                yield connection
+                yield connection
+
+        generator = rows()
+        connection = next(generator)
+        generator.close()
+        self.assertEqual(connection.calls, ['rollback'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import copy
+import unittest
+from bs4 import BeautifulSoup
+import extraction
+from benchmarks.parse_benchmark import load_pages
+from benchmarks.site import FIXTURES_DIRECTORY
+from main import build_configuration
+from template_matcher import TemplateMatcher
+from settings import HTML_PARSERS
+
+
+class StrainerTest(unittest.TestCase):
+    """
+    Checks that parsing only the parts of the fixture pages kept by the
+    strainers extracts the same fields as parsing the whole pages
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.config = build_configuration()
+        cls.full_config = copy.copy(cls.config)
+        cls.full_config.story_strainer = None
+        cls.full_config.author_strainer = None
+        cls.pages = load_pages(FIXTURES_DIRECTORY)
+
+    def pages_of(self, kind):
+        pages = [content for page_kind, content in self.pages
+                 if page_kind == kind]
+        self.assertTrue(pages, 'No {} fixtures were found'.format(kind))
+        return pages
+
+    def test_story_fields(self):
+        matcher = TemplateMatcher(self.config.compiled_story_templates)
+        order = list(range(len(self.config.compiled_story_templates)))
+        for parser in HTML_PARSERS:
+            for content in self.pages_of('stories'):
+                strained = extraction.extract_story_fields(
+                    self.config, matcher, content, order, parser)
+                full = extraction.extract_story_fields(
+                    self.full_config, matcher, content, order, parser)
+                self.assertIsNotNone(strained)
+                self.assertEqual(strained, full)
+
+    def test_author_fields(self):
+        for parser in HTML_PARSERS:
+            for content in self.pages_of('profiles'):
+                self.assertEqual(
+                    extraction.extract_author_fields(self.config, content,
+                                                     parser),
+                    extraction.extract_author_fields(self.full_config,
+                                                     content, parser))
+
+    def test_listing_urls(self):
+        listings = [
+            ('tag_listings', self.config.tag_urls_strainer,
+             [self.config.compiled_tag_urls_pattern]),
+            ('top_stories', self.config.main_urls_strainer,
+             [pattern for pattern, _ in
+              self.config.compiled_main_urls_pattern]),
+        ]
+        for parser in HTML_PARSERS:
+            for kind, strainer, patterns in listings:
+                for content in self.pages_of(kind):
+                    strained = BeautifulSoup(content, parser,
+                                             parse_only=strainer)
+                    full = BeautifulSoup(content, parser)
+                    for pattern in patterns:
+                        urls = [a.get('href')
+                                for a in pattern.select(strained)]
+                        self.assertTrue(urls)
+                        self.assertEqual(urls, [a.get('href') for a in
+                                                pattern.select(full)])
+
+
+if __name__ == '__main__':
+    unittest.main()
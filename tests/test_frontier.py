@@ -0,0 +1,46 @@
+import unittest
+from frontier import UrlFrontier, SeenUrls
+
+
+class UrlFrontierTest(unittest.TestCase):
+    """
+    Checks the order and the deduplication of the URL frontier
+    """
+
+    def test_urls_come_out_by_priority_then_insertion(self):
+        frontier = UrlFrontier()
+        frontier.add('page2-first', (2, 0))
+        frontier.add('page1-second', (1, 1))
+        frontier.add('page1-first', (1, 0))
+        frontier.add('tie', (2, 0))
+        self.assertEqual(frontier.pop_many(10), [
+            'page1-first', 'page1-second', 'page2-first', 'tie'])
+        self.assertIsNone(frontier.pop())
+
+    def test_urls_are_only_queued_the_first_time(self):
+        frontier = UrlFrontier()
+        frontier.mark_seen('stored')
+        self.assertTrue(frontier.add('new', (1, 0)))
+        self.assertFalse(frontier.add('new', (0, 0)))
+        self.assertFalse(frontier.add('stored', (0, 0)))
+        self.assertEqual(len(frontier), 1)
+        frontier.pop()
+        self.assertFalse(frontier.add('new', (0, 0)))
+
+
+class SeenUrlsTest(unittest.TestCase):
+    """
+    Checks that the seen URLs stay bounded
+    """
+
+    def test_oldest_urls_are_forgotten_first(self):
+        seen = SeenUrls(3)
+        seen.add_all(['a', 'b', 'c'])
+        seen.add_all(['a', 'd'])
+        self.assertEqual(len(seen), 3)
+        self.assertNotIn('b', seen)
+        self.assertEqual(seen.filter_new(['a', 'b', 'b', 'e']), ['b', 'e'])
+
+
+if __name__ == '__main__':
+    unittest.main()
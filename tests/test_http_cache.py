@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from http_cache import HttpCache, CachingTransport
+from transport import Response
+from settings import SUCCESS_STATUS_CODE, NOT_MODIFIED_STATUS_CODE, \
+    URL_CLASS_STORY
+
+STORY_URL = 'https://www.cnet.com/news/a-story/'
+
+
+class Clock:
+    """
+    Stand-in of time.time that only moves when it's told to
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedTransport:
+    """
+    Transport that answers with scripted responses and records the headers
+    of every request
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(dict(headers or {}))
+        status_code, content, response_headers = self.responses.pop(0)
+        return Response(url, status_code, content, response_headers)
+
+    def close(self):
+        pass
+
+
+class HttpCacheTest(unittest.TestCase):
+    """
+    Checks the revalidation, the expiry and the eviction of the HTTP cache
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.clock = Clock()
+        patcher = mock.patch('http_cache.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_cache(self, max_bytes=1024 * 1024):
+        cache = HttpCache(self.path, max_bytes)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_not_modified_reuses_the_cached_body(self):
+        transport = ScriptedTransport(
+            (SUCCESS_STATUS_CODE, b'<html>story</html>', {'ETag': '"v1"'}),
+            (NOT_MODIFIED_STATUS_CODE, b'', {}))
+        caching = CachingTransport(transport, self.make_cache(),
+                                   {URL_CLASS_STORY: 60})
+        self.assertFalse(caching.get(STORY_URL).from_cache)
+        self.clock.now += 61
+        response = caching.get(STORY_URL)
+        self.assertEqual(transport.requests[1].get('If-None-Match'), '"v1"')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.status_code, SUCCESS_STATUS_CODE)
+        self.assertEqual(response.content, b'<html>story</html>')
+
+    def test_entries_are_fresh_until_their_ttl_expires(self):
+        transport = ScriptedTransport(
+            (SUCCESS_STATUS_CODE, b'v1', {}), (SUCCESS_STATUS_CODE, b'v2', {}))
+        caching = CachingTransport(transport, self.make_cache(),
+                                   {URL_CLASS_STORY: 60})
+        caching.get(STORY_URL)
+        self.clock.now += 59
+        self.assertEqual(caching.get(STORY_URL).content, b'v1')
+        self.assertEqual(len(transport.requests), 1)
+        self.clock.now += 2
+        self.assertEqual(caching.get(STORY_URL).content, b'v2')
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_least_recently_used_entries_are_evicted_by_size(self):
+        bodies = {name: os.urandom(400) for name in 'abc'}
+        cache = self.make_cache(max_bytes=1000)
+        for name in 'ab':
+            self.clock.now += 1
+            cache.put(name, Response(name, SUCCESS_STATUS_CODE, bodies[name]))
+        self.clock.now += 1
+        cache.get('a')
+        self.clock.now += 1
+        cache.put('c', Response('c', SUCCESS_STATUS_CODE, bodies['c']))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a')['content'], bodies['a'])
+        self.assertEqual(cache.get('c')['content'], bodies['c'])
+
+    def test_size_is_kept_across_reopens(self):
+        cache = self.make_cache(max_bytes=1000)
+        cache.put('a', Response('a', SUCCESS_STATUS_CODE, os.urandom(400)))
+        cache.close()
+        cache = self.make_cache(max_bytes=1000)
+        self.clock.now += 1
+        cache.put('b', Response('b', SUCCESS_STATUS_CODE, os.urandom(400)))
+        self.clock.now += 1
+        cache.put('c', Response('c', SUCCESS_STATUS_CODE, os.urandom(400)))
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import re
+import unicodedata
+import unittest
+from database.mysql_connection import MySqlConnection
+
+
+def collate(value):
+    """
+    Folds a value like a case and accent insensitive collation with trailing
+    spaces ignored, e.g. latin1_swedish_ci
+    """
+    value = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in value if not unicodedata.combining(c)) \
+        .lower().rstrip(' ')
+
+
+class CollatingCursor:
+    """
+    Stand-in of a cursor over a table whose key column compares values with
+    a case and accent insensitive collation. It only answers the lookups of
+    _select_ids.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._result = []
+
+    def execute(self, sql, params):
+        id_column, key_column = re.match(
+            r'SELECT (\w+)(?:, (\w+))? FROM', sql).groups()
+        wanted = {collate(param) for param in params}
+        self._result = [{id_column: id_row, key_column or 'key': key}
+                        for id_row, key in self.rows
+                        if collate(key) in wanted]
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+
+class SelectIdsTest(unittest.TestCase):
+    """
+    Checks that the looked up keys are mapped to their rows
+    """
+
+    def test_keys_equal_only_for_the_collation_are_found(self):
+        cursor = CollatingCursor([(1, 'Jose'), (2, 'Ana'), (3, 'Zoe ')])
+        ids = MySqlConnection._select_ids(
+            cursor, 'author', 'id_author', 'nick_name',
+            ['José', 'ANA', 'Zoë', 'Missing'])
+        self.assertEqual(ids, {'josé': 1, 'ana': 2, 'zoë': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+from pipeline import Pipeline
+
+
+class PipelineTest(unittest.TestCase):
+    """
+    Checks the order, the backpressure and the errors of the pipeline
+    """
+
+    def setUp(self):
+        self.persisted = []
+
+    def persist(self, stories):
+        self.persisted.append(list(stories))
+
+    def test_stories_are_persisted_in_order_by_one_worker(self):
+        pipeline = Pipeline(lambda url, index: (index, url), self.persist,
+                            workers=1, batch_size=3)
+        urls = ['u{}'.format(i) for i in range(10)]
+        self.assertEqual(pipeline.run(urls), 10)
+        self.assertEqual([len(batch) for batch in self.persisted],
+                         [3, 3, 3, 1])
+        self.assertEqual([story for batch in self.persisted
+                          for story in batch], list(enumerate(urls)))
+
+    def test_every_story_is_persisted_once_by_several_workers(self):
+        pipeline = Pipeline(
+            lambda url, index: None if index % 2 else index, self.persist,
+            workers=4, batch_size=2)
+        self.assertEqual(pipeline.run(map(str, range(20))), 10)
+        self.assertEqual(sorted(story for batch in self.persisted
+                                for story in batch), list(range(0, 20, 2)))
+
+    def test_a_slow_persist_stage_stops_reading_urls(self):
+        consumed = []
+        release = threading.Event()
+
+        def urls():
+            for i in range(1000):
+                consumed.append(i)
+                yield str(i)
+
+        def persist(stories):
+            release.wait()
+
+        pipeline = Pipeline(lambda url, index: index, persist, workers=1,
+                            batch_size=1, queue_size=2)
+        thread = threading.Thread(target=pipeline.run, args=(urls(),))
+        thread.start()
+        time.sleep(0.5)
+        waiting = len(consumed)
+        release.set()
+        thread.join()
+        # The queues, the worker and the batch being persisted hold a few
+        self.assertLess(waiting, 10)
+        self.assertEqual(pipeline.persisted, 1000)
+
+    def test_an_error_in_a_stage_reaches_the_caller(self):
+        def scrape_story(url, index):
+            if index == 5:
+                raise ValueError('story {}'.format(index))
+            return index
+
+        pipeline = Pipeline(scrape_story, self.persist, workers=1,
+                            batch_size=2)
+        with self.assertRaisesRegex(ValueError, 'story 5'):
+            pipeline.run(map(str, range(100)))
+        # The stories assembled before the error are persisted anyway
+        self.assertEqual([story for batch in self.persisted
+                          for story in batch], [0, 1, 2, 3, 4])
+
+    def test_an_error_persisting_reaches_the_caller(self):
+        def persist(stories):
+            raise RuntimeError('Error! The database is gone')
+
+        pipeline = Pipeline(lambda url, index: index, persist, workers=2,
+                            batch_size=2)
+        with self.assertRaisesRegex(RuntimeError, 'database is gone'):
+            pipeline.run(map(str, range(100)))
+
+
+if __name__ == '__main__':
+    unittest.main()
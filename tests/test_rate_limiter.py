@@ -0,0 +1,41 @@
+import unittest
+from rate_limiter import HostLimiter
+from settings import SUCCESS_STATUS_CODE, NOT_MODIFIED_STATUS_CODE
+
+
+class HostLimiterLatencyTest(unittest.TestCase):
+    """
+    Checks how the latency of the responses adapts the limiter of a host
+    """
+
+    def setUp(self):
+        self.limiter = HostLimiter(rate=5.0, burst=1000, concurrency=2)
+
+    def respond(self, elapsed, times=1, status_code=SUCCESS_STATUS_CODE,
+                latency_class='story'):
+        for _ in range(times):
+            self.limiter.acquire()
+            self.limiter.release(status_code, elapsed,
+                                 latency_class=latency_class)
+
+    def test_steady_latency_keeps_or_raises_the_rate(self):
+        self.respond(0.08)
+        self.respond(0.7, times=100)
+        self.assertGreaterEqual(self.limiter.rate, 5.0)
+        self.assertGreaterEqual(self.limiter.limit, 2.0)
+
+    def test_fast_responses_of_other_classes_are_not_a_baseline(self):
+        self.respond(0.01, times=20, latency_class='robots')
+        self.respond(0.05, times=20, status_code=NOT_MODIFIED_STATUS_CODE)
+        self.respond(0.7, times=100)
+        self.assertGreaterEqual(self.limiter.rate, 5.0)
+
+    def test_rising_latency_cuts_the_rate(self):
+        self.respond(0.2, times=20)
+        rate = self.limiter.rate
+        self.respond(2.0, times=5)
+        self.assertLess(self.limiter.rate, rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
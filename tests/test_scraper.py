@@ -0,0 +1,159 @@
+import contextlib
+import io
+import unittest
+from unittest import mock
+from urllib.parse import urlparse
+from benchmarks.server import StandInServer
+from benchmarks.site import StandInTransport, load_site
+from frontier import SeenUrls
+from main import build_configuration
+from scraper import Scraper
+from settings import DESTINATION_FILE_NAME, DAEMON_SEEN_URLS_MAX, MODE_TAG
+
+
+class FlakyTransport(StandInTransport):
+    """
+    StandInTransport whose first request to some URLs fails
+    """
+
+    def __init__(self, base_url, flaky_urls):
+        super().__init__(base_url)
+        self.flaky_urls = set(flaky_urls)
+
+    def get(self, url, headers=None):
+        if url in self.flaky_urls:
+            self.flaky_urls.discard(url)
+            raise RuntimeError('Error! The request to {} failed'.format(url))
+        return super().get(url, headers=headers)
+
+
+class ListingScraper(Scraper):
+    """
+    Scraper whose tag listing pages are lists of URLs, recording the pages
+    it reads
+    """
+
+    def __init__(self, pages, number):
+        super().__init__(build_configuration(), logging=False,
+                         should_save=False, fail_silently=True,
+                         file_name=DESTINATION_FILE_NAME, mode=MODE_TAG,
+                         tag='tag', number=number)
+        self.pages = pages
+        self.pages_read = []
+
+    def _scrape_tag_page(self, tag, page_number):
+        self.pages_read.append(page_number)
+        return self.pages.get(page_number, [])
+
+
+class TagCrawlTest(unittest.TestCase):
+    """
+    Checks how the listing pages of a tag are crawled
+    """
+
+    def test_stories_come_out_newest_first_without_repetitions(self):
+        scraper = ListingScraper({1: ['a', 'b'], 2: ['b', 'c', 'd'],
+                                  3: ['e']}, number=10)
+        self.assertEqual(scraper._collect_tag_urls('tag'),
+                         ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(scraper.pages_read, [1, 2, 3, 4])
+
+    def test_crawl_stops_at_a_page_of_known_urls(self):
+        scraper = ListingScraper({1: ['a', 'b'], 2: ['b', 'a'], 3: ['c']},
+                                 number=10)
+        self.assertEqual(scraper._collect_tag_urls('tag'), ['a', 'b'])
+        self.assertEqual(scraper.pages_read, [1, 2])
+
+    def test_crawl_stops_once_there_are_enough_stories(self):
+        scraper = ListingScraper({1: ['a', 'b'], 2: ['c', 'd'], 3: ['e']},
+                                 number=3)
+        self.assertEqual(scraper._collect_tag_urls('tag'), ['a', 'b', 'c'])
+        self.assertEqual(scraper.pages_read, [1, 2])
+
+    @mock.patch('scraper.SqlConn.get_stored_urls')
+    def test_stored_urls_count_as_known_in_incremental_mode(self, stored):
+        stored.side_effect = lambda urls, refresh_age: {'b', 'c'} & set(urls)
+        scraper = ListingScraper({1: ['a', 'b'], 2: ['c', 'b'], 3: ['d']},
+                                 number=10)
+        scraper.incremental = True
+        self.assertEqual(scraper._collect_tag_urls('tag'), ['a'])
+        self.assertEqual(scraper.pages_read, [1, 2])
+
+
+class DaemonPollTest(unittest.TestCase):
+    """
+    Checks which URLs a poll of the daemon marks as seen
+    """
+
+    def setUp(self):
+        self.server = StandInServer(load_site())
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def make_scraper(self, transport, number=3):
+        self.addCleanup(transport.close)
+        return Scraper(build_configuration(), logging=False,
+                       should_save=False, fail_silently=True,
+                       file_name=DESTINATION_FILE_NAME, number=number,
+                       transport=transport, poll_interval=60)
+
+    def poll(self, scraper, seen):
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper._poll(seen)
+
+    def test_only_stored_or_gone_stories_are_seen(self):
+        probe = self.make_scraper(StandInTransport(self.server.url))
+        urls = probe._collect_top_stories_urls()
+        flaky, gone, stored = urls[:3]
+        del self.server.httpd.pages[urlparse(gone).path]
+        scraper = self.make_scraper(FlakyTransport(self.server.url, [flaky]))
+        seen = SeenUrls(DAEMON_SEEN_URLS_MAX)
+
+        self.poll(scraper, seen)
+        self.assertNotIn(flaky, seen)
+        self.assertIn(gone, seen)
+        self.assertIn(stored, seen)
+
+        self.poll(scraper, seen)
+        self.assertIn(flaky, seen)
+
+
+
+class StreamingTest(unittest.TestCase):
+    """
+    Checks that a streaming run doesn't hold the whole run in memory
+    """
+
+    def setUp(self):
+        self.server = StandInServer(load_site())
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.transport = StandInTransport(self.server.url)
+        self.addCleanup(self.transport.close)
+
+    @mock.patch('scraper.STREAM_MAX_ENTITIES', 0)
+    @mock.patch('scraper.SqlConn.save_results')
+    def test_entities_are_forgotten_after_every_batch(self, save_results):
+        scraper = Scraper(build_configuration(), logging=False,
+                          fail_silently=True, file_name=DESTINATION_FILE_NAME,
+                          mode=MODE_TAG, tag='apple', number=100,
+                          transport=self.transport, stream=True,
+                          batch_size=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.scrape()
+        saved = sum(len(call.args[0]) for call in save_results.call_args_list)
+        self.assertGreater(saved, 2)
+        self.assertEqual(len(scraper.urls), 0)
+        self.assertEqual(len(scraper.authors) + len(scraper.tags), 0)
+
+    def test_listing_pages_are_read_as_the_urls_are_consumed(self):
+        scraper = ListingScraper({1: ['a', 'b'], 2: ['c', 'd']}, number=10)
+        urls = scraper._iter_tag_urls('tag')
+        self.assertEqual([next(urls), next(urls)], ['a', 'b'])
+        self.assertEqual(scraper.pages_read, [1])
+        self.assertEqual(next(urls), 'c')
+        self.assertEqual(scraper.pages_read, [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,359 @@
+"""
+Opt-in tracing of the scraping of each URL. Every URL gets a tree of spans
+(fetch, parse, template match, author lookups...) written to a JSONL file,
+one span per line. The file can be converted to the Chrome trace format
+(chrome://tracing, Perfetto) or to OTLP/JSON (OpenTelemetry) with:
+
+    python tracing.py TRACE_FILE --format {chrome,otlp} [-o OUTPUT]
+"""
+import argparse
+import contextvars
+from contextlib import contextmanager
+import json
+import os
+import random
+import threading
+import time
+from settings import TRACE_SERVICE_NAME
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """
+    Class that holds a timed operation of a trace. Spans are used as context
+    managers: the span starts when the block is entered, becomes the parent
+    of the spans started inside it, and is written when the block exits.
+    """
+
+    def __init__(self, tracer, name, attributes):
+        """
+        Creates a span
+        Args:
+            tracer: Tracer the span is written to
+            name: name of the operation
+            attributes: dictionary of attributes of the span
+        """
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = None
+        self.span_id = '{:016x}'.format(random.getrandbits(64))
+        self.parent_id = None
+        self.start_ns = None
+        self.duration_ns = None
+        self._start = None
+        self._token = None
+
+    def set(self, key, value):
+        """
+        Sets an attribute of the span
+        Args:
+            key: name of the attribute
+            value: value of the attribute
+        """
+        self.attributes[key] = value
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is None:
+            self.trace_id = '{:032x}'.format(random.getrandbits(128))
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duration_ns = time.perf_counter_ns() - self._start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.tracer.write(self)
+
+    def to_dict(self):
+        """
+        Returns the span as it's written to the trace file
+        """
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'duration_ns': self.duration_ns,
+            'pid': os.getpid(),
+            'thread': threading.get_ident(),
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    """
+    Span returned while tracing is disabled. It does nothing.
+    """
+
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Class that creates spans and writes them to a JSONL file. It's disabled
+    until enable is called; while disabled, span returns a shared no-op span,
+    so the instrumented code pays only for a function call.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._file = None
+        self._collected = None
+        # Trace files inherited from the parent by forked processes
+        self._inherited_files = []
+        self._lock = threading.Lock()
+
+    def enable(self, path):
+        """
+        Starts writing spans to a file, replacing it
+        Args:
+            path: path of the JSONL trace file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._file = open(path, 'w')
+            self.enabled = True
+
+    def span(self, name, **attributes):
+        """
+        Creates a span, child of the span that's current in this thread (or
+        task), if any
+        Args:
+            name: name of the operation
+            **attributes: attributes of the span
+
+        Returns:
+            span: Span to use as a context manager
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def write(self, span):
+        """
+        Writes a finished span. The file is flushed when a whole trace ends.
+        Args:
+            span: finished Span
+        """
+        self._write_dict(span.to_dict())
+
+    def _write_dict(self, span):
+        """
+        Writes a finished span, or collects it if spans are being collected
+        Args:
+            span: span dictionary
+        """
+        with self._lock:
+            if self._collected is not None:
+                self._collected.append(span)
+                return
+            if self._file is None:
+                return
+            self._file.write(json.dumps(span, default=str) + '\n')
+            if span['parent_id'] is None:
+                self._file.flush()
+
+    def reset(self):
+        """
+        Disables tracing in a forked process, without writing what the parent
+        process had buffered for its trace file, and forgets the span that
+        was current when the process was forked.
+        """
+        # The lock may have been held by another thread of the parent
+        self._lock = threading.Lock()
+        with self._lock:
+            self.enabled = False
+            if self._file is not None:
+                # Closing (or collecting) the inherited file would write the
+                # parent's buffer again, so it's kept open and never used
+                self._inherited_files.append(self._file)
+                self._file = None
+        _current_span.set(None)
+
+    @contextmanager
+    def collect(self):
+        """
+        Context manager that traces the block and collects its spans in a
+        list instead of writing them, so they can be sent to the process that
+        writes the trace and adopted there.
+
+        Yields:
+            spans: list the span dictionaries are added to
+        """
+        spans = []
+        with self._lock:
+            self._collected = spans
+            self.enabled = True
+        try:
+            yield spans
+        finally:
+            with self._lock:
+                self._collected = None
+                self.enabled = False
+
+    def adopt(self, spans):
+        """
+        Writes spans collected in another process as part of the current
+        trace. Their root spans become children of the current span.
+        Args:
+            spans: list of span dictionaries
+        """
+        parent = _current_span.get()
+        if not self.enabled or parent is None:
+            return
+        for span in spans:
+            span = dict(span, trace_id=parent.trace_id)
+            if span['parent_id'] is None:
+                span['parent_id'] = parent.span_id
+            self._write_dict(span)
+
+    def close(self):
+        """
+        Stops tracing and closes the trace file
+        """
+        with self._lock:
+            self.enabled = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_spans(path):
+    """
+    Reads the spans of a trace file
+    Args:
+        path: path of the JSONL trace file
+
+    Returns:
+        spans: list of span dictionaries
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def to_chrome_trace(spans):
+    """
+    Converts spans to the Chrome trace event format
+    Args:
+        spans: list of span dictionaries
+
+    Returns:
+        trace: dictionary that can be dumped as JSON and loaded in
+            chrome://tracing or Perfetto
+    """
+    events = []
+    for span in spans:
+        events.append({
+            'name': span['name'],
+            'cat': 'scraper',
+            'ph': 'X',
+            'ts': span['start_ns'] / 1000,
+            'dur': span['duration_ns'] / 1000,
+            'pid': span['pid'],
+            'tid': span['thread'],
+            'args': dict(span['attributes'], trace_id=span['trace_id']),
+        })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def _otlp_value(value):
+    """
+    Converts an attribute value to an OTLP AnyValue
+    """
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(spans):
+    """
+    Converts spans to the OTLP/JSON format of OpenTelemetry
+    Args:
+        spans: list of span dictionaries
+
+    Returns:
+        trace: dictionary that can be dumped as JSON and sent to an
+            OpenTelemetry collector
+    """
+    otlp_spans = []
+    for span in spans:
+        otlp_span = {
+            'traceId': span['trace_id'],
+            'spanId': span['span_id'],
+            'name': span['name'],
+            'kind': 1,
+            'startTimeUnixNano': str(span['start_ns']),
+            'endTimeUnixNano': str(span['start_ns'] + span['duration_ns']),
+            'attributes': [{'key': key, 'value': _otlp_value(value)}
+                           for key, value in span['attributes'].items()],
+            'status': {'code': 2 if 'error' in span['attributes'] else 0},
+        }
+        if span['parent_id'] is not None:
+            otlp_span['parentSpanId'] = span['parent_id']
+        otlp_spans.append(otlp_span)
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{
+                'key': 'service.name',
+                'value': {'stringValue': TRACE_SERVICE_NAME},
+            }]},
+            'scopeSpans': [{
+                'scope': {'name': TRACE_SERVICE_NAME},
+                'spans': otlp_spans,
+            }],
+        }],
+    }
+
+
+# Tracer of the scraper. It's disabled unless tracing is enabled.
+TRACER = Tracer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trace file converter')
+    parser.add_argument('trace', help='JSONL trace file.')
+    parser.add_argument('-f', '--format', choices=['chrome', 'otlp'],
+                        default='chrome')
+    parser.add_argument('-o', '--output',
+                        help='Output file. Defaults to the trace file with '
+                             'a .json extension.')
+    args = parser.parse_args()
+
+    spans = read_spans(args.trace)
+    converted = to_chrome_trace(spans) if args.format == 'chrome' \
+        else to_otlp(spans)
+    output = args.output or os.path.splitext(args.trace)[0] + \
+        '.{}.json'.format(args.format)
+    with open(output, 'w') as f:
+        json.dump(converted, f)
+    print('{} spans written to {}'.format(len(spans), output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+import re
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from settings import HTTP_BACKEND_REQUESTS, HTTP_BACKEND_HTTP2, \
+    HTTP_BACKENDS, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, \
+    HTTP_POOL_CONNECTIONS, HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_USER_AGENT, \
+    URL_CLASSES
+from metrics import HTTP_REQUEST_SECONDS, HTTP_RESPONSE_BYTES
+from tracing import TRACER
+
+try:
+    import brotli  # noqa: F401 - urllib3 decodes 'br' when it is installed
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+_URL_CLASSES = [(name, re.compile(pattern)) for name, pattern in URL_CLASSES]
+
+
+def url_class(url):
+    """
+    Returns the name of the class of URL the given URL belongs to, according
+    to the URL_CLASSES setting
+    Args:
+        url: URL to classify
+
+    Returns:
+        name: name of the URL class or None if it doesn't match any
+    """
+    for name, pattern in _URL_CLASSES:
+        if pattern.match(url):
+            return name
+    return None
+
+
+class Response:
+    """
+    Class that holds the result of an HTTP request, independently of the
+    backend that performed it
+    """
+
+    def __init__(self, url, status_code, content, headers=None, elapsed=0.0,
+                 from_cache=False):
+        """
+        Creates a Response instance
+        Args:
+            url: URL that was requested
+            status_code: int - HTTP status code of the response
+            content: bytes - decoded (decompressed) body of the response
+            headers: dictionary of response headers
+            elapsed: float - seconds it took to get the response
+            from_cache: boolean - True if the body comes from the HTTP cache
+                instead of being downloaded
+        """
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers is not None else {}
+        self.elapsed = elapsed
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        """
+        Returns the body of the response as a string
+        """
+        return self.content.decode('utf-8', errors='replace')
+
+
+class HttpTransport:
+    """
+    Transport that performs every HTTP request of the scraper through a single
+    requests Session, so connections are pooled and kept alive between
+    requests to the same host.
+    """
+
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT,
+                 pool_connections=HTTP_POOL_CONNECTIONS,
+                 max_connections_per_host=HTTP_MAX_CONNECTIONS_PER_HOST):
+        """
+        Creates the transport and its connection pools
+        Args:
+            connect_timeout: seconds to wait for a connection to be established
+            read_timeout: seconds to wait for the server to send data
+            pool_connections: amount of hosts to keep a connection pool for
+            max_connections_per_host: maximum amount of open connections to a
+                single host. Extra requests wait for a free connection.
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': HTTP_USER_AGENT,
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'Connection': 'keep-alive',
+        })
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=max_connections_per_host,
+                              pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, headers=None):
+        """
+        Performs a GET request
+        Args:
+            url: URL to request
+            headers: optional dictionary of extra request headers
+
+        Returns:
+            response: Response object
+        """
+        start = time.perf_counter()
+        try:
+            page = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError('Error! The request to {} failed: {}'
+                               .format(url, e))
+        return Response(url, page.status_code, page.content,
+                        headers=dict(page.headers),
+                        elapsed=time.perf_counter() - start)
+
+    def close(self):
+        """
+        Closes every pooled connection
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Http2Transport:
+    """
+    Transport that performs the HTTP requests through an httpx Client with
+    HTTP/2 enabled. Requests to the same host are multiplexed over a single
+    connection when the server supports it.
+    It requires the optional dependency: pip install httpx[http2]
+    """
+
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT,
+                 pool_connections=HTTP_POOL_CONNECTIONS,
+                 max_connections_per_host=HTTP_MAX_CONNECTIONS_PER_HOST):
+        """
+        Creates the transport and its httpx Client
+        Args:
+            connect_timeout: seconds to wait for a connection to be established
+            read_timeout: seconds to wait for the server to send data
+            pool_connections: amount of hosts to keep a connection pool for
+            max_connections_per_host: maximum amount of open connections to a
+                single host.
+        """
+        if httpx is None:
+            raise RuntimeError('Error! The HTTP/2 transport requires httpx. '
+                               'Install it with: pip install httpx[http2]')
+        limits = httpx.Limits(
+            max_connections=pool_connections * max_connections_per_host,
+            max_keepalive_connections=max_connections_per_host)
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        try:
+            self.client = httpx.Client(http2=True, limits=limits,
+                                       timeout=timeout,
+                                       headers={
+                                           'User-Agent': HTTP_USER_AGENT,
+                                           'Accept-Encoding': ACCEPT_ENCODING,
+                                       })
+        except ImportError:
+            raise RuntimeError('Error! The HTTP/2 transport requires the h2 '
+                               'package. Install it with: '
+                               'pip install httpx[http2]')
+
+    def get(self, url, headers=None):
+        """
+        Performs a GET request
+        Args:
+            url: URL to request
+            headers: optional dictionary of extra request headers
+
+        Returns:
+            response: Response object
+        """
+        start = time.perf_counter()
+        try:
+            page = self.client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            raise RuntimeError('Error! The request to {} failed: {}'
+                               .format(url, e))
+        return Response(url, page.status_code, page.content,
+                        headers=dict(page.headers),
+                        elapsed=time.perf_counter() - start)
+
+    def close(self):
+        """
+        Closes every pooled connection
+        """
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class MeteredTransport:
+    """
+    Transport that records the latency and the downloaded bytes of every
+    request made through the wrapped transport, by URL class, and traces it
+    """
+
+    def __init__(self, transport):
+        """
+        Creates the metered transport
+        Args:
+            transport: transport that performs the actual requests
+        """
+        self.transport = transport
+
+    def get(self, url, headers=None):
+        """
+        Performs a GET request and records its metrics
+        Args:
+            url: URL to request
+            headers: optional dictionary of extra request headers
+
+        Returns:
+            response: Response object
+        """
+        name = url_class(url) or 'other'
+        with TRACER.span('fetch', url=url, url_class=name) as span:
+            start = time.perf_counter()
+            try:
+                response = self.transport.get(url, headers=headers)
+            except RuntimeError:
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                             url_class=name, status='error')
+                raise
+            span.set('status', response.status_code)
+            span.set('bytes', len(response.content))
+        HTTP_REQUEST_SECONDS.observe(response.elapsed, url_class=name,
+                                     status=response.status_code)
+        HTTP_RESPONSE_BYTES.inc(len(response.content), url_class=name)
+        return response
+
+    def close(self):
+        """
+        Closes the wrapped transport
+        """
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def create_transport(backend=HTTP_BACKEND_REQUESTS, **kwargs):
+    """
+    Creates the transport for the given backend
+    Args:
+        backend: one of HTTP_BACKENDS
+        **kwargs: keyword arguments passed to the transport constructor
+
+    Returns:
+        transport: HttpTransport or Http2Transport instance
+    """
+    if backend not in HTTP_BACKENDS:
+        raise ValueError('Invalid value "{}" for the HTTP backend.'
+                         .format(backend))
+    if backend == HTTP_BACKEND_HTTP2:
+        return Http2Transport(**kwargs)
+    return HttpTransport(**kwargs)